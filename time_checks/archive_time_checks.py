@@ -0,0 +1,156 @@
+"""
+archive_time_checks.py
+======================
+
+Tests that operate over a whole archive, from file names only.
+
+The cross-variable coverage check (T1.007) compares the period covered by
+each variable of a model/experiment/ensemble/table (and grid, for CMIP6) with
+that of the other variables of the same group, its siblings. A variable is
+flagged if its coverage differs from the coverage shared by most of its
+siblings.
+
+The covered period of each dataset (a variable in a group) runs from the
+earliest start to the latest end of the time components of its file names,
+parsed by `utils.get_start_end_freq`. The index of coverages is built in one
+pass over the paths. The datasets are then sorted by group and each group is
+swept once, so the check runs in O(n log n) for n datasets rather than
+comparing every pair of datasets.
+
+"""
+
+from collections import Counter
+from itertools import groupby
+
+from time_checks import utils
+from time_checks.results import CheckResult
+
+
+class CoverageIndex(object):
+    """
+    Index of the covered period of each dataset, by group.
+
+    A dataset is keyed on (group, variable), where the group is the tuple of
+    the file name components between the variable and the time component,
+    e.g. ("Amon", "HadGEM2-ES", "historical", "r1i1p1").
+    """
+
+    def __init__(self, time_index_in_name=-1, frequency_index=1):
+        """
+
+        :param time_index_in_name: index of the time component in the file names
+        :param frequency_index: index of the frequency component in the file names
+        """
+        self.time_index_in_name = time_index_in_name
+        self.frequency_index = frequency_index
+        self.coverage = {}
+        self.n_files = 0
+        self.skipped = []
+
+    def add(self, fpath):
+        """
+        Adds a file to the index. Files without a "start-end" time component
+        in their name (e.g. fixed fields) are skipped.
+
+        :param fpath: file name or path [string]
+        """
+        components = utils.get_file_name_components(fpath)
+
+        try:
+            (start, end), _ = utils.get_start_end_freq(components, self.time_index_in_name, self.frequency_index)
+        except (ValueError, IndexError):
+            self.skipped.append(fpath)
+            return
+
+        key = (tuple(components[1:self.time_index_in_name]), components[0])
+        current = self.coverage.get(key)
+
+        if current is None:
+            self.coverage[key] = (start, end)
+        else:
+            self.coverage[key] = (min(current[0], start), max(current[1], end))
+
+        self.n_files += 1
+
+    def add_paths(self, paths):
+        for fpath in paths:
+            self.add(fpath)
+
+    def __len__(self):
+        return len(self.coverage)
+
+    def groups(self):
+        """
+        Returns the datasets of each group, sorted by group.
+
+        :return: generator of tuples of: (group, dictionary of {variable: (start, end)})
+        """
+        for group, items in groupby(sorted(self.coverage.items()), key=lambda item: item[0][0]):
+            yield group, dict((variable, coverage) for (_, variable), coverage in items)
+
+
+def get_reference_coverage(coverages):
+    """
+    Returns the coverage shared by most variables of a group (the earliest
+    starting and then latest ending one if there is a tie), and the number of
+    variables that have it.
+
+    :param coverages: dictionary of {variable: (start, end)}
+    :return: tuple of: ((start, end), count)
+    """
+    counts = Counter(coverages.values())
+    best = max(counts.values())
+
+    candidates = sorted([coverage for coverage, count in counts.items() if count == best],
+                        key=lambda coverage: coverage[1], reverse=True)
+    reference = min(candidates, key=lambda coverage: coverage[0])
+
+    return reference, best
+
+
+def check_cross_variable_coverage(coverages):
+    """
+    Checks that each variable of a group covers the same period as most of
+    its siblings.
+
+    :param coverages: dictionary of {variable: (start, end)} for one group
+    :return: dictionary of {variable: (Boolean (Success or Failure), message)}
+    """
+    if len(coverages) < 2:
+        return dict((variable, (True, "")) for variable in coverages)
+
+    reference, count = get_reference_coverage(coverages)
+    results = {}
+
+    for variable, coverage in coverages.items():
+        if coverage == reference:
+            results[variable] = (True, "")
+        else:
+            results[variable] = (False, "Variable covers {}-{} but {} of its {} sibling variables cover {}-{}".format(
+                coverage[0], coverage[1], count, len(coverages) - 1, reference[0], reference[1]))
+
+    return results
+
+
+def dataset_id(group, variable):
+    """
+    Returns the name of a dataset: its file names without the time component.
+    """
+    return "_".join((variable,) + tuple(group))
+
+
+def iter_coverage_results(index):
+    """
+    Runs the cross-variable coverage check (T1.007) over every dataset of an index.
+
+    :param index: CoverageIndex instance
+    :return: generator of CheckResult objects keyed on the dataset name, sorted by group
+    """
+    for group, coverages in index.groups():
+        results = check_cross_variable_coverage(coverages)
+
+        for variable in sorted(results):
+            res, msg = results[variable]
+            result = CheckResult.from_check("T1.007", "cross_variable_coverage", res, msg)
+            result.key = dataset_id(group, variable)
+            yield result
@@ -0,0 +1,301 @@
+"""
+async_scheduler.py
+==================
+
+Asyncio scheduling of file checks over storage tiers with different speeds.
+
+Each file belongs to a storage tier, found from the longest matching path
+prefix (or, optionally, from its mount point). Each tier has its own limit on
+the number of files being read at once, so a slow (e.g. tape-staged) tier is
+never overloaded while a fast tier is kept busy.
+
+Reads (the blocking open and extraction of the time axis) run in an executor.
+The checks run as soon as a read completes, in a separate executor, so
+checking overlaps with the reads still pending.
+
+By default the reads run in worker processes, as the netCDF-C and HDF5
+libraries are not thread-safe: concurrent reads in threads of one process
+crash it or return corrupt data. The reader (and fallback reader and sizer)
+must then be picklable. A thread pool can be given as `read_executor` for
+readers that do not use netCDF (e.g. in tests).
+
+With a `MemoryBudget` (see `memory_budget.py`) the header of each file is
+read first to estimate the memory needed to check it, and the file is only
+read once that fits in the budget; it holds its share until it has been
+checked. Files too big for the budget are read and checked by the fallback
+reader and checker (the chunked path) instead.
+
+"""
+
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from time_checks import utils
+from time_checks.memory_budget import ReportingPeakRSS
+
+
+DEFAULT_TIER_LIMIT = 4
+
+
+class TierLimits(object):
+    """
+    Maps paths to storage tiers and their concurrency limits.
+    """
+
+    def __init__(self, limits=None, default_limit=DEFAULT_TIER_LIMIT, by_mount=False):
+        """
+
+        :param limits: dictionary of {path prefix: maximum concurrent reads}
+        :param default_limit: limit for paths that match no prefix [int]
+        :param by_mount: if True, paths that match no prefix are put in a tier
+                         per mount point (each with `default_limit`) [boolean]
+        """
+        self.limits = dict(limits or {})
+        self.default_limit = default_limit
+        self.by_mount = by_mount
+
+        # Longest prefixes first so the most specific prefix wins
+        self._prefixes = sorted(self.limits, key=len, reverse=True)
+
+    @classmethod
+    def from_strings(cls, specs, **kwargs):
+        """
+        Creates TierLimits from strings of the form "<prefix>=<limit>".
+
+        :param specs: sequence of strings
+        :return: TierLimits instance
+        """
+        limits = {}
+        for spec in specs:
+            prefix, _, limit = spec.rpartition("=")
+            if not prefix:
+                raise ValueError("Tier must be of the form <prefix>=<limit>, not: {}".format(spec))
+            limits[prefix] = int(limit)
+
+        return cls(limits, **kwargs)
+
+    def tier_for(self, path):
+        """
+        Returns the name of the tier of `path`: its matching prefix, its mount
+        point (if `by_mount` is set) or None for the default tier.
+        """
+        for prefix in self._prefixes:
+            if path.startswith(prefix):
+                return prefix
+
+        if self.by_mount:
+            return _find_mount_point(path)
+
+        return None
+
+    def limit_for(self, tier):
+        return self.limits.get(tier, self.default_limit)
+
+
+def _find_mount_point(path):
+    path = os.path.abspath(path)
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+
+    return path
+
+
+def read_dataset_dict(fpath):
+    """
+    Opens a netCDF file and returns it as a CEDA-CC style dictionary. This is
+    the default (blocking) reader of the scheduler.
+
+    :param fpath: path of the netCDF file [string]
+    :return: dictionary
+    """
+    ds = utils._netcdf4().Dataset(fpath)
+    try:
+        return utils._convert_dataset_to_dict(ds)
+    finally:
+        ds.close()
+
+
+def pass_results(path, results):
+    """
+    Checker for readers that already return the check results (such as the
+    chunked path): returns the results unchanged.
+    """
+    return results
+
+
+class LatencyInjectingReader(object):
+    """
+    Stand-in for slow storage: wraps a reader and sleeps before each read for
+    the delay of the first matching path prefix. Used to exercise the scheduler
+    in tests. It also records the peak number of concurrent reads per prefix.
+    """
+
+    def __init__(self, reader, delays, default_delay=0.):
+        """
+
+        :param reader: callable taking a path
+        :param delays: dictionary of {path prefix: delay in seconds}
+        :param default_delay: delay for paths matching no prefix [float]
+        """
+        self.reader = reader
+        self.delays = delays
+        self.default_delay = default_delay
+        self.active = {}
+        self.peak = {}
+        self._lock = threading.Lock()
+
+    def _prefix(self, path):
+        for prefix in sorted(self.delays, key=len, reverse=True):
+            if path.startswith(prefix):
+                return prefix
+
+        return None
+
+    def __call__(self, path):
+        prefix = self._prefix(path)
+
+        with self._lock:
+            self.active[prefix] = self.active.get(prefix, 0) + 1
+            self.peak[prefix] = max(self.peak.get(prefix, 0), self.active[prefix])
+
+        try:
+            time.sleep(self.delays.get(prefix, self.default_delay))
+            return self.reader(path)
+        finally:
+            with self._lock:
+                self.active[prefix] -= 1
+
+
+class AsyncCheckScheduler(object):
+    """
+    Schedules the reading and checking of files with per-tier concurrency limits.
+    """
+
+    def __init__(self, checker, reader=read_dataset_dict, tier_limits=None,
+                 read_executor=None, check_executor=None, memory_budget=None,
+                 fallback_reader=None, fallback_checker=pass_results, report_rss=False):
+        """
+
+        :param checker: callable taking (path, read result) and returning the check results
+        :param reader: blocking callable taking a path and returning what the checker needs
+        :param tier_limits: TierLimits instance (default: one tier with the default limit)
+        :param read_executor: executor for the reads (default: a process pool large
+                              enough for all tiers to run at their limit)
+        :param check_executor: executor for the checks (default: a single thread)
+        :param memory_budget: MemoryBudget instance, or None to admit files regardless of size
+        :param fallback_reader: reader for files too big for the memory budget, or
+                                None to read them with `reader` (when alone in the budget)
+        :param fallback_checker: checker for the results of `fallback_reader`
+        :param report_rss: record the peak RSS of the worker processes in `peak_rss` [boolean]
+        """
+        self.checker = checker
+        self.reader = reader
+        self.tier_limits = tier_limits or TierLimits()
+        self.read_executor = read_executor
+        self.check_executor = check_executor
+        self.memory_budget = memory_budget
+        self.fallback_reader = fallback_reader
+        self.fallback_checker = fallback_checker
+        self.report_rss = report_rss
+        self.peak_rss = {}
+        self._semaphores = {}
+
+    def _semaphore(self, tier):
+        if tier not in self._semaphores:
+            self._semaphores[tier] = asyncio.Semaphore(self.tier_limits.limit_for(tier))
+
+        return self._semaphores[tier]
+
+    async def _call(self, loop, executor, func, *args):
+        if not self.report_rss:
+            return await loop.run_in_executor(executor, func, *args)
+
+        result, pid, peak = await loop.run_in_executor(executor, ReportingPeakRSS(func), *args)
+        self.peak_rss[pid] = max(self.peak_rss.get(pid, 0), peak)
+        return result
+
+    async def _admit(self, loop, tier, path):
+        """
+        Estimates the memory needed for `path` from its header and waits until
+        it fits in the budget.
+
+        :return: tuple of: (bytes taken from the budget, reader, checker)
+        """
+        budget = self.memory_budget
+
+        async with self._semaphore(tier):
+            nbytes = await self._call(loop, self.read_executor, budget.sizer, path)
+
+        if budget.is_oversized(nbytes) and self.fallback_reader is not None:
+            reader, checker, nbytes = self.fallback_reader, self.fallback_checker, budget.chunked_bytes
+        else:
+            reader, checker, nbytes = self.reader, self.checker, min(nbytes, budget.total_bytes)
+
+        await budget.acquire(nbytes)
+        return nbytes, reader, checker
+
+    async def _run_one(self, loop, path):
+        tier = self.tier_limits.tier_for(path)
+
+        try:
+            if self.memory_budget is None:
+                nbytes, reader, checker = 0, self.reader, self.checker
+            else:
+                nbytes, reader, checker = await self._admit(loop, tier, path)
+
+            try:
+                async with self._semaphore(tier):
+                    data = await self._call(loop, self.read_executor, reader, path)
+
+                result = await self._call(loop, self.check_executor, checker, path, data)
+            finally:
+                if nbytes:
+                    await self.memory_budget.release(nbytes)
+        except Exception as err:
+            return path, err
+
+        return path, result
+
+    async def run_async(self, paths):
+        """
+        Reads and checks all `paths`. A read or check that raises is returned
+        as the exception in place of the result.
+
+        :param paths: sequence of paths
+        :return: list of tuples of: (path, result) in the order of `paths`
+        """
+        paths = list(paths)
+        loop = asyncio.get_running_loop()
+        self._semaphores = {}
+        if self.memory_budget is not None:
+            self.memory_budget.reset()
+
+        own_executors = []
+        if self.read_executor is None:
+            tiers = set(self.tier_limits.tier_for(path) for path in paths)
+            workers = sum(self.tier_limits.limit_for(tier) for tier in tiers)
+            self.read_executor = ProcessPoolExecutor(max_workers=max(workers, 1))
+            own_executors.append("read_executor")
+
+        if self.check_executor is None:
+            self.check_executor = ThreadPoolExecutor(max_workers=1)
+            own_executors.append("check_executor")
+
+        try:
+            return await asyncio.gather(*[self._run_one(loop, path) for path in paths])
+        finally:
+            for name in own_executors:
+                getattr(self, name).shutdown()
+                setattr(self, name, None)
+
+    def run(self, paths):
+        """
+        Synchronous version of `run_async`.
+        """
+        return asyncio.run(self.run_async(paths))
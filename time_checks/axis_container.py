@@ -0,0 +1,305 @@
+"""
+axis_container.py
+=================
+
+A single file binary container for batches of extracted time metadata, for
+exchanging time axes between extraction and checking nodes without going
+through text (see `axis_store.py` for the directory store used locally).
+
+Layout (all integers little-endian):
+
+    file header   magic b"TCAX", version [uint16], header size [uint16],
+                  reserved [uint64]                                   16 bytes
+    records       one after the other, each starting on an 8 byte boundary:
+                    record size in bytes, excluding this field [uint64]
+                    metadata size [uint32], times dtype code [uint8],
+                    bounds dtype code [uint8], padding [2 bytes],
+                    number of time values [uint64],
+                    number of bounds values [uint64]
+                    metadata: UTF-8 JSON of {"path", "filename", "time"
+                      (units, calendar, bounds name...)}, padded to 8 bytes
+                    time values, padded to 8 bytes
+                    bounds values (two per time step), padded to 8 bytes
+    index         offset of each record [uint64 array]
+    trailer       offset of the index [uint64], number of records [uint64],
+                  magic b"TCAI"                                       20 bytes
+
+Time values and bounds are stored as little-endian float64, float32, int64 or
+int32 buffers (other types are stored as float64), so they are read back
+without any conversion. The file is memory-mapped on read: records are read
+by index through the index, and their arrays are views into the file. If the
+trailer is missing (e.g. a writer was interrupted) the index is rebuilt by
+following the record sizes.
+
+"""
+
+import os
+import json
+import struct
+
+import numpy as np
+
+from time_checks import utils
+from time_checks.axis_store import extract_time_axis
+
+
+MAGIC = b"TCAX"
+INDEX_MAGIC = b"TCAI"
+VERSION = 1
+
+CONTAINER_SUFFIX = ".tca"
+
+FILE_HEADER = struct.Struct("<4sHHQ")
+RECORD_SIZE = struct.Struct("<Q")
+RECORD_HEADER = struct.Struct("<IBBxxQQ")
+TRAILER = struct.Struct("<QQ4s")
+
+ALIGNMENT = 8
+
+DTYPE_CODES = {1: np.dtype("<f8"), 2: np.dtype("<f4"), 3: np.dtype("<i8"), 4: np.dtype("<i4")}
+_CODES_BY_DTYPE = dict((dtype, code) for code, dtype in DTYPE_CODES.items())
+
+# Keys of the "time" dictionary that are stored as arrays rather than metadata
+_ARRAY_KEYS = ("_data", "_bounds", "_summary")
+
+
+def _padding(size):
+    return -size % ALIGNMENT
+
+
+def _as_stored_array(values):
+    """
+    Returns `values` as a little-endian array of one of the stored types, and its type code.
+    """
+    if np.ma.isMaskedArray(values):
+        values = values.astype(np.float64).filled(np.nan) if np.ma.is_masked(values) else values.data
+    else:
+        values = np.asarray(values)
+
+    dtype = values.dtype.newbyteorder("<") if values.dtype.kind in "fi" else np.dtype("<f8")
+    code = _CODES_BY_DTYPE.get(dtype)
+    if code is None:
+        dtype, code = np.dtype("<f8"), 1
+
+    return np.ascontiguousarray(values, dtype=dtype).ravel(), code
+
+
+def encode_record(ds, path=None):
+    """
+    Encodes a dataset dictionary (CEDA-CC style) as a container record. Time
+    bounds are taken from ds["time"]["_bounds"] if set.
+
+    :param ds: dataset dictionary
+    :param path: path of the file the dataset was extracted from (default: ds["path"]) [string]
+    :return: record [bytes]
+    """
+    time_dict = ds["time"]
+    metadata = {"path": path if path is not None else ds.get("path", ""),
+                "filename": list(ds["filename"]),
+                "time": dict((key, value) for key, value in time_dict.items() if key not in _ARRAY_KEYS)}
+
+    meta_bytes = json.dumps(metadata).encode("utf-8")
+    times, times_code = _as_stored_array(time_dict.get("_data", []))
+    bounds, bounds_code = _as_stored_array(time_dict.get("_bounds", np.empty(0)))
+
+    parts = [RECORD_HEADER.pack(len(meta_bytes), times_code, bounds_code, times.size, bounds.size)]
+    for data in (meta_bytes, times.tobytes(), bounds.tobytes()):
+        parts.extend([data, b"\0" * _padding(len(data))])
+
+    body = b"".join(parts)
+    return RECORD_SIZE.pack(len(body)) + body
+
+
+def decode_record(buf, offset):
+    """
+    Decodes the record at `offset` of a buffer to a dataset dictionary, with
+    the time values as "_data" and the bounds (of shape (n, 2)) as "_bounds".
+    The arrays are views into the buffer.
+
+    :param buf: container contents [numpy uint8 array, e.g. memory-mapped]
+    :param offset: offset of the record in the buffer [int]
+    :return: dataset dictionary, with the file path as "path"
+    """
+    offset += RECORD_SIZE.size
+    meta_size, times_code, bounds_code, n_times, n_bounds = RECORD_HEADER.unpack_from(buf, offset)
+    offset += RECORD_HEADER.size
+
+    metadata = json.loads(bytes(buf[offset:offset + meta_size]).decode("utf-8"))
+    offset += meta_size + _padding(meta_size)
+
+    arrays = []
+    for code, count in ((times_code, n_times), (bounds_code, n_bounds)):
+        dtype = DTYPE_CODES[code]
+        size = count * dtype.itemsize
+        arrays.append(buf[offset:offset + size].view(dtype))
+        offset += size + _padding(size)
+
+    time_dict = metadata["time"]
+    time_dict["_data"] = arrays[0]
+    time_dict["_bounds"] = arrays[1].reshape(-1, 2)
+
+    return {"time": time_dict, "filename": metadata["filename"], "path": metadata["path"]}
+
+
+class ContainerWriter(object):
+    """
+    Writes records to a container. The container is written to a temporary
+    file, moved to `path` when the writer is closed.
+    """
+
+    def __init__(self, path):
+        """
+
+        :param path: path of the container file [string]
+        """
+        self.path = path
+        self.offsets = []
+
+        self._tmp_path = path + ".tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(FILE_HEADER.pack(MAGIC, VERSION, FILE_HEADER.size, 0))
+
+    def write(self, ds, path=None):
+        """
+        Appends a dataset dictionary to the container (see `encode_record`).
+        """
+        self.offsets.append(self._file.tell())
+        self._file.write(encode_record(ds, path))
+
+    def close(self):
+        index_offset = self._file.tell()
+        np.array(self.offsets, dtype="<u8").tofile(self._file)
+        self._file.write(TRAILER.pack(index_offset, len(self.offsets), INDEX_MAGIC))
+        self._file.close()
+
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_container(datasets, path):
+    """
+    Writes dataset dictionaries to a container.
+
+    :param datasets: iterable of dataset dictionaries (CEDA-CC style)
+    :param path: path of the container file [string]
+    :return: number of records written [int]
+    """
+    with ContainerWriter(path) as writer:
+        for ds in datasets:
+            writer.write(ds)
+
+    return len(writer.offsets)
+
+
+def extract_to_container(paths, path):
+    """
+    Extracts the time axis (and bounds) of each netCDF file in `paths` into a
+    container, one file at a time.
+
+    :param paths: sequence of netCDF file paths
+    :param path: path of the container file [string]
+    :return: number of records written [int]
+    """
+    with ContainerWriter(path) as writer:
+        for fpath in paths:
+            ds = utils._netcdf4().Dataset(fpath)
+            try:
+                record, times, bounds = extract_time_axis(ds)
+            finally:
+                ds.close()
+
+            record["time"]["_data"] = times
+            record["time"]["_bounds"] = bounds
+            writer.write(record)
+
+    return len(writer.offsets)
+
+
+def _scan_offsets(buf):
+    """
+    Rebuilds the index of a container without a trailer by following the record sizes.
+    """
+    offsets = []
+    offset = FILE_HEADER.size
+
+    while offset + RECORD_SIZE.size <= buf.size:
+        size, = RECORD_SIZE.unpack_from(buf, offset)
+        if size == 0 or offset + RECORD_SIZE.size + size > buf.size:
+            break
+
+        offsets.append(offset)
+        offset += RECORD_SIZE.size + size
+
+    return np.array(offsets, dtype="<u8")
+
+
+class AxisContainer(object):
+    """
+    Random access to the records of a container, which is memory-mapped.
+    Each item is a dictionary in the CEDA-CC form accepted by the checks (see
+    `decode_record`).
+    """
+
+    def __init__(self, path):
+        """
+
+        :param path: path of the container file [string]
+        """
+        self.path = path
+        self.buf = np.memmap(path, dtype=np.uint8, mode="r")
+
+        magic, version, header_size, _ = FILE_HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a time axis container: {}".format(path))
+        if version > VERSION:
+            raise ValueError("Unsupported time axis container version {} (supported: {}): {}".format(
+                             version, VERSION, path))
+
+        self.version = version
+        self.offsets = self._read_index()
+
+    def _read_index(self):
+        if self.buf.size >= FILE_HEADER.size + TRAILER.size:
+            index_offset, count, magic = TRAILER.unpack_from(self.buf, self.buf.size - TRAILER.size)
+
+            if magic == INDEX_MAGIC:
+                return self.buf[index_offset:index_offset + count * 8].view("<u8")
+
+        return _scan_offsets(self.buf)
+
+    @property
+    def paths(self):
+        return [self[i]["path"] for i in range(len(self))]
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        """
+        Returns the CEDA-CC style dictionary of the `i`th record.
+
+        :param i: index of the record [int]
+        :return: dictionary
+        """
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("Record index out of range: {}".format(i))
+
+        return decode_record(self.buf, int(self.offsets[i]))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,204 @@
+"""
+axis_store.py
+=============
+
+A persisted, columnar store of extracted time axes.
+
+Extracting the time axes of a set of files is done once (`write_axis_store`);
+the checks can then be run (and re-run) against the store without reopening
+any netCDF files.
+
+A store is a directory holding:
+
+    times.f8          - all time axes concatenated [little-endian float64]
+    bounds.f8         - all time bounds concatenated, two values per time step
+                        (files without bounds contribute nothing)
+    offsets.npy       - int64 array of length n+1: axis `i` is times[offsets[i]:offsets[i+1]]
+    bounds_offsets.npy - int64 array of length n+1: bounds of axis `i` are
+                        bounds[bounds_offsets[i]:bounds_offsets[i+1]]
+    index.json        - per-file metadata: path, file name components and
+                        time variable attributes (units, calendar, bounds name...)
+    skipped.json      - the files that could not be read, with the error
+
+The files are written under temporary names and only replace those of an
+earlier store once all the axes have been extracted, the index last, so a
+store is never left with an index that does not match its data.
+
+The data files are memory-mapped on read, so the arrays handed to the checks
+are views into the store rather than copies.
+
+"""
+
+import os
+import json
+
+import numpy as np
+
+from time_checks import utils, time_utils
+
+
+TIMES_FILE = "times.f8"
+BOUNDS_FILE = "bounds.f8"
+OFFSETS_FILE = "offsets.npy"
+BOUNDS_OFFSETS_FILE = "bounds_offsets.npy"
+INDEX_FILE = "index.json"
+SKIPPED_FILE = "skipped.json"
+
+TMP_SUFFIX = ".tmp"
+
+STORE_DTYPE = np.dtype('<f8')
+
+
+def extract_time_axis(ds):
+    """
+    Extracts the time axis, time bounds and metadata from an open netCDF4 Dataset.
+
+    :param ds: netCDF4 Dataset object
+    :return: tuple of: (metadata [dictionary], times [array], bounds [array of shape (n, 2)])
+    """
+    time_var = time_utils.get_time_variable(ds)
+    metadata = utils._get_time_metadata(time_var)
+
+    times = np.ma.filled(time_var[:], np.nan).astype(STORE_DTYPE).ravel()
+    bounds = np.empty((0, 2), dtype=STORE_DTYPE)
+
+    bounds_name = metadata["bounds"]
+    if bounds_name and bounds_name in ds.variables:
+        bounds = np.ma.filled(ds.variables[bounds_name][:], np.nan).astype(STORE_DTYPE).reshape(-1, 2)
+
+    record = {"path": ds.filepath(),
+              "filename": utils.get_file_name_components(ds.filepath()),
+              "time": metadata}
+
+    return record, times, bounds
+
+
+def write_axis_store(paths, store_dir):
+    """
+    Extracts the time axis of each file in `paths` and writes them to a store
+    in `store_dir`, replacing any earlier store there. Axes are appended to the
+    data files one at a time, so only one axis is held in memory at once.
+    Files that cannot be read are recorded in "skipped.json" and left out.
+
+    :param paths: sequence of netCDF file paths
+    :param store_dir: directory to write the store to [string]
+    :return: number of files written [int]
+    """
+    if not os.path.isdir(store_dir):
+        os.makedirs(store_dir)
+
+    def tmp_path(name):
+        return os.path.join(store_dir, name + TMP_SUFFIX)
+
+    index = []
+    skipped = []
+    offsets = [0]
+    bounds_offsets = [0]
+
+    with open(tmp_path(TIMES_FILE), "wb") as times_file, open(tmp_path(BOUNDS_FILE), "wb") as bounds_file:
+
+        for fpath in paths:
+            try:
+                ds = utils._netcdf4().Dataset(fpath)
+                try:
+                    record, times, bounds = extract_time_axis(ds)
+                finally:
+                    ds.close()
+            except Exception as err:
+                skipped.append({"path": fpath, "error": "{}: {}".format(type(err).__name__, err)})
+                continue
+
+            times.tofile(times_file)
+            bounds.tofile(bounds_file)
+
+            index.append(record)
+            offsets.append(offsets[-1] + times.size)
+            bounds_offsets.append(bounds_offsets[-1] + bounds.size)
+
+    for name, values in ((OFFSETS_FILE, offsets), (BOUNDS_OFFSETS_FILE, bounds_offsets)):
+        with open(tmp_path(name), "wb") as w:
+            np.save(w, np.array(values, dtype='<i8'))
+
+    for name, records in ((SKIPPED_FILE, skipped), (INDEX_FILE, index)):
+        with open(tmp_path(name), "w") as w:
+            json.dump(records, w)
+
+    # The index of an earlier store goes first and the new one is put in place last
+    try:
+        os.remove(os.path.join(store_dir, INDEX_FILE))
+    except FileNotFoundError:
+        pass
+
+    for name in (TIMES_FILE, BOUNDS_FILE, OFFSETS_FILE, BOUNDS_OFFSETS_FILE, SKIPPED_FILE, INDEX_FILE):
+        os.replace(tmp_path(name), os.path.join(store_dir, name))
+
+    return len(index)
+
+
+def _map_data_file(fpath):
+    """
+    Memory-maps a data file of the store (read-only). An empty file cannot be
+    mapped so an empty array is returned instead.
+    """
+    if os.path.getsize(fpath) == 0:
+        return np.empty(0, dtype=STORE_DTYPE)
+
+    return np.memmap(fpath, dtype=STORE_DTYPE, mode='r')
+
+
+class AxisStore(object):
+    """
+    Read access to a time axis store written by `write_axis_store`.
+
+    Each item is a dictionary in the CEDA-CC form accepted by the checks, with
+    the time values (and bounds, as "_bounds") as views into the memory-mapped
+    store.
+    """
+
+    def __init__(self, store_dir):
+        """
+
+        :param store_dir: directory holding the store [string]
+        """
+        self.store_dir = store_dir
+
+        with open(os.path.join(store_dir, INDEX_FILE)) as reader:
+            self.index = json.load(reader)
+
+        skipped_path = os.path.join(store_dir, SKIPPED_FILE)
+        if os.path.isfile(skipped_path):
+            with open(skipped_path) as reader:
+                self.skipped = json.load(reader)
+        else:
+            self.skipped = []
+
+        self.offsets = np.load(os.path.join(store_dir, OFFSETS_FILE))
+        self.bounds_offsets = np.load(os.path.join(store_dir, BOUNDS_OFFSETS_FILE))
+        self.times = _map_data_file(os.path.join(store_dir, TIMES_FILE))
+        self.bounds = _map_data_file(os.path.join(store_dir, BOUNDS_FILE)).reshape(-1, 2)
+
+    @property
+    def paths(self):
+        return [record["path"] for record in self.index]
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        """
+        Returns the CEDA-CC style dictionary for the `i`th file in the store.
+
+        :param i: index of the file in the store [int]
+        :return: dictionary
+        """
+        record = self.index[i]
+        time_dict = dict(record["time"])
+
+        time_dict["_data"] = self.times[self.offsets[i]:self.offsets[i + 1]]
+        time_dict["_bounds"] = self.bounds[self.bounds_offsets[i] // 2:self.bounds_offsets[i + 1] // 2]
+
+        return {"time": time_dict, "filename": list(record["filename"])}
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
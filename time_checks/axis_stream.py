@@ -0,0 +1,287 @@
+"""
+axis_stream.py
+==============
+
+Streaming (chunked) checks of very long time axes.
+
+The time variable is read in chunks of a configurable number of steps, and
+the state needed by the checks (the last value, the first step that is not
+valid, the first step that is not increasing, the last upper bound...) is
+carried across the chunk boundaries. The state has a fixed size, so peak
+memory is bounded by the chunk size rather than by the length of the time axis.
+
+The time bounds, if any, are read alongside the time values, and checked to
+contain their time values and to be contiguous.
+
+`StreamedAxis` streams the time axis of an open dataset once, on first use,
+for all the checks that need it.
+
+"""
+
+import numpy as np
+
+from time_checks import calendar_engine, chunk_layout, time_utils, utils
+from time_checks.axis_summary import get_valid_steps
+
+
+DEFAULT_CHUNK_SIZE = 1000000
+
+
+def iter_chunks(var, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Reads a variable (netCDF4 Variable, array or anything that can be sliced)
+    along its first dimension in chunks. Masked values are returned as NaN.
+
+    :param var: variable to read
+    :param chunk_size: number of steps per chunk [int]
+    :return: generator of float64 arrays
+    """
+    for start in range(0, len(var), chunk_size):
+        chunk = var[start:start + chunk_size]
+        yield np.ma.filled(np.ma.asarray(chunk, dtype=np.float64), np.nan)
+
+
+class StreamingAxisState(object):
+    """
+    State of a time axis read in chunks: the count, first and last values, the
+    first step that is not one of the valid steps and the first step that is
+    not strictly increasing.
+
+    If `valid_steps` is not given, the first step of the axis is the only valid
+    step (as in `check_regular_time_axis_increments`).
+
+    If `monthly` is given, each time value is instead checked to be the middle
+    of its month (as in the "midpoints" mode of `check_regular_time_axis_increments`).
+    """
+
+    def __init__(self, valid_steps=None, monthly=None):
+        """
+
+        :param valid_steps: sequence of valid time steps, or None
+        :param monthly: tuple of: (units, calendar, data type name), or None
+        """
+        self.valid_steps = None if valid_steps is None else list(valid_steps)
+        self.monthly = monthly
+        self.month_origin = None
+        self.first_off_midpoint = None
+        self.count = 0
+        self.first = None
+        self.last = None
+        self.first_irregular = None
+        self.first_non_increasing = None
+
+    def update(self, chunk):
+        """
+        Updates the state with the next chunk of time values.
+
+        :param chunk: 1D array of time values
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if chunk.size == 0:
+            return
+
+        if self.first is None:
+            self.first = chunk[0]
+            steps = np.diff(chunk)
+            offset = 1
+
+            if self.monthly is not None:
+                units, calendar, _ = self.monthly
+                self.month_origin = utils.get_month_of_time_value(self.first, units, calendar)
+        else:
+            steps = np.diff(np.concatenate(([self.last], chunk)))
+            offset = 0
+
+        if self.monthly is not None and self.first_off_midpoint is None:
+            units, calendar, type_name = self.monthly
+            self.first_off_midpoint = utils.find_off_month_midpoint(chunk, units, calendar, self.month_origin,
+                                                                    start=self.count, type_name=type_name)
+
+        # Index (in the whole axis) of the time value at the end of each step
+        start_index = self.count + offset
+
+        if steps.size:
+            if self.valid_steps is None:
+                self.valid_steps = [steps[0]]
+
+            if self.first_non_increasing is None:
+                non_increasing = np.flatnonzero(~(steps > 0))
+                if non_increasing.size:
+                    self.first_non_increasing = start_index + int(non_increasing[0])
+
+            if self.first_irregular is None:
+                irregular = np.flatnonzero(~np.isin(steps, self.valid_steps))
+                if irregular.size:
+                    self.first_irregular = (start_index + int(irregular[0]), steps[irregular[0]])
+
+        self.count += chunk.size
+        self.last = chunk[-1]
+
+    def regular_result(self):
+        """
+        :return: tuple of: (boolean [True if all steps are valid], message)
+        """
+        if self.count == 1:
+            return True, "Only one time-step"
+
+        if self.monthly is not None:
+            if self.first_off_midpoint is not None:
+                return False, utils.month_midpoint_message(self.first_off_midpoint)
+
+            return True, ""
+
+        if self.first_irregular is not None:
+            return False, "Time difference {} is irregular or not in allowed values {}".format(
+                self.first_irregular[1], self.valid_steps)
+
+        return True, ""
+
+    def monotonic_result(self):
+        """
+        :return: tuple of: (boolean [True if strictly increasing], message)
+        """
+        if self.first_non_increasing is not None:
+            return False, "Time values are not strictly increasing at index {}".format(self.first_non_increasing)
+
+        return True, ""
+
+
+class StreamingBoundsState(object):
+    """
+    State of time bounds read in chunks alongside the time values: the count,
+    the last upper bound and the first error. Checks that each time value lies
+    within its bounds and that the bounds are contiguous (each lower bound
+    equals the previous upper bound).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.last_upper = None
+        self.first_error = None
+
+    def update(self, times, bounds):
+        """
+        Updates the state with the next chunk of time values and their bounds.
+
+        :param times: 1D array of time values
+        :param bounds: array of bounds, of shape (len(times), 2)
+        """
+        times = np.asarray(times, dtype=np.float64)
+        bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 2)
+
+        if times.size == 0:
+            return
+
+        if self.first_error is None:
+            lower, upper = bounds[:, 0], bounds[:, 1]
+            outside = np.flatnonzero(~((lower <= times) & (times <= upper)))
+
+            if self.last_upper is None:
+                gaps = np.flatnonzero(lower[1:] != upper[:-1]) + 1
+            else:
+                gaps = np.flatnonzero(lower != np.concatenate(([self.last_upper], upper[:-1])))
+
+            errors = [(int(indices[0]), msg) for indices, msg in
+                      ((outside, "Time value outside its bounds"), (gaps, "Time bounds are not contiguous"))
+                      if indices.size]
+            if errors:
+                index, msg = min(errors)
+                self.first_error = (self.count + index, msg)
+
+        self.count += times.size
+        self.last_upper = bounds[-1, 1]
+
+    def result(self):
+        """
+        :return: tuple of: (boolean [True if the bounds are valid], message)
+        """
+        if self.first_error is not None:
+            return False, "{} at index {}".format(self.first_error[1], self.first_error[0])
+
+        return True, ""
+
+
+def get_monthly_midpoints(frequency, calendar, units, type_name, monthly_mode="midpoints"):
+    """
+    Returns the `monthly` argument of StreamingAxisState: whether (and how) the
+    time values are checked to be the middles of their months, as in
+    `check_regular_time_axis_increments`.
+    """
+    if monthly_mode != "midpoints" or get_valid_steps(frequency, calendar) is None:
+        return None
+
+    try:
+        calendar_engine.parse_units(units)
+        calendar_engine.normalise_calendar(calendar)
+    except ValueError:
+        return None
+
+    return units, calendar, type_name
+
+
+def stream_time_axis(ds, chunk_size=DEFAULT_CHUNK_SIZE, frequency_index=1, monthly_mode="midpoints"):
+    """
+    Reads the time variable (and its bounds, if any) of a netCDF4 Dataset in
+    chunks, feeding the regularity, monotonicity and bounds checks as it goes.
+
+    :param ds: netCDF4 Dataset object
+    :param chunk_size: number of time steps read at once [int]
+    :param frequency_index: index of the frequency element in the filename [int]
+    :param monthly_mode: "midpoints" or "steps", as in `check_regular_time_axis_increments` [string]
+    :return: tuple of: (StreamingAxisState, StreamingBoundsState or None)
+    """
+    layout = time_utils.get_time_layout(ds)
+    time_var = ds.variables[layout["time"]]
+    frequency = utils.get_file_name_components(ds.filepath())[frequency_index]
+    calendar = utils._get_nc_attr(time_var, "calendar")
+
+    units = utils._get_nc_attr(time_var, "units")
+    monthly = get_monthly_midpoints(frequency, calendar, units, time_var.dtype.name, monthly_mode)
+
+    axis_state = StreamingAxisState(get_valid_steps(frequency, calendar), monthly=monthly)
+
+    # Reads start and end on storage chunk boundaries
+    storage = chunk_layout.get_chunk_layout(time_var)
+    chunk_size = chunk_layout.aligned_chunk_size(chunk_size, storage)
+
+    bounds_name = layout["bounds"]
+    if bounds_name:
+        bounds_state = StreamingBoundsState()
+        chunks = zip(iter_chunks(time_var, chunk_size), iter_chunks(ds.variables[bounds_name], chunk_size))
+    else:
+        bounds_state = None
+        chunks = ((times, None) for times in iter_chunks(time_var, chunk_size))
+
+    for times, bounds in chunks:
+        axis_state.update(times)
+        if bounds_state is not None:
+            bounds_state.update(times, bounds)
+
+    return axis_state, bounds_state
+
+
+class StreamedAxis(object):
+    """
+    An open netCDF4 Dataset whose time axis is streamed in chunks, once, the
+    first time the states are needed.
+    """
+
+    def __init__(self, ds, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+
+        :param ds: netCDF4 Dataset object
+        :param chunk_size: number of time steps read at once [int]
+        """
+        self.ds = ds
+        self.chunk_size = chunk_size
+        self._states = None
+
+    @property
+    def states(self):
+        """
+        :return: tuple of: (StreamingAxisState, StreamingBoundsState or None)
+        """
+        if self._states is None:
+            self._states = stream_time_axis(self.ds, chunk_size=self.chunk_size)
+
+        return self._states
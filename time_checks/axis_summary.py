@@ -0,0 +1,161 @@
+"""
+axis_summary.py
+===============
+
+Summary of a time axis.
+
+The time values are read once into a float64 array, from which everything
+the file level checks need is derived: the count, first, last, minimum and
+maximum values, whether any values are missing (NaN or fill values), whether
+the axis is strictly increasing, the number of duplicate values, the number
+of valid time steps, a histogram of the other steps and the first few of them.
+
+This is not a single pass over the array: the steps are worked out and then
+compared with zero and with the valid steps, each a vectorized pass. Nothing
+is sorted but the invalid steps (for their histogram), and on a strictly
+increasing axis (the usual case) the missing values, minimum and maximum
+follow from the end points without further passes.
+
+`with_axis_summary` returns a copy of a dataset dictionary holding the
+summary in its "time" part, so that every check run on that copy reads from
+it rather than going over the time values again. The dictionary given is
+left unchanged.
+
+"""
+
+import numpy as np
+
+from time_checks import constants
+
+
+DEFAULT_MAX_IRREGULAR = 10
+
+
+class AxisSummary(object):
+    """
+    Summary of a time axis. `irregular` holds up to `max_irregular` tuples of
+    (index of the time value at the end of the step, step) for the steps that
+    are not in `valid_steps`, and `irregular_histogram` the count of each of
+    those steps (but for the NaN steps next to missing values). `n_duplicates` is only counted on an axis that never
+    decreases (None otherwise).
+    """
+
+    __slots__ = ("values", "count", "first", "last", "min", "max", "has_missing", "increasing",
+                 "n_duplicates", "n_valid_steps", "irregular_histogram", "valid_steps", "steps_key", "irregular")
+
+    def regular_result(self):
+        """
+        :return: tuple of: (boolean [True if all steps are valid], message),
+                 as `utils.calculate_delta_time_series`
+        """
+        if self.irregular:
+            return False, "Time difference {} is irregular or not in allowed values {}".format(
+                self.irregular[0][1], self.valid_steps)
+
+        return True, ""
+
+
+def summarise_axis(times, valid_steps=None, max_irregular=DEFAULT_MAX_IRREGULAR):
+    """
+    Summarises a time axis.
+
+    :param times: time values [list, array or masked array]
+    :param valid_steps: sequence of valid time steps, or None if the first step
+                        of the axis is the only valid step
+    :param max_irregular: maximum number of invalid steps recorded [int]
+    :return: AxisSummary instance
+    """
+    values = np.ma.filled(np.ma.asarray(times, dtype=np.float64), np.nan)
+    steps = np.diff(values)
+
+    summary = AxisSummary()
+    summary.values = values
+    summary.count = values.size
+    summary.first = values[0] if values.size else None
+    summary.last = values[-1] if values.size else None
+    summary.increasing = bool(np.all(steps > 0))
+
+    if summary.increasing and values.size > 1:
+        # No NaN (its steps are not positive), and the end points are the extremes
+        summary.has_missing = False
+        summary.min, summary.max = summary.first, summary.last
+        summary.n_duplicates = 0
+    else:
+        missing = np.isnan(values)
+        summary.has_missing = bool(missing.any())
+
+        present = values[~missing] if summary.has_missing else values
+        summary.min = present.min() if present.size else None
+        summary.max = present.max() if present.size else None
+
+        non_decreasing = not summary.has_missing and bool(np.all(steps >= 0))
+        summary.n_duplicates = int(np.count_nonzero(steps == 0)) if non_decreasing else None
+
+    summary.steps_key = None if valid_steps is None else tuple(valid_steps)
+    if valid_steps is None:
+        valid_steps = [steps[0]] if steps.size else []
+    summary.valid_steps = list(valid_steps)
+
+    invalid = np.flatnonzero(~np.isin(steps, summary.valid_steps))
+    summary.n_valid_steps = steps.size - invalid.size
+    summary.irregular = [(int(index) + 1, steps[index]) for index in invalid[:max_irregular]]
+
+    # Steps next to missing values are left out: they are reported by `has_missing`
+    invalid_steps = steps[invalid]
+    step_values, step_counts = np.unique(invalid_steps[~np.isnan(invalid_steps)], return_counts=True)
+    summary.irregular_histogram = dict(zip(step_values.tolist(), step_counts.tolist()))
+
+    return summary
+
+
+def get_valid_steps(frequency, calendar):
+    """
+    Returns the valid time steps for a frequency (CMOR table) and calendar, as
+    used in `check_regular_time_axis_increments`, or None if the only valid
+    step is the first step of the axis.
+    """
+    if frequency in constants.MONTHLY_TABLES and calendar in constants.IRREGULAR_MONTHLY_CALENDARS:
+        return constants.VALID_MONTHLY_TIME_DIFFERENCES
+
+    return None
+
+
+def _valid_steps_for(ds, frequency_index):
+    return get_valid_steps(ds["filename"][frequency_index], ds["time"]["calendar"])
+
+
+def with_axis_summary(ds, frequency_index=1):
+    """
+    Summarises the time axis of a dataset dictionary and returns a copy of the
+    dictionary holding the summary (as ds["time"]["_summary"], replacing any
+    summary already there). The time values are shared, not copied.
+
+    :param ds: dataset dictionary (CEDA-CC style)
+    :param frequency_index: index of the frequency element in the filename [int]
+    :return: dataset dictionary
+    """
+    summary = summarise_axis(ds["time"]["_data"], _valid_steps_for(ds, frequency_index))
+
+    summarised = dict(ds)
+    summarised["time"] = dict(ds["time"], _summary=summary)
+    return summarised
+
+
+def get_axis_summary(ds, frequency_index=1):
+    """
+    Returns the summary of the time axis of a dataset dictionary: the one
+    held by a copy from `with_axis_summary` if it was made with the same
+    valid steps, otherwise a new one.
+
+    :param ds: dataset dictionary (CEDA-CC style)
+    :param frequency_index: index of the frequency element in the filename [int]
+    :return: AxisSummary instance
+    """
+    valid_steps = _valid_steps_for(ds, frequency_index)
+    steps_key = None if valid_steps is None else tuple(valid_steps)
+
+    summary = ds["time"].get("_summary")
+    if summary is not None and summary.steps_key == steps_key:
+        return summary
+
+    return summarise_axis(ds["time"]["_data"], valid_steps)
@@ -0,0 +1,117 @@
+"""
+cache.py
+========
+
+A bounded, least recently used cache that keeps hit/miss/eviction counters
+per group of keys (e.g. per calendar, or per check). It is safe to share
+between threads.
+
+"""
+
+import threading
+from collections import OrderedDict
+
+
+def _new_counters():
+    return {"hits": 0, "misses": 0, "evictions": 0}
+
+
+class LRUCache(object):
+    """
+    Bounded least recently used cache. Each key can be given a `group` when it
+    is looked up or stored, and hits, misses and evictions are counted per group.
+    """
+
+    def __init__(self, maxsize=65536):
+        """
+
+        :param maxsize: maximum number of items held [int]
+        """
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def _group_counters(self, group):
+        try:
+            return self._counters[group]
+        except KeyError:
+            counters = self._counters[group] = _new_counters()
+            return counters
+
+    def get(self, key, default=None, group=None):
+        """
+        Returns the cached value for `key`, or `default` if it is not cached.
+
+        :param key: hashable key
+        :param default: value returned on a miss
+        :param group: group the hit or miss is counted against
+        :return: cached value or `default`
+        """
+        with self._lock:
+            try:
+                value, _ = self._items[key]
+            except KeyError:
+                self._group_counters(group)["misses"] += 1
+                return default
+
+            self._items.move_to_end(key)
+            self._group_counters(group)["hits"] += 1
+            return value
+
+    def put(self, key, value, group=None):
+        """
+        Caches `value` for `key`, evicting the least recently used item if full.
+
+        :param key: hashable key
+        :param value: value to cache
+        :param group: group the key belongs to (evictions are counted against it)
+        """
+        with self._lock:
+            self._items[key] = (value, group)
+            self._items.move_to_end(key)
+
+            if len(self._items) > self.maxsize:
+                _, (_, evicted_group) = self._items.popitem(last=False)
+                self._group_counters(evicted_group)["evictions"] += 1
+
+    def clear(self):
+        """
+        Empties the cache and resets all counters.
+        """
+        with self._lock:
+            self._items.clear()
+            self._counters.clear()
+
+    def stats(self, group=None):
+        """
+        Returns the counters for one group, or the totals over all groups (with
+        the current size of the cache) if `group` is not given.
+
+        :param group: group name
+        :return: dictionary of: hits, misses, evictions [and size]
+        """
+        with self._lock:
+            if group is not None:
+                return dict(self._counters.get(group, _new_counters()))
+
+            totals = _new_counters()
+            for counters in self._counters.values():
+                for name in totals:
+                    totals[name] += counters[name]
+
+            totals["size"] = len(self._items)
+            return totals
+
+    def group_stats(self):
+        """
+        :return: dictionary of counters for each group
+        """
+        with self._lock:
+            return dict((group, dict(counters)) for group, counters in self._counters.items())
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
@@ -0,0 +1,350 @@
+"""
+calendar_engine.py
+==================
+
+Vectorized calendar arithmetic with NumPy.
+
+Converts whole arrays of numeric time offsets (e.g. the values of a time
+variable) to year/month/day/hour/minute/second/microsecond components, and
+back, using integer array arithmetic on precomputed month-length and
+cumulative-day tables instead of building one cftime object per value.
+
+Supported calendars are the CF calendars used in CMIP:
+
+    360_day
+    noleap, 365_day
+    all_leap, 366_day
+    julian
+    proleptic_gregorian
+    standard, gregorian (Julian before 1582-10-15, Gregorian from then on)
+
+Only AD times are supported (years from 1 onwards), as in the rest of the library.
+Dates match `cftime.num2date` and `cftime.date2num`. Times are computed in
+exact integer microseconds, so they can differ from cftime (which accumulates
+floating point error in its date arithmetic) by a few microseconds.
+
+"""
+
+import re
+
+import numpy as np
+
+
+CALENDAR_ALIASES = {'gregorian': 'standard',
+                    '': 'standard',
+                    '365_day': 'noleap',
+                    '366_day': 'all_leap'}
+
+SUPPORTED_CALENDARS = ['standard', 'proleptic_gregorian', 'julian', 'noleap', 'all_leap', '360_day']
+
+MICROSECONDS_PER_DAY = 86400 * 1000000
+
+UNIT_MICROSECONDS = {'days': MICROSECONDS_PER_DAY,
+                     'hours': 3600 * 1000000,
+                     'minutes': 60 * 1000000,
+                     'seconds': 1000000,
+                     'milliseconds': 1000,
+                     'microseconds': 1}
+
+UNIT_ALIASES = {'day': 'days', 'd': 'days',
+                'hour': 'hours', 'hr': 'hours', 'h': 'hours',
+                'minute': 'minutes', 'min': 'minutes',
+                'second': 'seconds', 'sec': 'seconds', 's': 'seconds',
+                'millisecond': 'milliseconds', 'msec': 'milliseconds', 'ms': 'milliseconds',
+                'microsecond': 'microseconds', 'usec': 'microseconds', 'us': 'microseconds'}
+
+_UNITS_REGEX = re.compile(r'^\s*(\w+)\s+since\s+(\d+)-(\d{1,2})-(\d{1,2})'
+                          r'(?:[ T]+(\d{1,2}):(\d{1,2})(?::(\d{1,2})(?:\.(\d{1,6})\d*)?)?)?'
+                          r'\s*(?:Z|UTC|[+-]0{1,2}(?::?00)?)?\s*$')
+
+# Month lengths and cumulative days at the start of each month (13 values, the last is the year length)
+_MONTH_LENGTHS = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=np.int64)
+_MONTH_LENGTHS_LEAP = _MONTH_LENGTHS + np.array([0, 1] + [0] * 10, dtype=np.int64)
+_MONTH_LENGTHS_360 = np.full(12, 30, dtype=np.int64)
+
+_CUMULATIVE_DAYS = np.concatenate([[0], np.cumsum(_MONTH_LENGTHS)])
+_CUMULATIVE_DAYS_LEAP = np.concatenate([[0], np.cumsum(_MONTH_LENGTHS_LEAP)])
+
+# Days in 4, 100 and 400 year cycles
+_DAYS_4_YEARS = 4 * 365 + 1
+_DAYS_100_YEARS = 25 * _DAYS_4_YEARS - 1
+_DAYS_400_YEARS = 4 * _DAYS_100_YEARS + 1
+
+
+def normalise_calendar(calendar):
+    """
+    Returns the canonical name of a calendar (e.g. "gregorian" -> "standard").
+
+    :param calendar: calendar [string]
+    :return: calendar [string]
+    """
+    calendar = CALENDAR_ALIASES.get((calendar or '').lower(), (calendar or '').lower())
+
+    if calendar not in SUPPORTED_CALENDARS:
+        raise ValueError("Calendar not supported: {}".format(calendar))
+
+    return calendar
+
+
+def parse_units(units):
+    """
+    Parses CF time units of the form "<unit> since <reference date/time>".
+
+    :param units: time units [string]
+    :return: tuple of: (microseconds per unit, (year, month, day, hour, minute, second, microsecond))
+    """
+    match = _UNITS_REGEX.match(units)
+    if not match:
+        raise ValueError("Cannot parse time units: {}".format(units))
+
+    unit = match.group(1).lower()
+    unit = UNIT_ALIASES.get(unit, unit)
+
+    if unit not in UNIT_MICROSECONDS:
+        raise ValueError("Time unit not recognised: {}".format(match.group(1)))
+
+    reference = [int(comp or 0) for comp in match.groups()[1:7]]
+    fraction = match.group(8) or ''
+    reference.append(int(fraction.ljust(6, '0')) if fraction else 0)
+
+    return UNIT_MICROSECONDS[unit], tuple(reference)
+
+
+def is_leap_year(year, calendar):
+    """
+    Returns a boolean array that is True for leap years in `calendar`.
+
+    :param year: year(s) [int or array]
+    :param calendar: calendar [string]
+    :return: boolean array
+    """
+    calendar = normalise_calendar(calendar)
+    year = np.asarray(year, dtype=np.int64)
+
+    if calendar == 'all_leap':
+        return np.ones(year.shape, dtype=bool)
+    elif calendar in ('noleap', '360_day'):
+        return np.zeros(year.shape, dtype=bool)
+
+    julian_leap = (year % 4 == 0)
+    gregorian_leap = julian_leap & ((year % 100 != 0) | (year % 400 == 0))
+
+    if calendar == 'julian':
+        return julian_leap
+    elif calendar == 'proleptic_gregorian':
+        return gregorian_leap
+
+    return np.where(year < 1583, julian_leap, gregorian_leap)
+
+
+def month_lengths(year, month, calendar):
+    """
+    Returns the number of days in each (year, month) in `calendar`.
+
+    :param year: year(s) [int or array]
+    :param month: month(s) [int or array]
+    :param calendar: calendar [string]
+    :return: int64 array
+    """
+    calendar = normalise_calendar(calendar)
+    year, month = np.broadcast_arrays(np.asarray(year, dtype=np.int64), np.asarray(month, dtype=np.int64))
+
+    if calendar == '360_day':
+        return _MONTH_LENGTHS_360[month - 1]
+
+    lengths = np.where(is_leap_year(year, calendar), _MONTH_LENGTHS_LEAP[month - 1], _MONTH_LENGTHS[month - 1])
+
+    if calendar == 'standard':
+        # October 1582 lost 10 days in the change from the Julian to the Gregorian calendar
+        lengths = np.where((year == 1582) & (month == 10), lengths - 10, lengths)
+
+    return lengths
+
+
+def _day_of_year(year, month, day, leap):
+    return np.where(leap, _CUMULATIVE_DAYS_LEAP[month - 1], _CUMULATIVE_DAYS[month - 1]) + day - 1
+
+
+def _month_and_day(day_of_year, leap):
+    cumulative = np.where(leap[..., None], _CUMULATIVE_DAYS_LEAP[1:], _CUMULATIVE_DAYS[1:])
+    month = (day_of_year[..., None] >= cumulative).sum(axis=-1) + 1
+    start = np.where(leap, _CUMULATIVE_DAYS_LEAP[month - 1], _CUMULATIVE_DAYS[month - 1])
+    return month, day_of_year - start + 1
+
+
+def _julian_days(year, month, day):
+    years = year - 1
+    leap = (year % 4 == 0)
+    return years * 365 + years // 4 + _day_of_year(year, month, day, leap)
+
+
+def _gregorian_days(year, month, day):
+    years = year - 1
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    return years * 365 + years // 4 - years // 100 + years // 400 + _day_of_year(year, month, day, leap)
+
+
+def _julian_date(days):
+    cycles, days = np.divmod(days, _DAYS_4_YEARS)
+    years = np.minimum(days // 365, 3)
+    days = days - years * 365
+
+    year = cycles * 4 + years + 1
+    month, day = _month_and_day(days, year % 4 == 0)
+    return year, month, day
+
+
+def _gregorian_date(days):
+    cycles_400, days = np.divmod(days, _DAYS_400_YEARS)
+    cycles_100 = np.minimum(days // _DAYS_100_YEARS, 3)
+    days = days - cycles_100 * _DAYS_100_YEARS
+    cycles_4, days = np.divmod(days, _DAYS_4_YEARS)
+    years = np.minimum(days // 365, 3)
+    days = days - years * 365
+
+    year = cycles_400 * 400 + cycles_100 * 100 + cycles_4 * 4 + years + 1
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month, day = _month_and_day(days, leap)
+    return year, month, day
+
+
+# Day number (in the Julian count) of the first Gregorian day in the "standard" calendar: 1582-10-15
+_GREGORIAN_START = int(_julian_days(np.int64(1582), np.int64(10), np.int64(4))) + 1
+_GREGORIAN_OFFSET = _GREGORIAN_START - int(_gregorian_days(np.int64(1582), np.int64(10), np.int64(15)))
+
+
+def date_to_days(year, month, day, calendar):
+    """
+    Converts dates to day numbers, counted from 0001-01-01 (day 0) in `calendar`.
+
+    :param year: year(s) [int or array]
+    :param month: month(s) [int or array]
+    :param day: day(s) [int or array]
+    :param calendar: calendar [string]
+    :return: int64 array of day numbers
+    """
+    calendar = normalise_calendar(calendar)
+    year, month, day = [np.asarray(comp, dtype=np.int64) for comp in (year, month, day)]
+
+    if calendar == '360_day':
+        return (year - 1) * 360 + (month - 1) * 30 + day - 1
+    elif calendar in ('noleap', 'all_leap'):
+        leap = calendar == 'all_leap'
+        return (year - 1) * (365 + leap) + _day_of_year(year, month, day, np.asarray(leap))
+    elif calendar == 'julian':
+        return _julian_days(year, month, day)
+    elif calendar == 'proleptic_gregorian':
+        return _gregorian_days(year, month, day)
+
+    gregorian = (year * 10000 + month * 100 + day) >= 15821015
+    return np.where(gregorian, _gregorian_days(year, month, day) + _GREGORIAN_OFFSET,
+                    _julian_days(year, month, day))
+
+
+def days_to_date(days, calendar):
+    """
+    Converts day numbers, counted from 0001-01-01 (day 0), to dates in `calendar`.
+
+    :param days: day number(s) [int or array]
+    :param calendar: calendar [string]
+    :return: tuple of int64 arrays: (year, month, day)
+    """
+    calendar = normalise_calendar(calendar)
+    days = np.asarray(days, dtype=np.int64)
+
+    if calendar == '360_day':
+        years, days = np.divmod(days, 360)
+        months, days = np.divmod(days, 30)
+        return years + 1, months + 1, days + 1
+    elif calendar in ('noleap', 'all_leap'):
+        leap = np.full(days.shape, calendar == 'all_leap')
+        years, days = np.divmod(days, 365 + (calendar == 'all_leap'))
+        month, day = _month_and_day(days, leap)
+        return years + 1, month, day
+    elif calendar == 'julian':
+        return _julian_date(days)
+    elif calendar == 'proleptic_gregorian':
+        return _gregorian_date(days)
+
+    gregorian = days >= _GREGORIAN_START
+    julian_date = _julian_date(days)
+    gregorian_date = _gregorian_date(days - _GREGORIAN_OFFSET)
+    return tuple(np.where(gregorian, g, j) for g, j in zip(gregorian_date, julian_date))
+
+
+def num2components(values, units, calendar):
+    """
+    Converts numeric time values to date/time components. Vectorized
+    equivalent of `cftime.num2date`.
+
+    :param values: time value(s) [number or array]
+    :param units: time units [string]
+    :param calendar: calendar [string]
+    :return: dictionary of int64 arrays: year, month, day, hour, minute, second, microsecond
+    """
+    unit_us, (ref_year, ref_month, ref_day, ref_hour, ref_minute, ref_second, ref_us) = parse_units(units)
+
+    ref_days = date_to_days(ref_year, ref_month, ref_day, calendar)
+    ref_time_us = ((ref_hour * 60 + ref_minute) * 60 + ref_second) * 1000000 + ref_us
+
+    values = np.asarray(values, dtype=np.float64)
+    total_us = np.rint(values * unit_us).astype(np.int64)
+
+    if unit_us >= 1000000:
+        # As cftime: snap values 1 microsecond either side of a whole second to the second
+        remainder = total_us % 1000000
+        total_us = np.where(remainder == 1, total_us - 1, total_us)
+        total_us = np.where(remainder == 999999, total_us + 1, total_us)
+
+    total_us += ref_time_us
+
+    days, time_us = np.divmod(total_us, MICROSECONDS_PER_DAY)
+    year, month, day = days_to_date(days + ref_days, calendar)
+
+    seconds, microsecond = np.divmod(time_us, 1000000)
+    minutes, second = np.divmod(seconds, 60)
+    hour, minute = np.divmod(minutes, 60)
+
+    return {"year": year, "month": month, "day": day, "hour": hour,
+            "minute": minute, "second": second, "microsecond": microsecond}
+
+
+def components2num(units, calendar, year, month=1, day=1, hour=0, minute=0, second=0, microsecond=0):
+    """
+    Converts date/time components to numeric time values. Vectorized
+    equivalent of `cftime.date2num`.
+
+    :param units: time units [string]
+    :param calendar: calendar [string]
+    :param year, month, day, hour, minute, second, microsecond: components [int or array]
+    :return: float64 array of time values
+    """
+    unit_us, (ref_year, ref_month, ref_day, ref_hour, ref_minute, ref_second, ref_us) = parse_units(units)
+
+    days = date_to_days(year, month, day, calendar) - date_to_days(ref_year, ref_month, ref_day, calendar)
+    time_us = ((np.asarray(hour, dtype=np.int64) * 60 + minute) * 60 + second) * 1000000 + microsecond
+    ref_time_us = ((ref_hour * 60 + ref_minute) * 60 + ref_second) * 1000000 + ref_us
+
+    total_us = days * MICROSECONDS_PER_DAY + time_us - ref_time_us
+    return total_us / float(unit_us)
+
+
+def month_midpoints(units, calendar, year, month, count, start=0):
+    """
+    Returns the time values of the middle of consecutive months (half way
+    between the start of each month and the start of the next), as used for
+    the time values of monthly CMIP data.
+
+    :param units: time units [string]
+    :param calendar: calendar [string]
+    :param year: year of the first month [int]
+    :param month: first month [int]
+    :param count: number of months [int]
+    :param start: number of months after the first month to start from [int]
+    :return: float64 array of time values
+    """
+    index = month - 1 + start + np.arange(count, dtype=np.int64)
+    starts = components2num(units, calendar, year + index // 12, index % 12 + 1)
+    ends = components2num(units, calendar, year + (index + 1) // 12, (index + 1) % 12 + 1)
+
+    return (starts + ends) / 2.
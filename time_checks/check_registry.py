@@ -0,0 +1,156 @@
+"""
+check_registry.py
+=================
+
+Registry of checks with their dependencies and estimated costs, and a
+scheduler that runs them cheapest first.
+
+Each check declares what it takes as input:
+
+    "path": the file path
+    "name": a dataset dictionary holding only the file name components
+    "header": the open dataset, for checks of its metadata only (by default
+              the same as "data")
+    "data": the full dataset dictionary (the file has to be read)
+
+The scheduler runs the checks in order of cost (a check always runs after
+the checks it depends on). With short-circuiting on, a check whose
+prerequisites did not pass is not run and is recorded as SKIPPED; the data
+is only read if a "data" check is still to be run, so files that already
+failed their file name checks are never opened.
+
+A check that raises an exception is recorded as FAILED with the exception as
+its message, so that its dependents are skipped rather than the whole run
+stopping. If the data (or header) cannot be loaded, every "data" (or
+"header") check still to be run is recorded as FAILED with the error.
+
+"""
+
+import time
+from collections import OrderedDict, namedtuple
+
+from time_checks import utils
+from time_checks.results import CheckResult, OK, FAILED, SKIPPED
+
+
+INPUT_TYPES = ("path", "name", "header", "data")
+
+CheckSpec = namedtuple("CheckSpec", ["code", "name", "func", "takes", "depends", "cost"])
+
+
+class CheckRegistry(object):
+    """
+    Ordered registry of checks. The registration order is the order in which
+    results are reported.
+    """
+
+    def __init__(self):
+        self.checks = OrderedDict()
+
+    def register(self, code, name, func, takes="data", depends=(), cost=1.):
+        """
+        Registers a check.
+
+        :param code: error code, e.g. "T1.004" [string]
+        :param name: check name [string]
+        :param func: callable taking the input below and returning a CheckResult
+        :param takes: "path", "name", "header" or "data" [string]
+        :param depends: codes of the checks that must pass before this one is run
+        :param cost: estimated relative cost [float]
+        """
+        if takes not in INPUT_TYPES:
+            raise ValueError("Check input must be one of {}, not: {}".format(INPUT_TYPES, takes))
+
+        unknown = [dep for dep in depends if dep not in self.checks]
+        if unknown:
+            raise ValueError("Check {} depends on unregistered checks: {}".format(code, unknown))
+
+        self.checks[code] = CheckSpec(code, name, func, takes, tuple(depends), cost)
+
+    def select(self, codes=None, takes=INPUT_TYPES):
+        """
+        Returns the specs of the checks with the given codes (all if None) and
+        input types, in registration order.
+        """
+        return [spec for code, spec in self.checks.items()
+                if (codes is None or code in codes) and spec.takes in takes]
+
+    def plan(self, codes=None, takes=INPUT_TYPES):
+        """
+        Returns the specs of the selected checks in the order they are run:
+        cheapest first, each after the checks it depends on.
+
+        :return: list of CheckSpec
+        """
+        remaining = self.select(codes, takes)
+        selected = set(spec.code for spec in remaining)
+        planned, done = [], set()
+
+        while remaining:
+            ready = [spec for spec in remaining if all(dep in done or dep not in selected for dep in spec.depends)]
+            spec = min(ready, key=lambda spec: spec.cost)
+
+            planned.append(spec)
+            done.add(spec.code)
+            remaining.remove(spec)
+
+        return planned
+
+
+def _not_run_message(err):
+    return "Check could not be run: {}: {}".format(type(err).__name__, err)
+
+
+def run_checks(registry, ifile, load_data, codes=None, takes=INPUT_TYPES, short_circuit=True, load_header=None):
+    """
+    Runs the checks of a registry on a file.
+
+    :param registry: CheckRegistry instance
+    :param ifile: file name or path [string]
+    :param load_data: callable returning the dataset dictionary, called at most
+                      once and only if a "data" check is run
+    :param codes: codes of the checks to run (default: all) [sequence]
+    :param takes: input types of the checks to run [sequence]
+    :param short_circuit: skip checks whose prerequisites did not pass [boolean]
+    :param load_header: callable returning the input of the "header" checks, called
+                        at most once (default: the data, from `load_data`)
+    :return: list of CheckResult objects, in registration order. The time taken
+             to load the data is included in the duration of the first data check
+    """
+    inputs = {"path": ifile, "name": {"filename": utils.get_file_name_components(ifile)}}
+    results = {}
+    loaders = {"data": load_data, "header": load_header}
+    load_errors = {}
+
+    for spec in registry.plan(codes, takes):
+        not_passed = [dep for dep in spec.depends if dep in results and results[dep].status != OK]
+
+        if short_circuit and not_passed:
+            results[spec.code] = CheckResult(spec.code, spec.name, SKIPPED,
+                                             "Prerequisite checks not passed: {}".format(", ".join(not_passed)),
+                                             key=ifile)
+            continue
+
+        source = "data" if spec.takes == "header" and load_header is None else spec.takes
+
+        # Timed from before the load, so that the durations add up to the cost of the file
+        start = time.perf_counter()
+        if source not in inputs and source not in load_errors:
+            try:
+                inputs[source] = loaders[source]()
+            except Exception as err:
+                load_errors[source] = _not_run_message(err)
+
+        if source not in inputs:
+            result = CheckResult(spec.code, spec.name, FAILED, load_errors[source])
+        else:
+            try:
+                result = spec.func(inputs[source])
+            except Exception as err:
+                result = CheckResult(spec.code, spec.name, FAILED, _not_run_message(err))
+
+        result.duration = time.perf_counter() - start
+        result.key = ifile
+        results[spec.code] = result
+
+    return [results[spec.code] for spec in registry.select(codes, takes) if spec.code in results]
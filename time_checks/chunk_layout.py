@@ -0,0 +1,122 @@
+"""
+chunk_layout.py
+===============
+
+Storage layout of the time variable in netCDF4/HDF5 files, and reads aligned
+to it.
+
+The (unlimited) time variable is often stored in chunks of a single step.
+Each chunk is then a separate lookup and read (and, if the variable is
+compressed, a separate decompression), so reading the time axis of a long
+file costs one small read per time step: on a parallel filesystem such files
+are by far the slowest to check. Files in netCDF3 formats, or with a
+contiguous time variable, are read in one go.
+
+Chunked reads (see `axis_stream.py`) are aligned to whole storage chunks so
+that no chunk is read (and decompressed) twice. A single read of the whole
+axis touches each chunk once, so it gains nothing from a larger chunk cache:
+only a better layout makes such files faster to read.
+
+`check_time_chunk_layout` reports time variables stored in chunks of fewer
+than `MIN_CHUNK_LENGTH` steps, so that they can be named to the data
+providers.
+
+"""
+
+from collections import namedtuple
+
+
+# Time variables chunked in fewer steps than this (and longer than one chunk) are reported
+MIN_CHUNK_LENGTH = 64
+
+ChunkLayout = namedtuple("ChunkLayout", ["length", "chunk_length", "filters", "itemsize"])
+
+
+def get_chunk_layout(var):
+    """
+    Returns the storage layout of a (time) variable along its first dimension.
+
+    :param var: netCDF4 Variable object
+    :return: ChunkLayout: chunk_length is None for contiguous (or netCDF3)
+             storage, filters is the list of the filters applied (e.g. ["zlib", "shuffle"])
+    """
+    chunking = var.chunking() if var.ndim else None
+    chunk_length = None if chunking in (None, "contiguous") else int(chunking[0])
+
+    filters = var.filters() or {}
+    names = sorted(name for name, value in filters.items() if value and name != "complevel")
+
+    return ChunkLayout(len(var), chunk_length, names, var.dtype.itemsize)
+
+
+def layout_as_dict(layout):
+    """
+    Returns a ChunkLayout as a dictionary, to be stored in a dataset dictionary.
+    """
+    return {"length": layout.length, "chunk_length": layout.chunk_length, "filters": list(layout.filters),
+            "itemsize": layout.itemsize}
+
+
+def n_chunks(layout):
+    """
+    Returns the number of storage chunks along the first dimension (1 if contiguous).
+    """
+    if layout.chunk_length is None:
+        return 1
+
+    return -(-layout.length // layout.chunk_length)
+
+
+def is_pathological(layout, min_chunk_length=MIN_CHUNK_LENGTH):
+    """
+    Returns True if the variable is stored in more than one chunk of fewer
+    than `min_chunk_length` steps.
+    """
+    return layout.chunk_length is not None and layout.chunk_length < min_chunk_length and n_chunks(layout) > 1
+
+
+def aligned_chunk_size(chunk_size, layout):
+    """
+    Returns the number of steps to read at once, for reads of about
+    `chunk_size` steps, so that reads start and end on storage chunk
+    boundaries: `chunk_size` rounded down to a whole number of chunks (at
+    least one chunk).
+
+    :param chunk_size: wanted number of steps per read [int]
+    :param layout: ChunkLayout
+    :return: number of steps per read [int]
+    """
+    if layout.chunk_length is None:
+        return chunk_size
+
+    return max(chunk_size // layout.chunk_length, 1) * layout.chunk_length
+
+
+def read_time_values(var):
+    """
+    Reads a whole time variable and its storage layout.
+
+    :param var: netCDF4 Variable object
+    :return: tuple of: (values [numpy (masked) array], ChunkLayout)
+    """
+    return var[:], get_chunk_layout(var)
+
+
+def check_time_chunk_layout(layout, min_chunk_length=MIN_CHUNK_LENGTH):
+    """
+    Checks that the time variable is not stored in many small chunks.
+
+    :param layout: ChunkLayout, or None if the layout is not known
+    :param min_chunk_length: smallest chunk length not reported [int]
+    :return: tuple of: (boolean [True for success], message), or (None, message) if the layout is not known
+    """
+    if layout is None:
+        return None, "Storage layout of the time variable is not known"
+
+    if not is_pathological(layout, min_chunk_length):
+        return True, ""
+
+    compressed = " compressed ({})".format(", ".join(layout.filters)) if layout.filters else ""
+    return False, ("Time variable of {} steps is stored in {} chunks of {} step(s){}: each chunk is a separate "
+                   "read. Chunks of at least {} steps (or contiguous storage) are recommended".format(
+                       layout.length, n_chunks(layout), layout.chunk_length, compressed, min_chunk_length))
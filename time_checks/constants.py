@@ -27,9 +27,15 @@ CMOR_TABLES_FORMAT = {'3hr': 12,
                       'cfSites': 0,
                       'fx': 0,
                       }
+CALENDARS = ['gregorian', 'standard', 'proleptic_gregorian', 'noleap', '365_day', 'julian',
+             'all_leap', '366_day', '360_day']
+MONTHLY_TABLES = ['Amon', 'Omon', 'Lmon', 'LImon', 'OImon', 'cfMon']
 IRREGULAR_MONTHLY_CALENDARS = ['gregorian', 'proleptic_gregorian', 'julian', 'noleap', '365_day', 'standard']
 VALID_MONTHLY_TIME_DIFFERENCES = [29.5, 30.5, 30.0, 31.0]
 
+# Tolerance (in days) of monthly time values from the middle of their month
+MONTHLY_MIDPOINT_TOLERANCE = 0.01
+
 FREQUENCY_MAPPINGS = {
     '3hr': (0.125, 'day'),
     '6hrLev': (0.25, 'day'),
@@ -49,4 +55,9 @@ FREQUENCY_MAPPINGS = {
     'cfSites': None,
     'day': (1, 'day'),
     'fx': None
-}
\ No newline at end of file
+}
+
+# Facets of the directory levels below the root of a CMIP5 DRS archive, e.g.:
+# /badc/cmip5/data/cmip5/output1/MOHC/HadGEM2-ES/historical/mon/atmos/Amon/r1i1p1/latest/tas/
+CMIP5_DRS_FACETS = ['activity', 'product', 'institute', 'model', 'experiment', 'frequency',
+                    'realm', 'table', 'ensemble', 'version', 'variable']
@@ -0,0 +1,294 @@
+"""
+crawler.py
+==========
+
+Crawler of DRS (Data Reference Syntax) archives, such as:
+
+    /badc/cmip5/data/cmip5/output1/<institute>/<model>/<experiment>/<frequency>/
+        <realm>/<table>/<ensemble>/<version>/<variable>/<file>.nc
+
+Directories are listed with `os.scandir` in a pool of threads, and records of
+(dataset id, file path) are yielded as soon as each leaf directory is listed,
+so checking can start while the crawl is still running.
+
+Each directory level is a facet. Facet filters prune the walk as early as
+possible: a directory whose facet value does not match is never listed.
+
+Symbolic links to directories (e.g. `latest` -> `v20110101`) are resolved so
+that a directory is only walked once. Where both the link and its target are
+in the same directory, the target is walked under its own name.
+
+A checkpoint journal can be given: each directory is recorded in it once all
+of its files (and those of its subdirectories) have been yielded and consumed.
+A crawl started with the same journal skips the recorded directories, so an
+interrupted crawl resumes where it stopped. When the files are checked in
+batches after they are consumed, the crawler is created with `deferred=True`
+and the files are passed to `acknowledge` once checked: a directory is then
+only recorded once all of its files have been acknowledged, so files whose
+batch was interrupted are crawled again.
+
+"""
+
+import os
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from time_checks import constants
+
+
+DEFAULT_WORKERS = 16
+
+# Directories never walked: on the CEDA archive, "files" directories hold the
+# files that the version directories link to.
+SKIPPED_DIR_NAMES = ['files']
+
+
+def read_journal(journal):
+    """
+    Reads the completed directories from a checkpoint journal.
+
+    :param journal: path to the journal file [string]
+    :return: set of directory paths
+    """
+    if not journal or not os.path.isfile(journal):
+        return set()
+
+    with open(journal) as reader:
+        return set(line.rstrip("\n") for line in reader if line.endswith("\n"))
+
+
+def _scan_dir(path):
+    """
+    Lists a directory.
+
+    :param path: directory path [string]
+    :return: tuple of: (list of file names, list of directory names,
+             dictionary of {directory name: real path} for symbolic links)
+    """
+    files, dirs, links = [], [], {}
+
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return files, dirs, links
+
+    for entry in entries:
+        try:
+            if entry.is_dir():
+                dirs.append(entry.name)
+                if entry.is_symlink():
+                    links[entry.name] = os.path.realpath(entry.path)
+            elif entry.is_file():
+                files.append(entry.name)
+        except OSError:
+            continue
+
+    return sorted(files), sorted(dirs), links
+
+
+class DRSCrawler(object):
+    """
+    Crawls a DRS archive and yields tuples of (dataset id, file path).
+
+    The dataset id is the facet values of the directories of the file joined
+    with ".", e.g. "cmip5.output1.MOHC.HadGEM2-ES.historical.mon.atmos.Amon.r1i1p1.v20110101.tas".
+    """
+
+    def __init__(self, root, facets=constants.CMIP5_DRS_FACETS, filters=None, pattern="*.nc",
+                 workers=DEFAULT_WORKERS, journal=None, deferred=False):
+        """
+
+        :param root: root directory of the archive [string]
+        :param facets: names of the facets of the directory levels below `root`
+        :param filters: dictionary of {facet: list of allowed values}, values may be
+                        glob patterns (e.g. {"table": ["Amon", "Omon"], "ensemble": ["r1i*"]})
+        :param pattern: glob pattern of the file names to yield [string]
+        :param workers: number of threads listing directories [int]
+        :param journal: path to the checkpoint journal, or None [string]
+        :param deferred: only record a directory in the journal once all of its
+                         files have been passed to `acknowledge` [boolean]
+        """
+        self.root = os.path.normpath(root)
+        self.facets = list(facets)
+        self.filters = dict(filters or {})
+        self.pattern = pattern
+        self.workers = workers
+        self.journal = journal
+        self.deferred = deferred
+
+        unknown = set(self.filters) - set(self.facets)
+        if unknown:
+            raise ValueError("Unknown facets in filters: {}".format(sorted(unknown)))
+
+        # Real paths of the directories walked (the listing threads only list,
+        # all bookkeeping is done in the thread running the generator)
+        self._visited = set()
+
+        # Number of unfinished subdirectories (plus 1 for its own files) per directory
+        self._remaining = {}
+        self._parents = {}
+
+        # Number of files yielded but not yet acknowledged per directory (if deferred)
+        self._unacknowledged = {}
+        self._journal = None
+
+    def _allowed(self, depth, name):
+        if name in SKIPPED_DIR_NAMES:
+            return False
+
+        if depth >= len(self.facets):
+            return False
+
+        allowed = self.filters.get(self.facets[depth])
+        if allowed is None:
+            return True
+
+        return any(fnmatch.fnmatchcase(name, value) for value in allowed)
+
+    def _visit(self, real_path):
+        """
+        Returns True the first time a real directory path is visited.
+        """
+        if real_path in self._visited:
+            return False
+
+        self._visited.add(real_path)
+        return True
+
+    def _select_subdirs(self, path, real_path, depth, dirs, links, done):
+        """
+        Returns the subdirectories of `path` to walk, as tuples of (path, real
+        path), with links whose targets are walked anyway left out.
+        """
+        selected = []
+
+        # Real directories are claimed before links, so a link to a sibling is not walked
+        for name in sorted(dirs, key=lambda name: name in links):
+            sub_path = os.path.join(path, name)
+
+            if not self._allowed(depth, name) or sub_path in done:
+                continue
+
+            sub_real_path = links.get(name, os.path.join(real_path, name))
+            if not self._visit(sub_real_path):
+                continue
+
+            selected.append((sub_path, sub_real_path))
+
+        return selected
+
+    def _record(self, path):
+        if not self.journal:
+            return
+
+        if self._journal is None:
+            self._journal = open(self.journal, "a")
+
+        self._journal.write(path + "\n")
+        self._journal.flush()
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _complete(self, path):
+        while path is not None:
+            self._remaining[path] -= 1
+            if self._remaining[path]:
+                return
+
+            del self._remaining[path]
+            self._record(path)
+            path = self._parents.pop(path)
+
+    def acknowledge(self, paths):
+        """
+        Acknowledges files yielded by a deferred crawl (e.g. once they have
+        been checked). A directory is recorded in the journal once all of its
+        files have been acknowledged.
+
+        :param paths: sequence of file paths
+        """
+        try:
+            for path in paths:
+                directory = os.path.dirname(path)
+                self._unacknowledged[directory] -= 1
+                if not self._unacknowledged[directory]:
+                    del self._unacknowledged[directory]
+                    self._complete(directory)
+        finally:
+            self._close_journal()
+
+    def _dataset_id(self, path):
+        rel_path = os.path.relpath(path, self.root)
+        return ".".join(rel_path.split(os.sep))
+
+    def crawl(self):
+        """
+        Crawls the archive.
+
+        :return: generator of tuples of: (dataset id, file path)
+        """
+        done = read_journal(self.journal)
+        if self.root in done:
+            return
+
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        real_root = os.path.realpath(self.root)
+        self._visited = set([real_root])
+        self._remaining = {self.root: 1}
+        self._parents = {self.root: None}
+        self._unacknowledged = {}
+
+        try:
+            pending = {executor.submit(_scan_dir, self.root): (self.root, real_root, 0)}
+
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    path, real_path, depth = pending.pop(future)
+                    files, dirs, links = future.result()
+
+                    for sub_path, sub_real_path in self._select_subdirs(path, real_path, depth, dirs, links, done):
+                        self._parents[sub_path] = path
+                        self._remaining[sub_path] = 1
+                        self._remaining[path] += 1
+                        pending[executor.submit(_scan_dir, sub_path)] = (sub_path, sub_real_path, depth + 1)
+
+                    # Files are only part of a dataset in the directories of the last facet
+                    names = fnmatch.filter(files, self.pattern) if depth == len(self.facets) else []
+                    if self.deferred and names:
+                        self._unacknowledged[path] = len(names)
+
+                    dataset_id = self._dataset_id(path)
+                    for name in names:
+                        yield dataset_id, os.path.join(path, name)
+
+                    if not (self.deferred and names):
+                        self._complete(path)
+        finally:
+            executor.shutdown(wait=False)
+            self._close_journal()
+
+    def __iter__(self):
+        return self.crawl()
+
+
+def parse_filters(specs):
+    """
+    Parses facet filters from strings of the form "<facet>=<value>[,<value>...]".
+
+    :param specs: sequence of strings
+    :return: dictionary of {facet: list of values}
+    """
+    filters = {}
+    for spec in specs:
+        facet, _, values = spec.partition("=")
+        if not values:
+            raise ValueError("Filter must be of the form <facet>=<value>[,<value>...], not: {}".format(spec))
+        filters.setdefault(facet, []).extend(values.split(","))
+
+    return filters
@@ -6,10 +6,9 @@ A set of tests that operate at the file level.
 
 """
 
-from netCDF4 import Dataset, num2date
-
 from time_checks import utils, constants
 from time_checks.utils import resolve_dataset_type
+from time_checks.fingerprint import memoize_by_axis
 
 
 @resolve_dataset_type
@@ -41,6 +40,7 @@ def check_file_name_time_format(ds, time_index_in_name=-1):
 
 
 @resolve_dataset_type
+@memoize_by_axis
 def check_file_name_matches_time_var(ds, time_index_in_name=-1, tolerance='days:1'):
     """
         check_file_name_matches_time_var
@@ -58,6 +58,7 @@ def check_file_name_matches_time_var(ds, time_index_in_name=-1, tolerance='days:
     return_msg = ""
 
     time_var = ds["time"]["_data"]
+    summary = ds["time"].get("_summary")
     time_comp = ds['filename'][time_index_in_name]
     calendar = ds["time"]["calendar"]
     units = ds['time']['units']
@@ -65,14 +66,16 @@ def check_file_name_matches_time_var(ds, time_index_in_name=-1, tolerance='days:
     file_times = [utils.str_to_anytime(comp) for comp in time_comp.split("-")]
     file_times = [utils.anytime_to_netcdf_time(tm, units, calendar) for tm in file_times]
 
-    start_time = time_var[0]
-    end_time = time_var[-1]
+    if summary is not None:
+        start_time, end_time = summary.first, summary.last
+    else:
+        start_time, end_time = time_var[0], time_var[-1]
 
     if len(units.strip("days since ")) == 7:
         return False, "Format of units is incorrect, it is of the form 'days since YYYY-MM'," \
                       " it should be of the form 'YYYY-MM-DD'"
 
-    times = num2date([start_time, end_time], units, calendar=calendar)
+    times = [utils.cached_num2date(tm, units, calendar) for tm in (start_time, end_time)]
     to_compare = [(times[0], file_times[0]), (times[1], file_times[1])]
 
     for tm_1, tm_2 in to_compare:
@@ -176,7 +179,8 @@ def check_valid_temporal_element(ds, time_index_in_name=-1):
 
 
 @resolve_dataset_type
-def check_regular_time_axis_increments(ds, frequency_index=1):
+@memoize_by_axis
+def check_regular_time_axis_increments(ds, frequency_index=1, monthly_mode="midpoints"):
     """
        check_regular_time_axis_increments
 
@@ -185,29 +189,37 @@ def check_regular_time_axis_increments(ds, frequency_index=1):
     Since it is common to have the timestamp of monthly data placed at the middle of month,
     monthly CMIP5 maybe irregularly spaced when using any of the following calendars:
         'gregorian', 'proleptic_gregorian', 'julian', 'noleap', '365_day', 'standard',
-    For these calendars valid time axis increments are 29.5, 30.5 and 31 days.
+    For these calendars, with `monthly_mode` "midpoints", each time value must be the middle of
+    the month following that of the previous value, in the calendar of the file. With `monthly_mode`
+    "steps" any of the increments 29.5, 30, 30.5 and 31 days is valid.
 
     :param ds: input dataset [netCDF4 Dataset object (also MockNCDataset) or compliant dictionary]
     :param frequency_index: index of the frequency element in the filename
                             (actually the cmor table, frequency must be implied from this) [int]
+    :param monthly_mode: "midpoints" or "steps" [string]
     :return: boolean [True for success]
     """
 
+    # Imported here so that the file name checks do not import numpy
+    from time_checks import axis_summary
+
     return_msg = ""
     frequency = ds['filename'][frequency_index]
     calendar = ds["time"]["calendar"]
-    times = ds["time"]["_data"]
+    summary = axis_summary.get_axis_summary(ds, frequency_index=frequency_index)
 
-    if len(times) == 1:
+    if summary.count == 1:
         return_msg = "Only one time-step"
         return True, return_msg
 
-    delta_t = [times[1] - times[0]]
-
-    if frequency in ['Amon', 'Omon', 'Lmon', 'LImon', 'OImon', 'cfMon'] and calendar in constants.IRREGULAR_MONTHLY_CALENDARS:
-        result, return_msg = utils.calculate_delta_time_series(times, constants.VALID_MONTHLY_TIME_DIFFERENCES)
-
-    else:
-        result, return_msg = utils.calculate_delta_time_series(times, delta_t)
-
-    return result, return_msg
+    if frequency in constants.MONTHLY_TABLES and calendar in constants.IRREGULAR_MONTHLY_CALENDARS:
+        if monthly_mode == "midpoints":
+            try:
+                return utils.check_month_midpoints(summary.values, ds["time"]["units"], calendar,
+                                                   type_name=ds["time"].get("_type"))
+            except ValueError:
+                # Time units not supported by the calendar engine: check the increments instead
+                pass
+
+    # The valid steps of the summary are the monthly steps, or the first step of the axis
+    return summary.regular_result()
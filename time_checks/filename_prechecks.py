@@ -0,0 +1,174 @@
+"""
+filename_prechecks.py
+=====================
+
+Streaming pre-checks of file names over path listings (such as `find` output
+or a DRS manifest) before any file is opened.
+
+Only the checks that need nothing but the file name are run (T1.000 to
+T1.003), so netCDF4 is never imported. Paths are read lazily in batches and
+failures are written as soon as each batch has been checked, so the listing
+is never held in memory.
+
+Each batch is first matched against a single compiled regular expression that
+only accepts names passing all of the file name checks. The (rare) names that
+do not match are then run through the checks in `file_time_checks` to find out
+which of them failed and why.
+
+"""
+
+import re
+from itertools import islice
+
+from time_checks import constants, utils
+from time_checks.file_time_checks import check_file_name_time_format
+from time_checks.file_time_checks import check_valid_temporal_element
+from time_checks.file_time_checks import check_time_format_matches_frequency
+
+
+# (error code, check name, check function, failure message) for each file name check
+FILENAME_CHECKS = [
+    ("T1.001", "check_file_name_time_format", check_file_name_time_format,
+     "Format of file name is not recognised."),
+    ("T1.002", "check_valid_temporal_element", check_valid_temporal_element,
+     "Temporal elements are not valid."),
+    ("T1.003", "time_format_matches_frequency", check_time_format_matches_frequency,
+     "Frequency element of the filename does not match frequency of data in the file."),
+]
+
+# Valid ranges of each temporal element, as used by `check_valid_temporal_element`
+_TEMPORAL_ELEMENT_PATTERNS = [r'(?:[0-3]\d{3}|4000)',         # year
+                              r'(?:0[1-9]|1[0-2])',           # month
+                              r'(?:0[1-9]|[12]\d|3[01])',     # day
+                              r'(?:[01]\d|2[0-3])',           # hour
+                              r'[0-5]\d']                     # minute
+
+
+def _build_valid_name_regex():
+    """
+    Builds a regular expression that matches file paths that pass all of the file
+    name checks: a ".nc" extension, a "start-end" time component with valid
+    temporal elements and a length that matches the CMOR table (frequency) in the
+    second component of the name.
+
+    A path that does not match may still pass the checks (e.g. a single time
+    component), so it has to be checked in full.
+
+    :return: compiled regular expression
+    """
+    lengths = {4: 1, 6: 2, 8: 3, 10: 4, 12: 5}
+    alternatives = []
+
+    for table, length in sorted(constants.CMOR_TABLES_FORMAT.items()):
+        if length not in lengths:
+            continue
+
+        time_comp = ''.join(_TEMPORAL_ELEMENT_PATTERNS[:lengths[length]])
+        alternatives.append(r'{}_(?:[^/]*_)?{}-{}'.format(re.escape(table), time_comp, time_comp))
+
+    return re.compile(r'(?:^|/)[^_/]*_(?:{})\.nc$'.format('|'.join(alternatives)))
+
+
+VALID_NAME_REGEX = _build_valid_name_regex()
+
+
+def iter_path_batches(stream, batch_size=10000):
+    """
+    Lazily reads a listing of paths (one per line) and yields them in batches.
+    Blank lines are skipped.
+
+    :param stream: iterable of lines, e.g. an open file or `sys.stdin`
+    :param batch_size: maximum number of paths per batch [int]
+    :return: generator of lists of paths
+    """
+    paths = (line.strip() for line in stream)
+    paths = (path for path in paths if path)
+
+    while True:
+        batch = list(islice(paths, batch_size))
+        if not batch:
+            return
+
+        yield batch
+
+
+def check_file_name(fpath):
+    """
+    Runs all the file name checks (T1.000 to T1.003) on a single path.
+
+    A check that raises an exception (for example, for an unknown CMOR table)
+    is reported as a failure.
+
+    :param fpath: file name or path [string]
+    :return: list of failures as tuples of: (error code, check name, message)
+    """
+    failures = []
+
+    if not fpath.endswith('.nc'):
+        failures.append(("T1.000", "file_extension", "File does not end with '.nc'"))
+
+    ds = {"filename": utils.get_file_name_components(fpath)}
+
+    for code, name, check, fail_msg in FILENAME_CHECKS:
+        try:
+            res, msg = check(ds)
+        except Exception as err:
+            res, msg = False, "Check raised {}: {}".format(type(err).__name__, err)
+
+        if res is False:
+            failures.append((code, name, "{} {}".format(fail_msg, msg).strip()))
+
+    return failures
+
+
+def precheck_batch(paths):
+    """
+    Checks a batch of paths and yields the failures. Paths matching
+    `VALID_NAME_REGEX` are known to pass and are not checked further.
+
+    :param paths: list of file names or paths
+    :return: generator of tuples of: (path, error code, check name, message)
+    """
+    matches = map(VALID_NAME_REGEX.search, paths)
+
+    for fpath, match in zip(paths, matches):
+        if match:
+            continue
+
+        for code, name, msg in check_file_name(fpath):
+            yield fpath, code, name, msg
+
+
+def format_failure(fpath, code, name, msg):
+    """
+    Formats a failure as a single tab-separated line (without a newline).
+
+    :return: string
+    """
+    return "{}\t{}: [{}]: FAILED:: {}".format(fpath, code, name, msg)
+
+
+def precheck_stream(instream, outstream, batch_size=10000):
+    """
+    Runs the file name checks over a listing of paths, writing one line per
+    failure to `outstream` as each batch is checked.
+
+    :param instream: iterable of lines, e.g. an open file or `sys.stdin`
+    :param outstream: writable file object
+    :param batch_size: number of paths checked per batch [int]
+    :return: tuple of: (number of paths checked, number of paths that failed)
+    """
+    n_checked = n_failed = 0
+
+    for batch in iter_path_batches(instream, batch_size=batch_size):
+        failed = set()
+
+        for failure in precheck_batch(batch):
+            failed.add(failure[0])
+            outstream.write(format_failure(*failure) + "\n")
+
+        outstream.flush()
+        n_checked += len(batch)
+        n_failed += len(failed)
+
+    return n_checked, n_failed
@@ -0,0 +1,110 @@
+"""
+fingerprint.py
+==============
+
+Fingerprinting of time axes and memoization of check results on them.
+
+Many files share exactly the same time axis: every variable and every ensemble
+member of one model/experiment/table. The result of a check that depends on
+the content of the file is therefore the same for all of them, as long as the
+parts of the file name the check reads are also the same.
+
+`memoize_by_axis` caches check results on a fingerprint of the time values
+together with the fields of the time variable the checks read (units, calendar
+and data type) and the time and frequency components of the file name, so each
+unique axis is only checked once.
+
+The results of up to 100000 checks are cached in each process. Set the
+`TIME_CHECKS_RESULT_CACHE_SIZE` environment variable (or call
+`set_result_cache_size`) to change this; a size of 0 turns memoization off.
+
+"""
+
+import os
+import hashlib
+from functools import wraps
+
+from time_checks.cache import LRUCache
+
+
+def axis_fingerprint(time_dict):
+    """
+    Returns a fingerprint of a time axis: a hash of the time values (as
+    little-endian float64), the units and the calendar.
+
+    :param time_dict: the "time" part of a CEDA-CC style dictionary [dictionary]
+    :return: fingerprint [string]
+    """
+    # Imported here so that the file name checks do not import numpy
+    import numpy as np
+
+    # Use the values already read by the axis summary, if there is one
+    summary = time_dict.get("_summary")
+    values = time_dict["_data"] if summary is None else summary.values
+    data = np.ascontiguousarray(np.asarray(values, dtype='<f8'))
+
+    fingerprint = hashlib.blake2b(digest_size=16)
+    fingerprint.update(memoryview(data).cast('B'))
+    fingerprint.update("|{}|{}".format(time_dict.get("units", ""), time_dict.get("calendar", "")).encode("utf-8"))
+
+    return fingerprint.hexdigest()
+
+
+DEFAULT_RESULT_CACHE_SIZE = 100000
+
+# Fields of the "time" dictionary read by the memoized checks, besides the values
+TIME_KEY_FIELDS = ("units", "calendar", "_type")
+
+# Check results, counted per check function
+RESULT_CACHE = LRUCache(maxsize=int(os.environ.get("TIME_CHECKS_RESULT_CACHE_SIZE", DEFAULT_RESULT_CACHE_SIZE)))
+
+
+def set_result_cache_size(maxsize):
+    """
+    Empties the cache of check results and sets its size.
+
+    :param maxsize: maximum number of results cached, 0 to turn memoization off [int]
+    """
+    RESULT_CACHE.clear()
+    RESULT_CACHE.maxsize = maxsize
+
+
+def _get_name_component(ds, index):
+    try:
+        return ds["filename"][index]
+    except IndexError:
+        return None
+
+
+def memoize_by_axis(func):
+    """
+    Decorator that memoizes a content-dependent check on the fingerprint of the
+    time axis, the fields of the time variable in `TIME_KEY_FIELDS`, the time
+    and frequency components of the file name and the keyword arguments. It
+    must be applied inside `resolve_dataset_type` so that the dataset is
+    already a dictionary.
+
+    :param func: check function taking a dataset dictionary and keyword arguments
+    :return: wrapped function
+    """
+
+    @wraps(func)
+    def wrapper(ds, **kwargs):
+        if RESULT_CACHE.maxsize <= 0:
+            return func(ds, **kwargs)
+
+        fingerprint = axis_fingerprint(ds["time"])
+        fields = tuple(ds["time"].get(field) for field in TIME_KEY_FIELDS)
+        time_comp = _get_name_component(ds, kwargs.get("time_index_in_name", -1))
+        frequency = _get_name_component(ds, kwargs.get("frequency_index", 1))
+
+        key = (func.__name__, fingerprint, fields, time_comp, frequency, tuple(sorted(kwargs.items())))
+        result = RESULT_CACHE.get(key, group=func.__name__)
+
+        if result is None:
+            result = func(ds, **kwargs)
+            RESULT_CACHE.put(key, result, group=func.__name__)
+
+        return result
+
+    return wrapper
@@ -0,0 +1,211 @@
+"""
+jsonl_ingest.py
+===============
+
+Streaming ingest of CEDA-CC style metadata records from JSON Lines, so that
+the file level checks can be run from harvested metadata without opening any
+netCDF files.
+
+Each line holds one dataset dictionary, as accepted by `resolve_dataset_type`:
+
+    {"time": {"units": "days since 1850-01-01", "calendar": "standard", ...,
+              "_data": [52975.5, 53005.0, ...]},
+     "filename": ["so", "Omon", "MRI-CGCM3", "historical", "r1i1p1", "199501-199912"]}
+
+An optional "path" gives the path of the file the record was harvested from.
+
+The "_data" array of the "time" object is cut out of the line before the
+rest of the record is parsed as JSON, and decoded with `numpy.fromstring`
+straight into a float64 array (no list of Python floats is built). A
+placeholder is left in its place, so that if the array cut out turns out not
+to be the time values (e.g. a "_data" array of another variable nested in a
+way the search did not expect) the whole line is parsed as JSON instead. Lines are read lazily in batches;
+within a batch the records are checked grouped by calendar and units, so
+that records sharing time conversions are checked together while those
+conversions are still in the conversion cache. The results of each batch are
+yielded in the order of the input lines.
+
+"""
+
+import re
+import json
+from itertools import islice
+
+import numpy as np
+
+from time_checks import utils
+
+
+DATA_REGEX = re.compile(r'"_data"\s*:\s*\[([^\]]*)\]')
+
+TIME_REGEX = re.compile(r'"time"\s*:\s*\{')
+
+# Left in place of the time values cut out of a line
+_PLACEHOLDER = "__time_data__"
+
+# Characters of a list of plain numbers; anything else (e.g. null) is parsed as JSON
+_NUMBERS_REGEX = re.compile(r'^[\s0-9eE.,+-]*$')
+
+
+def decode_data(text):
+    """
+    Decodes the text between the brackets of a JSON list of numbers to a
+    float64 array. Null values become NaN. A malformed list (e.g. "1,,2")
+    raises a ValueError.
+
+    :param text: comma separated numbers [string]
+    :return: numpy array
+    """
+    if not text.strip():
+        return np.empty(0)
+
+    if not _NUMBERS_REGEX.match(text):
+        return _to_array(json.loads("[" + text + "]"))
+
+    values = np.fromstring(text, dtype=np.float64, sep=",")
+
+    # Older NumPy versions stop at the first malformed value rather than raising
+    expected = text.count(",") + 1
+    if values.size != expected:
+        raise ValueError("Malformed list of time values: {} values decoded out of {}".format(values.size, expected))
+
+    return values
+
+
+def _to_array(values):
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+def _find_time_data(line):
+    """
+    Returns the match of the "_data" list following the start of the "time"
+    object of a JSON line, or None.
+    """
+    time_match = TIME_REGEX.search(line)
+    if time_match is None:
+        return None
+
+    return DATA_REGEX.search(line, time_match.end())
+
+
+def decode_record(line):
+    """
+    Decodes a JSON line to a dataset dictionary, with the time values as a
+    float64 array.
+
+    :param line: JSON record [string]
+    :return: dataset dictionary (CEDA-CC style)
+    """
+    match = _find_time_data(line)
+    record = None
+
+    if match is not None:
+        record = json.loads(line[:match.start(1)] + '"' + _PLACEHOLDER + '"' + line[match.end(1):])
+        time_dict = record.get("time")
+
+        if not isinstance(time_dict, dict) or time_dict.get("_data") != [_PLACEHOLDER]:
+            record, match = None, None
+
+    if record is None:
+        record = json.loads(line)
+
+    if "filename" not in record and "path" in record:
+        record["filename"] = utils.get_file_name_components(record["path"])
+
+    if "time" not in record or "filename" not in record:
+        raise ValueError("Record must have a 'time' and a 'filename' (or 'path')")
+
+    if match is not None:
+        record["time"]["_data"] = decode_data(match.group(1))
+    elif isinstance(record["time"].get("_data"), list):
+        record["time"]["_data"] = _to_array(record["time"]["_data"])
+
+    return record
+
+
+def record_key(record):
+    """
+    Returns the path of the file a record was harvested from: its "path" or,
+    if not set, the file name made from its "filename" components.
+    """
+    if "path" in record:
+        return record["path"]
+
+    return "_".join(record["filename"]) + ".nc"
+
+
+def _group_key(record):
+    time_dict = record["time"]
+    return str(time_dict.get("calendar", "")), str(time_dict.get("units", ""))
+
+
+def iter_record_batches(stream, batch_size=1000):
+    """
+    Lazily reads JSON lines and yields them decoded, in batches. Blank lines
+    are skipped. A line that cannot be decoded is yielded as the exception
+    raised, in place of the record.
+
+    :param stream: iterable of lines, e.g. an open file or `sys.stdin`
+    :param batch_size: maximum number of records per batch [int]
+    :return: generator of lists of tuples of: (line number, record or exception)
+    """
+    lines = ((number, line) for number, line in enumerate(stream, 1) if line.strip())
+
+    while True:
+        batch = []
+        for number, line in islice(lines, batch_size):
+            try:
+                batch.append((number, decode_record(line)))
+            except Exception as err:
+                batch.append((number, err))
+
+        if not batch:
+            return
+
+        yield batch
+
+
+def check_batch(batch, checker):
+    """
+    Checks a batch of records, grouped by calendar and units.
+
+    :param batch: list of tuples of: (line number, record or exception)
+    :param checker: callable taking (path, dataset dictionary) and returning the check results
+    :return: list of tuples of: (line number, path, results or exception) in the order of `batch`
+    """
+    results = [None] * len(batch)
+    order = []
+
+    for index, (number, record) in enumerate(batch):
+        if isinstance(record, Exception):
+            results[index] = (number, "line {}".format(number), record)
+        else:
+            order.append(index)
+
+    order.sort(key=lambda index: _group_key(batch[index][1]))
+
+    for index in order:
+        number, record = batch[index]
+        key = record_key(record)
+
+        try:
+            results[index] = (number, key, checker(key, record))
+        except Exception as err:
+            results[index] = (number, key, err)
+
+    return results
+
+
+def ingest_stream(stream, checker, batch_size=1000):
+    """
+    Checks the records of a JSON Lines stream.
+
+    :param stream: iterable of lines, e.g. an open file or `sys.stdin`
+    :param checker: callable taking (path, dataset dictionary) and returning the check results
+    :param batch_size: number of records read and checked per batch [int]
+    :return: generator of tuples of: (line number, path, results or exception),
+             in the order of the input lines
+    """
+    for batch in iter_record_batches(stream, batch_size=batch_size):
+        for result in check_batch(batch, checker):
+            yield result
@@ -0,0 +1,183 @@
+"""
+memory_budget.py
+================
+
+Memory-aware admission of files in batch runs.
+
+Before a file is read, only the length of its time variable is read from the
+file header (no data) and the memory needed to check it is estimated from
+that. The scheduler admits files against a global `MemoryBudget`, so that the
+files being read and checked at any time fit in the budget however many
+workers are running. Files too big for the budget are checked with the
+chunked (streaming) path instead, whose memory use is bounded by the chunk
+size.
+
+The peak resident set size (RSS) of the worker processes can be reported with
+`ReportingPeakRSS`, which wraps a reader or checker so that it also returns
+the process id and peak RSS of the worker it ran in.
+
+"""
+
+import os
+import sys
+import asyncio
+import resource
+
+from time_checks import time_utils, utils
+
+
+# Bytes held per time value while a file is checked: the values read (8), the
+# list of NumPy scalars of the dataset dictionary (about 40), the float64 copy
+# and steps of the axis summary (16) and their masks
+BYTES_PER_TIME_VALUE = 72
+
+# Bytes held per file whatever its length (open file, metadata, results)
+FILE_OVERHEAD_BYTES = 1024 ** 2
+
+UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(size):
+    """
+    Parses a memory size such as "512M", "4G" or "1048576" (bytes).
+
+    :param size: memory size [string or int]
+    :return: number of bytes [int]
+    """
+    if isinstance(size, int):
+        return size
+
+    size = size.strip().upper().rstrip("B")
+    unit = size[-1:] if size[-1:] in UNITS else ""
+    number = size[:-1] if unit else size
+
+    try:
+        return int(float(number) * UNITS[unit])
+    except ValueError:
+        raise ValueError("Memory size must be a number of bytes with an optional K, M, G or T unit, "
+                         "not: {}".format(size))
+
+
+def header_time_length(fpath):
+    """
+    Returns the number of time values in a netCDF file, from its header only.
+
+    :param fpath: path of the netCDF file [string]
+    :return: number of time values [int]
+    """
+    ds = utils._netcdf4().Dataset(fpath)
+    try:
+        layout = time_utils.get_time_layout(ds)
+        if layout is None:
+            raise ValueError("No time variable found in: {}".format(fpath))
+
+        return ds.variables[layout["time"]].size
+    finally:
+        ds.close()
+
+
+def estimate_axis_bytes(length):
+    """
+    Returns the estimated number of bytes needed to check a time axis of
+    `length` values.
+    """
+    return FILE_OVERHEAD_BYTES + length * BYTES_PER_TIME_VALUE
+
+
+def estimate_file_bytes(fpath):
+    """
+    Returns the estimated number of bytes needed to check a netCDF file,
+    reading only its header.
+    """
+    return estimate_axis_bytes(header_time_length(fpath))
+
+
+class MemoryBudget(object):
+    """
+    Global memory budget shared by the files being read and checked.
+
+    Files are admitted as long as the estimates of the files admitted fit in
+    the budget. A file estimated above `max_file_bytes` is not read whole: it
+    is checked in chunks of `chunk_size` time values, and charged for those.
+    """
+
+    def __init__(self, total_bytes, chunk_size, max_file_bytes=None, sizer=estimate_file_bytes):
+        """
+
+        :param total_bytes: memory budget in bytes [int]
+        :param chunk_size: number of time values read at once for files checked in chunks [int]
+        :param max_file_bytes: estimate above which a file is checked in chunks
+                               (default and maximum: `total_bytes`) [int]
+        :param sizer: blocking callable taking a path and returning its estimate in bytes
+        """
+        self.total_bytes = total_bytes
+        self.chunk_size = chunk_size
+        self.max_file_bytes = min(max_file_bytes or total_bytes, total_bytes)
+        self.sizer = sizer
+
+        self.chunked_bytes = min(estimate_axis_bytes(chunk_size), total_bytes)
+        self.used = 0
+        self.peak = 0
+        self._condition = None
+
+    def is_oversized(self, nbytes):
+        return nbytes > self.max_file_bytes
+
+    async def acquire(self, nbytes):
+        """
+        Waits until `nbytes` fit in the budget, then takes them.
+        """
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.used + nbytes <= self.total_bytes)
+            self.used += nbytes
+            self.peak = max(self.peak, self.used)
+
+    async def release(self, nbytes):
+        async with self._condition:
+            self.used -= nbytes
+            self._condition.notify_all()
+
+    def reset(self):
+        """
+        Resets the budget for a new event loop.
+        """
+        self.used = 0
+        self.peak = 0
+        self._condition = None
+
+
+def peak_rss_bytes():
+    """
+    Returns the peak resident set size of the current process in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class ReportingPeakRSS(object):
+    """
+    Wraps a callable so that it returns a tuple of: (result, process id, peak
+    RSS of the process in bytes). Picklable if the wrapped callable is.
+    """
+
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, *args):
+        return self.func(*args), os.getpid(), peak_rss_bytes()
+
+
+def format_peak_rss(peak_rss):
+    """
+    Formats the peak RSS of each worker as lines of text.
+
+    :param peak_rss: dictionary of {process id: peak RSS in bytes}
+    :return: list of strings
+    """
+    return ["Worker {}: peak RSS {:.1f} MiB".format(pid, peak / 1024. ** 2)
+            for pid, peak in sorted(peak_rss.items())]
@@ -0,0 +1,259 @@
+"""
+profiling.py
+============
+
+Profiling of check runs across workers (threads, processes or nodes) with
+cProfile, and merging of the profiles.
+
+`ProfiledCall` wraps the function run by the workers (e.g. the reader and
+checker of the scheduler). Each worker thread accumulates its calls in its
+own profiler, which is written to "<profile dir>/<host>-<pid>-<thread>.pstats"
+after each call (pooled worker processes are not given a chance to write it
+when they exit). With a sample rate below 1 only the calls for a sample of the
+files are profiled; the sample is drawn from a hash of the path, so that all
+the workers (and reruns) agree on it.
+
+`merge_profiles` merges the profiles of all the workers into one aggregate
+profile ("merged.pstats", to be read with `pstats` or snakeviz) and a
+collapsed-stack text file ("merged.collapsed.txt", for flamegraph tools such
+as flamegraph.pl or speedscope). `clear_profiles` removes the profiles of an
+earlier run, which would otherwise be merged with those of the next run.
+
+cProfile only records the callers of each function, not whole stacks, so the
+collapsed stacks are rebuilt from the call graph: the time of a function is
+shared between its callers in proportion to the time spent under each of
+them. They are exact for functions called from one place only.
+
+"""
+
+import os
+import glob
+import zlib
+import pstats
+import socket
+import cProfile
+import threading
+
+
+DEFAULT_SAMPLE_RATE = 1.
+
+MERGED_PROFILE = "merged.pstats"
+
+COLLAPSED_STACKS = "merged.collapsed.txt"
+
+# Deepest call stack written to the collapsed stacks
+MAX_STACK_DEPTH = 64
+
+# Calls with less time than this along a stack are not followed further
+MIN_STACK_SECONDS = 1e-6
+
+_local = threading.local()
+
+
+def is_sampled(key, sample_rate=DEFAULT_SAMPLE_RATE):
+    """
+    Returns True if the calls for `key` (e.g. a file path) are in the sample.
+    """
+    if sample_rate >= 1.:
+        return True
+
+    return zlib.crc32(str(key).encode("utf-8")) % 10000 < sample_rate * 10000
+
+
+def get_profile_path(profile_dir):
+    """
+    Returns the path of the profile of the current worker thread.
+    """
+    return os.path.join(profile_dir, "{}-{}-{}.pstats".format(socket.gethostname(), os.getpid(),
+                                                            threading.get_ident()))
+
+
+def _worker_profiler(profile_dir):
+    """
+    Returns the profiler of the current worker thread for `profile_dir`.
+    """
+    profilers = getattr(_local, "profilers", None)
+    if profilers is None:
+        profilers = _local.profilers = {}
+
+    # Keyed on the process too, so that a forked worker does not reuse the profiler of its parent
+    key = (profile_dir, os.getpid())
+    if key not in profilers:
+        profilers[key] = cProfile.Profile()
+
+    return profilers[key]
+
+
+def _default_key(*args):
+    return args[0] if args else ""
+
+
+class ProfiledCall(object):
+    """
+    Callable wrapper profiling the calls of `func` in the worker running them.
+    It can be pickled (if `func` and `key` can) to run in worker processes.
+    """
+
+    def __init__(self, func, profile_dir, sample_rate=DEFAULT_SAMPLE_RATE, key=_default_key):
+        """
+
+        :param func: function to profile
+        :param profile_dir: directory to write the profiles to [string]
+        :param sample_rate: fraction of the keys whose calls are profiled [float]
+        :param key: callable taking the arguments of a call and returning the key
+                    sampled on (default: the first argument, e.g. the file path)
+        """
+        self.func = func
+        self.profile_dir = profile_dir
+        self.sample_rate = sample_rate
+        self.key = key
+
+    def __call__(self, *args):
+        if not is_sampled(self.key(*args), self.sample_rate):
+            return self.func(*args)
+
+        profiler = _worker_profiler(self.profile_dir)
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is active in this thread (or, on Python 3.12+, in this process)
+            return self.func(*args)
+
+        try:
+            return self.func(*args)
+        finally:
+            profiler.disable()
+            dump_profile(profiler, get_profile_path(self.profile_dir))
+
+
+def dump_profile(profiler, path):
+    """
+    Writes the stats of a profiler to `path` atomically.
+    """
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = path + ".tmp"
+    profiler.dump_stats(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def profile_call(profile_dir, func, *args, **kwargs):
+    """
+    Runs `func(*args, **kwargs)` under its own profiler, written to the profile
+    directory as the profile of the current worker.
+
+    :return: the result of `func`
+    """
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        dump_profile(profiler, get_profile_path(profile_dir))
+
+
+def _label(func):
+    """
+    Returns the label of a function in the collapsed stacks: "<file name>:<function>".
+    """
+    filename, _, name = func
+    label = name if filename == "~" else "{}:{}".format(os.path.basename(filename), name)
+    return label.replace(";", ":").replace(" ", "_")
+
+
+def collapse_stacks(stats, max_depth=MAX_STACK_DEPTH):
+    """
+    Rebuilds collapsed stacks from the call graph of a profile.
+
+    :param stats: pstats.Stats instance
+    :param max_depth: deepest stack written [int]
+    :return: dictionary of {stack ("a;b;c"): own time in microseconds [int]}
+    """
+    entries = stats.stats
+    callees = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            # Edge stats are (cc, nc, tt, ct) from Python 3.x profiles
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    roots = [func for func, (_, _, _, _, callers) in entries.items()
+             if not any(caller in entries for caller in callers)]
+    stacks = {}
+
+    def visit(func, weight, path, visiting):
+        _, _, own, cumulative, _ = entries[func]
+        share = weight / cumulative if cumulative > 0 else 0.
+        stack = path + [_label(func)]
+        key = ";".join(stack)
+
+        micros = int(round(own * share * 1e6))
+        if micros:
+            stacks[key] = stacks.get(key, 0) + micros
+
+        if len(stack) >= max_depth:
+            return
+
+        for callee, edge_cumulative in callees.get(func, []):
+            # Recursive calls are folded into the first call
+            if callee in visiting or edge_cumulative * share < MIN_STACK_SECONDS:
+                continue
+            visiting.add(callee)
+            visit(callee, edge_cumulative * share, stack, visiting)
+            visiting.discard(callee)
+
+    for root in sorted(roots):
+        visit(root, entries[root][3], [], {root})
+
+    return stacks
+
+
+def clear_profiles(profile_dir):
+    """
+    Removes the worker profiles (and the merged files) from `profile_dir`.
+    """
+    names = (MERGED_PROFILE, COLLAPSED_STACKS)
+    paths = glob.glob(os.path.join(profile_dir, "*.pstats")) + glob.glob(os.path.join(profile_dir, "*.pstats.tmp"))
+
+    for path in paths + [os.path.join(profile_dir, name) for name in names]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def merge_profiles(profile_dir, output_dir=None):
+    """
+    Merges the profiles of all the workers in `profile_dir` into one profile
+    and a collapsed-stack file, written to `output_dir` (default: `profile_dir`).
+
+    :param profile_dir: directory of the worker profiles [string]
+    :param output_dir: directory to write the merged files to [string]
+    :return: tuple of: (pstats.Stats, path of the merged profile, path of the
+             collapsed stacks), or None if there are no profiles
+    """
+    output_dir = output_dir or profile_dir
+    paths = sorted(path for path in glob.glob(os.path.join(profile_dir, "*.pstats"))
+                   if os.path.basename(path) != MERGED_PROFILE)
+    if not paths:
+        return None
+
+    stats = pstats.Stats(*paths)
+
+    merged_path = os.path.join(output_dir, MERGED_PROFILE)
+    stats.dump_stats(merged_path)
+
+    collapsed_path = os.path.join(output_dir, COLLAPSED_STACKS)
+    with open(collapsed_path, "w+") as w:
+        for stack, micros in sorted(collapse_stacks(stats).items()):
+            w.write("{} {}\n".format(stack, micros))
+
+    return stats, merged_path, collapsed_path
+
+
+def print_summary(stats, stream, limit=20):
+    """
+    Prints the functions with the most cumulative time in a merged profile.
+    """
+    stats.stream = stream
+    stats.sort_stats("cumulative").print_stats(limit)
@@ -0,0 +1,203 @@
+"""
+results.py
+==========
+
+Structured check results and their columnar bulk export.
+
+A `CheckResult` holds the error code, check name, status, message, the key of
+what was checked (file path or dataset id) and the time taken. Converting it
+to a string gives the log line format used by the runner scripts, e.g.:
+
+    T1.004: [file_name_matches_time_var]: FAILED:: <message>
+
+A `ResultTable` collects results in columns and exports them as a NumPy
+structured array (saved as ".npy") or, if pyarrow is installed, as Arrow or
+Parquet, so that results from many runs can be aggregated without parsing
+log files.
+
+"""
+
+import os
+
+
+OK = "OK"
+FAILED = "FAILED"
+SKIPPED = "SKIPPED"
+
+RESULT_FIELDS = ("code", "name", "status", "message", "key", "duration")
+
+
+class CheckResult(object):
+    """
+    Result of a single check.
+    """
+
+    __slots__ = RESULT_FIELDS
+
+    def __init__(self, code, name, status, message="", key="", duration=0.):
+        """
+
+        :param code: error code, e.g. "T1.004" [string]
+        :param name: check name, e.g. "file_name_matches_time_var" [string]
+        :param status: OK, FAILED or SKIPPED [string]
+        :param message: failure message [string]
+        :param key: file path or dataset id that was checked [string]
+        :param duration: time taken by the check in seconds [float]
+        """
+        self.code = code
+        self.name = name
+        self.status = status
+        self.message = message
+        self.key = key
+        self.duration = duration
+
+    @classmethod
+    def from_check(cls, code, name, res, msg, prefix=""):
+        """
+        Creates a result from the (boolean, message) returned by a check.
+
+        :param prefix: text put before the message of a failure [string]
+        """
+        if res == False:
+            message = prefix + msg if prefix else msg
+            return cls(code, name, FAILED, message)
+
+        return cls(code, name, OK)
+
+    @property
+    def ok(self):
+        return self.status == OK
+
+    def as_tuple(self):
+        return tuple(getattr(self, field) for field in RESULT_FIELDS)
+
+    def __eq__(self, other):
+        return isinstance(other, CheckResult) and self.as_tuple() == other.as_tuple()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __str__(self):
+        if self.status == OK:
+            return "{}: [{}]: OK".format(self.code, self.name)
+
+        return "{}: [{}]: {}:: {}".format(self.code, self.name, self.status, self.message)
+
+    def __repr__(self):
+        return "CheckResult({})".format(", ".join(repr(value) for value in self.as_tuple()))
+
+
+class ResultTable(object):
+    """
+    Column store of check results.
+    """
+
+    def __init__(self, results=None):
+        """
+
+        :param results: iterable of CheckResult objects
+        """
+        self.columns = dict((field, []) for field in RESULT_FIELDS)
+        if results is not None:
+            self.extend(results)
+
+    def append(self, result):
+        for field in RESULT_FIELDS:
+            self.columns[field].append(getattr(result, field))
+
+    def extend(self, results):
+        for result in results:
+            self.append(result)
+
+    def __len__(self):
+        return len(self.columns["code"])
+
+    def __iter__(self):
+        for row in zip(*[self.columns[field] for field in RESULT_FIELDS]):
+            yield CheckResult(*row)
+
+    def to_numpy(self):
+        """
+        Returns the results as a NumPy structured array, with a fixed width
+        unicode field for each string column.
+
+        :return: numpy structured array
+        """
+        import numpy as np
+
+        dtype = []
+        for field in RESULT_FIELDS:
+            if field == "duration":
+                dtype.append((field, "f8"))
+            else:
+                width = max([len(value) for value in self.columns[field]] + [1])
+                dtype.append((field, "U{}".format(width)))
+
+        array = np.empty(len(self), dtype=dtype)
+        for field in RESULT_FIELDS:
+            array[field] = self.columns[field]
+
+        return array
+
+    @classmethod
+    def from_numpy(cls, array):
+        """
+        Creates a ResultTable from a structured array made by `to_numpy`.
+        """
+        table = cls()
+        for field in RESULT_FIELDS:
+            table.columns[field] = array[field].tolist()
+
+        return table
+
+    def to_arrow(self):
+        """
+        Returns the results as a pyarrow Table (pyarrow must be installed).
+        """
+        import pyarrow
+
+        return pyarrow.table(dict((field, self.columns[field]) for field in RESULT_FIELDS))
+
+    def write(self, path):
+        """
+        Writes the results to `path`, in a format given by its extension:
+        ".npy" (NumPy structured array), ".parquet" or ".arrow" (pyarrow must
+        be installed for the last two).
+
+        :param path: output file path [string]
+        """
+        ext = os.path.splitext(path)[1]
+
+        if ext == ".npy":
+            import numpy as np
+            np.save(path, self.to_numpy())
+        elif ext == ".parquet":
+            import pyarrow.parquet
+            pyarrow.parquet.write_table(self.to_arrow(), path)
+        elif ext == ".arrow":
+            import pyarrow.feather
+            pyarrow.feather.write_feather(self.to_arrow(), path)
+        else:
+            raise ValueError("Unknown results format: {}".format(ext))
+
+    @classmethod
+    def read(cls, path):
+        """
+        Reads results written by `write` to a ".npy" file.
+        """
+        import numpy as np
+
+        return cls.from_numpy(np.load(path))
+
+
+def summarise(array):
+    """
+    Counts the results of each check by status.
+
+    :param array: structured array of results (from `ResultTable.to_numpy`)
+    :return: dictionary of {(code, status): count}
+    """
+    import numpy as np
+
+    pairs, counts = np.unique(array[["code", "status"]], return_counts=True)
+    return dict((tuple(pair), int(count)) for pair, count in zip(pairs.tolist(), counts.tolist()))
@@ -0,0 +1,100 @@
+"""
+crawl_archive.py
+================
+
+Crawls a DRS archive and writes one line per file found:
+
+    <dataset id>\t<file path>
+
+or just the file path with `--paths-only` (e.g. to pipe into
+`run_filename_prechecks.py` or `run_batch_timechecks.py --file-list -`).
+
+With `--check <output_dir>` the files are instead checked (as in
+`run_batch_timechecks.py`) in batches as they are found, with one log per file.
+A directory is then only recorded in the journal once all of its files have
+been checked.
+
+Example:
+
+    python crawl_archive.py /badc/cmip5/data --filter table=Amon,Omon --filter ensemble=r1i1p1 --journal crawl.journal
+
+An interrupted crawl is resumed by running it again with the same journal.
+
+"""
+
+import sys
+import argparse
+from itertools import islice
+
+from time_checks.crawler import DRSCrawler, parse_filters, DEFAULT_WORKERS
+
+
+def write_listing(records, outstream, paths_only=False):
+    """
+    Writes crawl records to `outstream`.
+
+    :param records: iterable of tuples of: (dataset id, file path)
+    :param outstream: file-like object
+    :param paths_only: if True, only write the file paths [boolean]
+    :return: number of records written [int]
+    """
+    count = 0
+    for dataset_id, path in records:
+        outstream.write(path + "\n" if paths_only else "{}\t{}\n".format(dataset_id, path))
+        count += 1
+
+    return count
+
+
+def check_records(records, odir, batch_size=1000, on_checked=None):
+    """
+    Runs the file level checks over the files of crawl records in batches,
+    writing one log per file to `odir`.
+
+    :param records: iterable of tuples of: (dataset id, file path)
+    :param odir: output directory [string]
+    :param batch_size: number of files checked per batch [int]
+    :param on_checked: callable taking the paths of each batch once they have
+                       been checked (e.g. `DRSCrawler.acknowledge`), or None
+    :return: number of files checked [int]
+    """
+    from time_checks.async_scheduler import TierLimits
+    from time_checks.scripts.run_batch_timechecks import main as run_batch
+
+    records = iter(records)
+    count = 0
+
+    while True:
+        batch = [path for dataset_id, path in islice(records, batch_size)]
+        if not batch:
+            return count
+
+        run_batch(batch, odir, TierLimits())
+        if on_checked is not None:
+            on_checked(batch)
+        count += len(batch)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Crawl a DRS archive for files to check.")
+    parser.add_argument("root", help="root directory of the archive")
+    parser.add_argument("--filter", action="append", default=[],
+                        help="facet filter as <facet>=<value>[,<value>...], values may be glob patterns "
+                             "(can be repeated)")
+    parser.add_argument("--journal", default=None, help="checkpoint journal, to resume an interrupted crawl")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="number of directory listing threads")
+    parser.add_argument("--pattern", default="*.nc", help="glob pattern of the file names to find")
+    parser.add_argument("--paths-only", action="store_true", help="only write the file paths")
+    parser.add_argument("--check", default=None, metavar="ODIR",
+                        help="check the files as they are found, writing the logs to ODIR")
+    parser.add_argument("--batch-size", type=int, default=1000, help="number of files checked per batch")
+    args = parser.parse_args()
+
+    crawler = DRSCrawler(args.root, filters=parse_filters(args.filter), pattern=args.pattern,
+                         workers=args.workers, journal=args.journal, deferred=bool(args.check))
+
+    if args.check:
+        check_records(crawler, args.check, batch_size=args.batch_size, on_checked=crawler.acknowledge)
+    else:
+        write_listing(crawler, sys.stdout, paths_only=args.paths_only)
@@ -0,0 +1,86 @@
+"""
+run_archive_timechecks.py
+=========================
+
+Runs the archive level time checks over a listing of paths, one per line,
+read from a file or from stdin. No files are opened.
+
+T1.007: [cross_variable_coverage] checks that each variable of a
+model/experiment/ensemble/table covers the same period (from the time
+components of its file names) as most of the other variables of the group.
+
+One line is written per dataset (a variable in a group), in the form:
+
+    <dataset name>\t<error code>: [<check name>]: <status>[:: <message>]
+
+Example:
+
+    python crawl_archive.py /badc/cmip5/data --paths-only | python run_archive_timechecks.py - --failures-only
+
+"""
+
+import sys
+import argparse
+
+from time_checks.archive_time_checks import CoverageIndex, iter_coverage_results
+from time_checks.filename_prechecks import iter_path_batches
+from time_checks.results import ResultTable
+
+
+def main(listing, ofile=None, failures_only=False, export=None):
+    """
+    Runs the archive level checks over a listing of paths.
+
+    :param listing: path to the listing file, or "-" for stdin [string]
+    :param ofile: path to the output file, stdout if not set [string]
+    :param failures_only: only write the results that are not OK [boolean]
+    :param export: path to also write all the results to (.npy, .parquet or .arrow), or None [string]
+    :return: tuple of: (number of datasets checked, number of datasets that failed)
+    """
+    instream = sys.stdin if listing == "-" else open(listing)
+    index = CoverageIndex()
+
+    try:
+        for batch in iter_path_batches(instream):
+            index.add_paths(batch)
+    finally:
+        if instream is not sys.stdin:
+            instream.close()
+
+    outstream = sys.stdout if ofile is None else open(ofile, "w")
+    table = ResultTable() if export else None
+    n_checked = n_failed = 0
+
+    try:
+        for res in iter_coverage_results(index):
+            n_checked += 1
+            if not res.ok:
+                n_failed += 1
+
+            if not (failures_only and res.ok):
+                outstream.write("{}\t{}\n".format(res.key, res))
+
+            if table is not None:
+                table.append(res)
+    finally:
+        if outstream is not sys.stdout:
+            outstream.close()
+
+    if table is not None:
+        table.write(export)
+
+    return n_checked, n_failed
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Run the archive level time checks over a listing of paths.")
+    parser.add_argument("listing", nargs="?", default="-", help="file listing one path per line ('-' for stdin)")
+    parser.add_argument("-o", "--output", default=None, help="file to write results to (default: stdout)")
+    parser.add_argument("--failures-only", action="store_true", help="only write results that are not OK")
+    parser.add_argument("--export", default=None,
+                        help="also write all the results to this .npy, .parquet or .arrow file")
+    args = parser.parse_args()
+
+    n_checked, n_failed = main(args.listing, args.output, failures_only=args.failures_only, export=args.export)
+    sys.stderr.write("Checked {} datasets: {} failed\n".format(n_checked, n_failed))
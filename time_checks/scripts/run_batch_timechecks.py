@@ -0,0 +1,260 @@
+"""
+run_batch_timechecks.py
+=======================
+
+Runs the file level time checks (as in `run_file_timechecks.py`) over many
+files, with reads scheduled by asyncio and limited per storage tier.
+
+Files are given as arguments or, with `--file-list`, read from a file ("-"
+for stdin). One log file is written per input file, as `run_file_timechecks.py`.
+
+Tiers are given as path prefixes with a limit on the number of files read at
+once from each, e.g.:
+
+    python run_batch_timechecks.py --tier /badc=8 --tier /neodc/tape=2 --file-list files.txt -o logs
+
+Files that match no prefix share the default limit (or, with `--tier-by-mount`,
+get a tier per mount point).
+
+With `--export <path>` all the results are also written to a single ".npy",
+".parquet" or ".arrow" file (see `time_checks.results.ResultTable`).
+
+With `--shared-memory` the files are read in reader processes (`--processes`)
+and checked in separate checker processes (`--checkers`), the time axes being
+passed between them in shared memory rather than pickled.
+
+With `--memory-budget <size>` (e.g. "8G") files are only read once the memory
+needed to check them, estimated from the length of their time axis in the
+file header, fits in the budget shared by all the workers. Files estimated
+above `--max-file-memory` (default: the whole budget) are checked reading
+their time axis in chunks of `--chunk-size` steps. The peak RSS of each
+worker process is then written to "memory_usage.log" in the output
+directory (use `--report-rss` to get it without a budget).
+
+With `--diagnose-layout` the performance diagnostic P1.000 (time variable
+stored in many small chunks) is also reported for each file.
+
+With `--profile <dir>` the reads and checks are profiled with cProfile in
+each worker (for a sample of the files with `--profile-sample`), and the
+profiles are merged into "merged.pstats" and "merged.collapsed.txt" (for
+flamegraph tools) in that directory (see `time_checks.profiling`). The
+profiles of an earlier run in that directory are removed first.
+
+"""
+
+import os
+import sys
+import argparse
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+from time_checks.async_scheduler import AsyncCheckScheduler, TierLimits, DEFAULT_TIER_LIMIT, read_dataset_dict
+from time_checks.memory_budget import MemoryBudget, parse_size, format_peak_rss
+from time_checks.profiling import ProfiledCall, clear_profiles, merge_profiles, print_summary, DEFAULT_SAMPLE_RATE
+from time_checks.results import ResultTable
+from time_checks.scripts.run_file_timechecks import run_tests, get_log_path, check_file_in_chunks
+
+
+DEFAULT_CHUNK_SIZE = 1000000
+
+MEMORY_LOG = "memory_usage.log"
+
+
+def write_log(ifile, odir, results):
+    """
+    Writes the results for `ifile` to its log file in `odir`.
+
+    :param ifile: file path [string]
+    :param odir: output directory [string]
+    :param results: list of result strings, or an exception raised reading the file
+    """
+    with open(get_log_path(ifile, odir), 'w+') as w:
+        w.writelines(["Time checks of: {} \n".format(ifile)])
+
+        if isinstance(results, Exception):
+            w.writelines(["FATAL could not check {}: {} \n".format(ifile, results)])
+        else:
+            for res in results:
+                w.writelines([str(res), '\n'])
+
+
+def write_memory_log(odir, scheduler):
+    """
+    Writes the peak RSS of each worker (and the peak use of the memory budget)
+    to the memory log in `odir`.
+
+    :return: list of the lines written
+    """
+    lines = format_peak_rss(scheduler.peak_rss)
+
+    budget = scheduler.memory_budget
+    if budget is not None:
+        lines.append("Memory budget: peak {:.1f} MiB of {:.1f} MiB".format(
+            budget.peak / 1024. ** 2, budget.total_bytes / 1024. ** 2))
+
+    with open(os.path.join(odir, MEMORY_LOG), 'w+') as w:
+        w.writelines([line + '\n' for line in lines])
+
+    return lines
+
+
+def write_merged_profile(profile_dir):
+    """
+    Merges the worker profiles in `profile_dir` and prints where they were
+    written, with the functions taking the most time.
+    """
+    merged = merge_profiles(profile_dir)
+    if merged is None:
+        sys.stderr.write("No profiles were written to {}\n".format(profile_dir))
+        return
+
+    stats, merged_path, collapsed_path = merged
+    print_summary(stats, sys.stderr)
+    sys.stderr.write("Merged profile: {}\n".format(merged_path))
+    sys.stderr.write("Collapsed stacks: {}\n".format(collapsed_path))
+
+
+def main(ifiles, odir, tier_limits, processes=None, export=None, shared_memory=False, checkers=1,
+         memory_budget=None, report_rss=False, diagnostics=False, profile_dir=None,
+         profile_sample=DEFAULT_SAMPLE_RATE):
+    """
+    Runs the file level checks over `ifiles` and writes a log per file to `odir`.
+
+    :param ifiles: sequence of NetCDF file paths
+    :param odir: output directory [string]
+    :param tier_limits: TierLimits instance
+    :param processes: number of reader processes (default: the sum of the tier limits) [int]
+    :param export: path to write all the results to, or None [string]
+    :param shared_memory: read and check in separate processes, passing the time
+                          axes in shared memory [boolean]
+    :param checkers: number of checker processes (with `shared_memory`) [int]
+    :param memory_budget: MemoryBudget instance to admit files against, or None
+    :param report_rss: write the peak RSS of each worker to the memory log
+                       (always done with a memory budget) [boolean]
+    :param diagnostics: also run the performance diagnostic P1.000 [boolean]
+    :param profile_dir: if set, profile the workers and write the profiles to this directory [string]
+    :param profile_sample: fraction of the files profiled [float]
+    :return: list of tuples of: (path, results)
+    """
+    if not os.path.isdir(odir):
+        os.makedirs(odir)
+
+    if profile_dir:
+        clear_profiles(profile_dir)
+
+    def profiled(func):
+        return ProfiledCall(func, profile_dir, sample_rate=profile_sample) if profile_dir else func
+
+    report_rss = report_rss or memory_budget is not None
+    checker = functools.partial(run_tests, diagnostics=True) if diagnostics else run_tests
+    options = {"memory_budget": memory_budget, "report_rss": report_rss}
+    if memory_budget is not None:
+        options["fallback_reader"] = profiled(functools.partial(check_file_in_chunks,
+                                                                chunk_size=memory_budget.chunk_size,
+                                                                diagnostics=diagnostics))
+
+    if shared_memory:
+        # Imported here as numpy is only needed for this mode
+        from time_checks import shared_axes
+
+        shared_axes.start_resource_tracker()
+        read_executor = ProcessPoolExecutor(max_workers=processes)
+        check_executor = ProcessPoolExecutor(max_workers=checkers)
+        scheduler = AsyncCheckScheduler(profiled(shared_axes.SharedAxisChecker(checker)),
+                                        reader=profiled(shared_axes.publish_axis),
+                                        tier_limits=tier_limits, read_executor=read_executor,
+                                        check_executor=check_executor, **options)
+    else:
+        read_executor = ProcessPoolExecutor(max_workers=processes) if processes else None
+        check_executor = None
+        scheduler = AsyncCheckScheduler(profiled(checker), reader=profiled(read_dataset_dict), tier_limits=tier_limits,
+                                        read_executor=read_executor, **options)
+
+    try:
+        results = scheduler.run(ifiles)
+    finally:
+        for executor in (read_executor, check_executor):
+            if executor is not None:
+                executor.shutdown()
+
+    for ifile, result in results:
+        write_log(ifile, odir, result)
+
+    if report_rss:
+        for line in write_memory_log(odir, scheduler):
+            print(line)
+
+    if profile_dir:
+        write_merged_profile(profile_dir)
+
+    if export:
+        table = ResultTable()
+        for ifile, result in results:
+            if not isinstance(result, Exception):
+                table.extend(result)
+        table.write(export)
+
+    return results
+
+
+def read_file_list(listing):
+    """
+    Reads a list of paths (one per line) from a file, or stdin if `listing` is "-".
+    """
+    stream = sys.stdin if listing == "-" else open(listing)
+    try:
+        return [line.strip() for line in stream if line.strip()]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Run the file level time checks over many NetCDF files.")
+    parser.add_argument("ifiles", nargs="*", help="NetCDF files to check")
+    parser.add_argument("--file-list", default=None, help="file listing paths to check, one per line ('-' for stdin)")
+    parser.add_argument("-o", "--odir", default=".", help="output directory for the log files")
+    parser.add_argument("--tier", action="append", default=[],
+                        help="storage tier as <path prefix>=<max concurrent reads> (can be repeated)")
+    parser.add_argument("--default-limit", type=int, default=DEFAULT_TIER_LIMIT,
+                        help="max concurrent reads for paths matching no tier")
+    parser.add_argument("--tier-by-mount", action="store_true",
+                        help="give paths matching no tier a tier per mount point")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="number of reader processes (default: the sum of the tier limits)")
+    parser.add_argument("--shared-memory", action="store_true",
+                        help="check in separate processes, passing the time axes in shared memory")
+    parser.add_argument("--checkers", type=int, default=1, help="number of checker processes (with --shared-memory)")
+    parser.add_argument("--export", default=None,
+                        help="also write all the results to this .npy, .parquet or .arrow file")
+    parser.add_argument("--memory-budget", default=None,
+                        help="memory shared by the files being checked, e.g. 8G (default: no limit)")
+    parser.add_argument("--max-file-memory", default=None,
+                        help="check files estimated above this memory in chunks (default: the whole budget)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="time steps read at once for files checked in chunks")
+    parser.add_argument("--report-rss", action="store_true",
+                        help="write the peak RSS of each worker to {} in the output directory".format(MEMORY_LOG))
+    parser.add_argument("--diagnose-layout", action="store_true",
+                        help="also report time variables stored in many small chunks (P1.000)")
+    parser.add_argument("--profile", default=None, metavar="DIR",
+                        help="profile the workers with cProfile, writing the profiles to DIR")
+    parser.add_argument("--profile-sample", type=float, default=DEFAULT_SAMPLE_RATE,
+                        help="fraction of the files profiled (with --profile)")
+    args = parser.parse_args()
+
+    ifiles = list(args.ifiles)
+    if args.file_list:
+        ifiles.extend(read_file_list(args.file_list))
+
+    tier_limits = TierLimits.from_strings(args.tier, default_limit=args.default_limit, by_mount=args.tier_by_mount)
+    memory_budget = None
+    if args.memory_budget:
+        max_file_bytes = parse_size(args.max_file_memory) if args.max_file_memory else None
+        memory_budget = MemoryBudget(parse_size(args.memory_budget), args.chunk_size, max_file_bytes=max_file_bytes)
+
+    main(ifiles, args.odir, tier_limits, processes=args.processes, export=args.export,
+         shared_memory=args.shared_memory, checkers=args.checkers, memory_budget=memory_budget,
+         report_rss=args.report_rss, diagnostics=args.diagnose_layout, profile_dir=args.profile,
+         profile_sample=args.profile_sample)
@@ -0,0 +1,316 @@
+"""
+run_distributed_timechecks.py
+=============================
+
+Runs the file level checks (as `run_file_timechecks.py`) and the multifile
+check (as `run_multifile_timechecks.py`) across many nodes sharing a
+filesystem, through a work queue in a directory (see `time_checks.work_queue`).
+
+1. The coordinator submits the files, in shards of `--shard-size` files, and
+   (with `--multifile`) one multifile task per dataset (directory):
+
+    python run_distributed_timechecks.py submit /gws/queue --file-list files.txt --shard-size 50 --multifile
+
+   A queue that still holds the tasks or results of an earlier run is only
+   reused with `--force`, which clears it first.
+
+2. Workers are started on any number of nodes (e.g. as a job array), each
+   running `--workers` local worker processes until the queue is finished:
+
+    python run_distributed_timechecks.py worker /gws/queue --workers 8
+
+   A worker that dies loses its lease after `--lease-time` seconds and its
+   task is claimed by another worker.
+
+3. The results are merged into one log file per file and per dataset, as
+   the other runners write them (and optionally exported as one table):
+
+    python run_distributed_timechecks.py merge /gws/queue -o logs --export results.npy
+
+`status` prints the number of tasks in each state.
+
+With `worker --profile` each worker process profiles its tasks (a sample of
+them with `--profile-sample`) with cProfile, writing its profile to the
+"profiles" directory of the queue, and `merge --profile` merges the profiles
+of all the workers of all the nodes into "merged.pstats" and
+"merged.collapsed.txt" in that directory (see `time_checks.profiling`). The
+profiles of an earlier run are removed when the files are submitted.
+
+"""
+
+import os
+import sys
+import argparse
+import functools
+import multiprocessing
+
+from time_checks.results import CheckResult, ResultTable
+from time_checks.watcher import datasets_of
+from time_checks.work_queue import WorkQueue, run_worker, DEFAULT_LEASE_TIME, DEFAULT_POLL_INTERVAL
+from time_checks.profiling import ProfiledCall, clear_profiles, DEFAULT_SAMPLE_RATE
+from time_checks.scripts import run_batch_timechecks
+from time_checks.scripts.watch_ingest import get_multifile_log_path
+
+
+DEFAULT_SHARD_SIZE = 50
+
+PROFILE_DIR = "profiles"
+
+
+def get_dataset_id(dataset_dir):
+    """
+    Returns the id of a dataset from its directory: the path with "." separators.
+    """
+    return ".".join(part for part in os.path.abspath(dataset_dir).split(os.sep) if part)
+
+
+def submit(queue, ifiles, shard_size=DEFAULT_SHARD_SIZE, multifile=False, force=False):
+    """
+    Submits the file level checks of `ifiles` in shards of `shard_size` files
+    and, with `multifile`, a multifile check per dataset (directory).
+
+    :param queue: WorkQueue instance
+    :param ifiles: sequence of NetCDF file paths
+    :param shard_size: number of files per task [int]
+    :param multifile: also submit the multifile checks [boolean]
+    :param force: clear the queue (and its profiles) if it is not empty,
+                  rather than raising a ValueError [boolean]
+    :return: list of the task ids
+    """
+    if not queue.is_empty():
+        if not force:
+            raise ValueError("Queue {} holds the tasks or results of an earlier run, "
+                             "use --force to clear it".format(queue.queue_dir))
+
+        queue.clear()
+
+    clear_profiles(get_profile_dir(queue))
+    queue.create()
+    ifiles = list(ifiles)
+    task_ids = []
+
+    for index, start in enumerate(range(0, len(ifiles), shard_size)):
+        task_ids.append(queue.submit("file", {"paths": ifiles[start:start + shard_size]},
+                                     "file-{:06d}".format(index)))
+
+    if multifile:
+        for index, dataset_dir in enumerate(datasets_of(ifiles)):
+            paths = sorted(path for path in ifiles if os.path.dirname(path) == dataset_dir)
+            task_ids.append(queue.submit("multifile", {"dataset": get_dataset_id(dataset_dir), "paths": paths},
+                                         "multifile-{:06d}".format(index)))
+
+    return task_ids
+
+
+def check_file(ifile, chunk_size=None):
+    """
+    Runs the file level checks on a file.
+
+    :return: list of result tuples (see `CheckResult.as_tuple`), or an error message [string]
+    """
+    # Imported here so that the coordinator does not import netCDF4
+    from time_checks import utils
+    from time_checks.scripts.run_file_timechecks import run_tests, check_file_in_chunks
+
+    try:
+        if chunk_size:
+            results = check_file_in_chunks(ifile, chunk_size)
+        else:
+            ds = utils._netcdf4().Dataset(ifile)
+            try:
+                results = run_tests(ifile, ds)
+            finally:
+                ds.close()
+    except Exception as err:
+        return str(err)
+
+    return [list(res.as_tuple()) for res in results]
+
+
+def run_task(task, chunk_size=None):
+    """
+    Runs a task of the queue.
+
+    :param task: task dictionary
+    :param chunk_size: if set, read the time axes in chunks of this many steps [int]
+    :return: for a "file" task, a list of [path, results or error message];
+             for a "multifile" task, the result tuple of the multifile check
+    """
+    if task["kind"] == "file":
+        return [[path, check_file(path, chunk_size)] for path in task["payload"]["paths"]]
+
+    # Imported here as it imports netCDF4
+    from time_checks.scripts import run_multifile_timechecks
+
+    return list(run_multifile_timechecks.check_files(task["payload"]["paths"]).as_tuple())
+
+
+def get_profile_dir(queue):
+    return os.path.join(queue.queue_dir, PROFILE_DIR)
+
+
+def _task_id(task):
+    return task["id"]
+
+
+def _worker_main(queue_dir, lease_time, poll_interval, chunk_size, profile=False,
+                 profile_sample=DEFAULT_SAMPLE_RATE, worker_id=None):
+    queue = WorkQueue(queue_dir, lease_time=lease_time)
+    task_runner = functools.partial(run_task, chunk_size=chunk_size)
+    if profile:
+        task_runner = ProfiledCall(task_runner, get_profile_dir(queue), sample_rate=profile_sample, key=_task_id)
+
+    return run_worker(queue, task_runner, worker_id=worker_id, poll_interval=poll_interval)
+
+
+def start_workers(queue_dir, workers=1, lease_time=DEFAULT_LEASE_TIME, poll_interval=DEFAULT_POLL_INTERVAL,
+                  chunk_size=None, profile=False, profile_sample=DEFAULT_SAMPLE_RATE):
+    """
+    Runs `workers` worker processes on this node until the queue is finished.
+
+    :param queue_dir: directory of the queue [string]
+    :param workers: number of worker processes [int]
+    :param lease_time: seconds after which a task claimed by a dead worker is taken back [float]
+    :param poll_interval: seconds between claims when all the tasks left are claimed [float]
+    :param chunk_size: if set, read the time axes in chunks of this many steps [int]
+    :param profile: profile the tasks, writing the profiles to the queue [boolean]
+    :param profile_sample: fraction of the tasks profiled [float]
+    """
+    args = (queue_dir, lease_time, poll_interval, chunk_size, profile, profile_sample)
+    if workers == 1:
+        _worker_main(*args)
+        return
+
+    processes = [multiprocessing.Process(target=_worker_main, args=args) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def merge_results(queue, odir, export=None):
+    """
+    Writes the results of all the tasks run to log files in `odir`: one per
+    file (as `run_file_timechecks.py`) and one per dataset for the multifile
+    checks ("<dataset id>__multifile_timecheck.log").
+
+    :param queue: WorkQueue instance
+    :param odir: output directory [string]
+    :param export: path to write all the results to, or None [string]
+    :return: list of the ids of the tasks that have no results yet
+    """
+    # Imported here as it imports netCDF4
+    from time_checks.scripts import run_multifile_timechecks
+
+    if not os.path.isdir(odir):
+        os.makedirs(odir)
+
+    table = ResultTable() if export else None
+
+    for task in queue.iter_results():
+        payload = task["payload"]
+
+        if task["kind"] == "file":
+            entries = task["results"] or [[path, task["error"]] for path in payload["paths"]]
+
+            for path, results in entries:
+                if isinstance(results, str):
+                    results = Exception(results)
+                else:
+                    results = [CheckResult(*res) for res in results]
+                    if table is not None:
+                        table.extend(results)
+
+                run_batch_timechecks.write_log(path, odir, results)
+        else:
+            if task["results"] is None:
+                res = CheckResult("T1.006", "check_multifile_temporal_continuity", "FAILED",
+                                  "Check could not be run: {}".format(task["error"]), key=payload["dataset"])
+            else:
+                res = CheckResult(*task["results"])
+
+            run_multifile_timechecks.write_log(get_multifile_log_path(payload["dataset"], odir), res,
+                                               payload["paths"])
+            if table is not None:
+                table.append(res)
+
+    if table is not None:
+        table.write(export)
+
+    return queue.missing_results()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Run the time checks over a work queue shared by many nodes.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    submit_parser = subparsers.add_parser("submit", help="submit files to check to the queue")
+    submit_parser.add_argument("queue_dir", help="directory of the queue (on a shared filesystem)")
+    submit_parser.add_argument("ifiles", nargs="*", help="NetCDF files to check")
+    submit_parser.add_argument("--file-list", default=None,
+                               help="file listing paths to check, one per line ('-' for stdin)")
+    submit_parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE, help="number of files per task")
+    submit_parser.add_argument("--multifile", action="store_true",
+                               help="also run the multifile check on each dataset (directory)")
+    submit_parser.add_argument("--force", action="store_true",
+                               help="clear the queue first if it holds tasks or results of an earlier run")
+
+    worker_parser = subparsers.add_parser("worker", help="run tasks of the queue until it is finished")
+    worker_parser.add_argument("queue_dir", help="directory of the queue (on a shared filesystem)")
+    worker_parser.add_argument("--workers", type=int, default=1, help="number of worker processes on this node")
+    worker_parser.add_argument("--lease-time", type=float, default=DEFAULT_LEASE_TIME,
+                               help="seconds after which a task claimed by a dead worker is taken back")
+    worker_parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                               help="seconds between claims when all the tasks left are claimed")
+    worker_parser.add_argument("--chunk-size", type=int, default=None,
+                               help="read the time axis in chunks of this many steps")
+    worker_parser.add_argument("--profile", action="store_true",
+                               help="profile the tasks with cProfile, writing the profiles to the queue")
+    worker_parser.add_argument("--profile-sample", type=float, default=DEFAULT_SAMPLE_RATE,
+                               help="fraction of the tasks profiled (with --profile)")
+
+    merge_parser = subparsers.add_parser("merge", help="write the log files from the results of the tasks")
+    merge_parser.add_argument("queue_dir", help="directory of the queue (on a shared filesystem)")
+    merge_parser.add_argument("-o", "--odir", default=".", help="output directory for the log files")
+    merge_parser.add_argument("--export", default=None,
+                              help="also write all the results to this .npy, .parquet or .arrow file")
+    merge_parser.add_argument("--profile", action="store_true",
+                              help="also merge the profiles written by the workers")
+
+    status_parser = subparsers.add_parser("status", help="print the number of tasks in each state")
+    status_parser.add_argument("queue_dir", help="directory of the queue (on a shared filesystem)")
+
+    args = parser.parse_args()
+
+    if args.command == "submit":
+        ifiles = list(args.ifiles)
+        if args.file_list:
+            ifiles.extend(run_batch_timechecks.read_file_list(args.file_list))
+        try:
+            task_ids = submit(WorkQueue(args.queue_dir), ifiles, shard_size=args.shard_size,
+                              multifile=args.multifile, force=args.force)
+        except ValueError as err:
+            sys.stderr.write("{}\n".format(err))
+            sys.exit(1)
+
+        print("Submitted {} tasks".format(len(task_ids)))
+
+    elif args.command == "worker":
+        start_workers(args.queue_dir, workers=args.workers, lease_time=args.lease_time,
+                      poll_interval=args.poll_interval, chunk_size=args.chunk_size, profile=args.profile,
+                      profile_sample=args.profile_sample)
+
+    elif args.command == "merge":
+        queue = WorkQueue(args.queue_dir)
+        missing = merge_results(queue, args.odir, export=args.export)
+        if args.profile:
+            run_batch_timechecks.write_merged_profile(get_profile_dir(queue))
+        if missing:
+            sys.stderr.write("{} tasks have no results yet: {}\n".format(len(missing), ", ".join(missing)))
+            sys.exit(1)
+
+    else:
+        for state, count in sorted(WorkQueue(args.queue_dir).status().items()):
+            print("{}: {}".format(state, count))
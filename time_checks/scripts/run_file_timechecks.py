@@ -21,14 +21,40 @@ T1.003: [time_format_matches_frequency]
 T1.004: [file_name_matches_time_var]
 T1.005: [regular_time_axis_increments]
 
+With `--diagnose-layout` a performance diagnostic is also reported:
+P1.000: [time_chunk_layout] fails if the time variable is stored in many
+small chunks (see `time_checks.chunk_layout`), which makes the file slow to read.
+It only needs the header of the file, so it does not make the file be read.
+
+With `--filename-only` only checks T1.000 to T1.003 are run. These need
+nothing but the file name, so netCDF4 is never imported and the file does
+not need to exist.
+
+With `--chunk-size N` the time axis is read N steps at a time, so memory use
+is bounded by the chunk size rather than by the length of the time axis. The
+time axis (and its bounds) is then read once for T1.005 and for two more checks:
+T1.006: [time_axis_increasing]
+T1.007: [time_bounds] (SKIPPED if the time variable has no bounds)
+
+The checks are run cheapest first. T1.004 and T1.005 are skipped (and reported
+as SKIPPED) if the file name checks they depend on did not pass, in which case
+the file is not read at all. Use `--no-short-circuit` to run every check, and
+`--checks` to run only some of them.
+
+With `--profile <dir>` the run is profiled with cProfile, and the profile is
+written to "merged.pstats" and "merged.collapsed.txt" (for flamegraph tools)
+in that directory (see `time_checks.profiling`), replacing any profiles of an
+earlier run.
+
 """
 import os
-from sys import argv
-from netCDF4 import Dataset, num2date
+import argparse
+import functools
 
-from time_checks import utils, constants
+from time_checks import utils, constants, time_utils, chunk_layout
 from time_checks.utils import resolve_dataset_type
-from time_checks import utils, time_utils, settings, constants
+from time_checks.results import CheckResult, SKIPPED
+from time_checks.check_registry import CheckRegistry, run_checks
 from time_checks.file_time_checks import check_file_name_time_format
 from time_checks.file_time_checks import check_file_name_matches_time_var
 from time_checks.file_time_checks import check_time_format_matches_frequency
@@ -38,40 +64,32 @@ from time_checks.file_time_checks import check_regular_time_axis_increments
 
 def test_filename_extension(file):
 
-    if not file.endswith('.nc'):
-        return "T1.000: [file_extension]: File does not end with '.nc'"
-    else:
-        return "T1.000: [file_extension]: OK"
+    return CheckResult.from_check("T1.000", "file_extension", file.endswith('.nc'),
+                                  "File does not end with '.nc'")
 
 
 @resolve_dataset_type
 def test_check_file_name_time_format(ds):
 
     res, msg = check_file_name_time_format(ds)
-    if res == False:
-        return "T1.001: [check_file_name_time_format]: FAILED:: Format of file name is not recognised. " + msg
-    else:
-       return "T1.001: [check_file_name_time_format]: OK"
+    return CheckResult.from_check("T1.001", "check_file_name_time_format", res, msg,
+                                  prefix="Format of file name is not recognised. ")
 
 
 @resolve_dataset_type
 def test_check_valid_temporal_element(ds):
 
     res, msg = check_valid_temporal_element(ds, time_index_in_name=-1)
-    if res == False:
-        return "T1.002: [check_valid_temporal_element]: FAILED:: Temporal elements are not valid. " + msg
-    else:
-        return "T1.002: [check_valid_temporal_element]: OK"
+    return CheckResult.from_check("T1.002", "check_valid_temporal_element", res, msg,
+                                  prefix="Temporal elements are not valid. ")
 
 @resolve_dataset_type
 def test_check_time_format_matches_frequency(ds):
 
     res, msg = check_time_format_matches_frequency(ds, frequency_index=1, time_index_in_name=-1)
-    if res == False:
-        return "T1.003: [time_format_matches_frequency]: FAILED:: " \
-               "Frequency element of the filename does not match frequency of data in the file. " + msg
-    else:
-        return "T1.003: [time_format_matches_frequency]: OK"
+    return CheckResult.from_check("T1.003", "time_format_matches_frequency", res, msg,
+                                  prefix="Frequency element of the filename does not match "
+                                         "frequency of data in the file. ")
 
 
 @resolve_dataset_type
@@ -94,64 +112,320 @@ def test_check_file_name_matches_time_var(ds):
     tolerance = "{}:{}".format(frequency, limit)
 
     res, msg = check_file_name_matches_time_var(ds, time_index_in_name=-1, tolerance=tolerance)
-    if res == False:
-        return "T1.004: [file_name_matches_time_var]: FAILED:: " \
-               "Frequency element of the filename does not match time format in file. " + msg
-    else:
-        return "T1.004: [file_name_matches_time_var]: OK"
+    return CheckResult.from_check("T1.004", "file_name_matches_time_var", res, msg,
+                                  prefix="Frequency element of the filename does not match time format in file. ")
+
+
+def _regular_time_axis_increments_result(res, msg):
+    return CheckResult.from_check("T1.005", "regular_time_axis_increments", res, msg,
+                                  prefix="Time axis increments are not regular. ")
 
 
 @resolve_dataset_type
 def test_check_regular_time_axis_increments(ds):
     res, msg = check_regular_time_axis_increments(ds, frequency_index=1)
-    if res == False:
-        return "T1.005: [regular_time_axis_increments]: FAILED:: Time axis increments are not regular. " + msg
+    return _regular_time_axis_increments_result(res, msg)
+
+
+def test_endpoints_file_name_matches_time_var(ds):
+    """
+    T1.004 on an open netCDF4 Dataset, reading only the first and last time values.
+    """
+    time_var = time_utils.get_time_variable(ds)
+    time_dict = utils._get_time_metadata(time_var)
+    time_dict["_data"] = [time_var[0], time_var[-1]]
+    endpoints = {"time": time_dict, "filename": utils.get_file_name_components(ds.filepath())}
+
+    return test_check_file_name_matches_time_var(endpoints)
+
+
+def test_streamed_file_name_matches_time_var(streamed):
+    """
+    T1.004 on a StreamedAxis, reading only the first and last time values.
+    """
+    return test_endpoints_file_name_matches_time_var(streamed.ds)
+
+
+def test_streamed_regular_time_axis_increments(streamed):
+    """
+    T1.005 on a StreamedAxis (see `time_checks.axis_stream`).
+    """
+    axis_state, _ = streamed.states
+    return _regular_time_axis_increments_result(*axis_state.regular_result())
+
+
+def test_streamed_time_axis_increasing(streamed):
+    """
+    T1.006 on a StreamedAxis: the time values are strictly increasing.
+    """
+    axis_state, _ = streamed.states
+    res, msg = axis_state.monotonic_result()
+    return CheckResult.from_check("T1.006", "time_axis_increasing", res, msg)
+
+
+def test_streamed_time_bounds(streamed):
+    """
+    T1.007 on a StreamedAxis: each time value lies within its bounds and the
+    bounds are contiguous (SKIPPED if there are no bounds).
+    """
+    _, bounds_state = streamed.states
+    if bounds_state is None:
+        return CheckResult("T1.007", "time_bounds", SKIPPED, "No time bounds")
+
+    res, msg = bounds_state.result()
+    return CheckResult.from_check("T1.007", "time_bounds", res, msg)
+
+
+def _open_streamed_axis(load_dataset, chunk_size):
+    # Imported here so that the file name tests do not import numpy
+    from time_checks import axis_stream
+
+    return axis_stream.StreamedAxis(load_dataset(), chunk_size)
+
+
+def test_time_chunk_layout(ds):
+    """
+    P1.000 on an open netCDF4 Dataset (only its header is read), or on a
+    dataset dictionary holding the storage layout of its time variable
+    (SKIPPED if it does not).
+    """
+    if utils.is_netcdf_dataset(ds):
+        layout = chunk_layout.get_chunk_layout(time_utils.get_time_variable(ds))
     else:
-        return "T1.005: [regular_time_axis_increments]: OK"
+        storage = ds["time"].get("_storage")
+        layout = chunk_layout.ChunkLayout(**storage) if storage else None
+
+    res, msg = chunk_layout.check_time_chunk_layout(layout)
+    if res is None:
+        return CheckResult("P1.000", "time_chunk_layout", SKIPPED, msg)
 
+    return CheckResult.from_check("P1.000", "time_chunk_layout", res, msg,
+                                  prefix="Storage layout of the time variable is slow to read. ")
 
-def main(ifile, odir):
+
+def get_file_checks(chunk_size=None, diagnostics=False):
+    """
+    Returns the registry of the file level checks (T1.000 to T1.005), with
+    their dependencies and relative costs.
+
+    The data checks take the dataset dictionary or, if `chunk_size` is set, a
+    StreamedAxis (the time axis is then read in chunks, and T1.006 and T1.007
+    are also registered).
+
+    :param chunk_size: number of time steps read at once, or None [int]
+    :param diagnostics: also register the performance diagnostic P1.000 [boolean]
+    :return: CheckRegistry instance
+    """
+    registry = CheckRegistry()
+    registry.register("T1.000", "file_extension", test_filename_extension, takes="path", cost=0.)
+    registry.register("T1.001", "check_file_name_time_format", test_check_file_name_time_format,
+                      takes="name", cost=1.)
+    registry.register("T1.002", "check_valid_temporal_element", test_check_valid_temporal_element,
+                      takes="name", cost=1.)
+    registry.register("T1.003", "time_format_matches_frequency", test_check_time_format_matches_frequency,
+                      takes="name", cost=1.)
+
+    if chunk_size:
+        t1_004 = test_streamed_file_name_matches_time_var
+        t1_005 = test_streamed_regular_time_axis_increments
+    else:
+        t1_004 = test_check_file_name_matches_time_var
+        t1_005 = test_check_regular_time_axis_increments
+
+    # The data checks need valid time and frequency elements in the file name
+    registry.register("T1.004", "file_name_matches_time_var", t1_004, takes="data",
+                      depends=["T1.001", "T1.002", "T1.003"], cost=100.)
+    registry.register("T1.005", "regular_time_axis_increments", t1_005, takes="data",
+                      depends=["T1.001", "T1.003"], cost=100.)
+
+    if chunk_size:
+        # Read in the same pass over the time axis as T1.005
+        registry.register("T1.006", "time_axis_increasing", test_streamed_time_axis_increasing, takes="data",
+                          depends=["T1.001", "T1.003"], cost=100.)
+        registry.register("T1.007", "time_bounds", test_streamed_time_bounds, takes="data",
+                          depends=["T1.001", "T1.003"], cost=100.)
+
+    if diagnostics:
+        # Reported after the checks
+        registry.register("P1.000", "time_chunk_layout", test_time_chunk_layout, takes="header", cost=10.)
+
+    return registry
+
+
+FILE_CHECKS = get_file_checks()
+
+DIAGNOSTIC_FILE_CHECKS = get_file_checks(diagnostics=True)
+
+
+def _load_dataset_dict(ds):
+    """
+    Converts a dataset to a dictionary once and summarises its time axis, for all the data checks.
+    """
+    # Imported here so that the file name tests do not import numpy
+    from time_checks import axis_summary
+
+    return axis_summary.with_axis_summary(utils.resolve_dataset(ds))
+
+
+def run_filename_tests(ifile, short_circuit=False):
+    """
+    Runs the tests that only need the file name (T1.000 to T1.003).
+
+    :param ifile: file name or path [string]
+    :param short_circuit: skip tests whose prerequisites did not pass [boolean]
+    :return: list of CheckResult objects
+    """
+    return run_checks(FILE_CHECKS, ifile, None, takes=("path", "name"), short_circuit=short_circuit)
+
+
+def run_tests(ifile, ds, short_circuit=False, codes=None, diagnostics=False):
+    """
+    Runs all the tests (T1.000 to T1.005) on a dataset.
+
+    :param ifile: file name or path [string]
+    :param ds: input dataset [netCDF4 Dataset object or compliant dictionary]
+    :param short_circuit: skip tests whose prerequisites did not pass [boolean]
+    :param codes: codes of the tests to run (default: all) [sequence]
+    :param diagnostics: also run the performance diagnostic P1.000 [boolean]
+    :return: list of CheckResult objects
+    """
+    registry = DIAGNOSTIC_FILE_CHECKS if diagnostics else FILE_CHECKS
+    return run_checks(registry, ifile, lambda: _load_dataset_dict(ds), codes=codes, short_circuit=short_circuit,
+                      load_header=lambda: ds)
+
+
+def run_streaming_tests(ifile, ds, chunk_size, short_circuit=False, codes=None, diagnostics=False):
+    """
+    Runs all the tests (T1.000 to T1.007) on a netCDF4 Dataset, reading the
+    time axis in chunks of `chunk_size` steps so that memory use does not
+    depend on the length of the axis.
+
+    T1.004 only needs the first and last time values, so only those are read for it.
+
+    :param ifile: file name or path [string]
+    :param ds: netCDF4 Dataset object
+    :param chunk_size: number of time steps read at once [int]
+    :param short_circuit: skip tests whose prerequisites did not pass [boolean]
+    :param codes: codes of the tests to run (default: all) [sequence]
+    :param diagnostics: also run the performance diagnostic P1.000 [boolean]
+    :return: list of CheckResult objects
+    """
+    return run_checks(get_file_checks(chunk_size, diagnostics), ifile,
+                      functools.partial(_open_streamed_axis, lambda: ds, chunk_size),
+                      codes=codes, short_circuit=short_circuit, load_header=lambda: ds)
+
+
+def check_file_in_chunks(ifile, chunk_size, diagnostics=False):
+    """
+    Opens a netCDF file and runs all the tests on it, reading the time axis in
+    chunks of `chunk_size` steps. Used for files too big to read whole.
+
+    :param ifile: path of the netCDF file [string]
+    :param chunk_size: number of time steps read at once [int]
+    :param diagnostics: also run the performance diagnostic P1.000 [boolean]
+    :return: list of CheckResult objects
+    """
+    ds = utils._netcdf4().Dataset(ifile)
+    try:
+        return run_streaming_tests(ifile, ds, chunk_size, diagnostics=diagnostics)
+    finally:
+        ds.close()
+
+
+def get_log_path(ifile, odir):
+    """
+    Returns the path of the log file written for `ifile` in `odir`.
+    """
+    ncfile = os.path.basename(ifile)
+    return os.path.join(odir, ncfile.replace('.nc', '__file_timecheck.log'))
+
+
+def main(ifile, odir, filename_only=False, chunk_size=None, short_circuit=True, codes=None, diagnostics=False):
     """
      main() calls all the functions within this script
 
      Input arguments are
      1 - a NetCDF file with a '.nc' extension
      2 - output directory
+     3 - only run the file name tests (the file is not opened)
+     4 - if set, read the time axis in chunks of this many steps
+     5 - skip the tests whose prerequisites did not pass; the file is not
+         opened if all the data tests are skipped
+     6 - codes of the tests to run (default: all)
+     7 - also run the performance diagnostic P1.000
      :return: file with name of input file in the specified output directory
      """
-    is_file = os.path.isfile(ifile)
+    is_file = filename_only or os.path.isfile(ifile)
 
     if not os.path.isdir(odir):
         os.makedirs(odir)
 
-    ncfile = os.path.basename(ifile)
-    ofile = os.path.join(odir, ncfile.replace('.nc', '__file_timecheck.log'))
+    ofile = get_log_path(ifile, odir)
 
     with open(ofile, 'w+') as w:
         w.writelines(["Time checks of: {} \n".format(ifile)])
         if not is_file:
             w.writelines(["FATAL {} does not exist in the CEDA archive \n".format(ifile)])
+        elif filename_only:
+            for res in run_checks(FILE_CHECKS, ifile, None, codes=codes, takes=("path", "name"),
+                                  short_circuit=short_circuit):
+                w.writelines([str(res), '\n'])
         else:
-            ds = Dataset(ifile)
-            tests = [test_filename_extension(ifile),
-                     test_check_file_name_time_format(ds),
-                     test_check_valid_temporal_element(ds),
-                     test_check_time_format_matches_frequency(ds),
-                     test_check_file_name_matches_time_var(ds),
-                     test_check_regular_time_axis_increments(ds)
-                     ]
-            for test in tests:
-                res = test
-                w.writelines([res, '\n'])
+            opened = []
+
+            def open_dataset():
+                # Opened once for the header and data checks
+                if not opened:
+                    opened.append(utils._netcdf4().Dataset(ifile))
+                return opened[0]
+
+            try:
+                if chunk_size:
+                    results = run_checks(get_file_checks(chunk_size, diagnostics), ifile,
+                                         functools.partial(_open_streamed_axis, open_dataset, chunk_size),
+                                         codes=codes, short_circuit=short_circuit, load_header=open_dataset)
+                else:
+                    registry = DIAGNOSTIC_FILE_CHECKS if diagnostics else FILE_CHECKS
+                    results = run_checks(registry, ifile, lambda: _load_dataset_dict(open_dataset()),
+                                         codes=codes, short_circuit=short_circuit, load_header=open_dataset)
+            finally:
+                for ds in opened:
+                    ds.close()
+
+            for res in results:
+                w.writelines([str(res), '\n'])
 
 
 if __name__ == '__main__':
 
-    ifile = argv[1]
+    parser = argparse.ArgumentParser(description="Run the file level time checks on a NetCDF file.")
+    parser.add_argument("ifile", help="NetCDF file to check")
     # Set default odir to be local dir
-    odir = "."
-
-    if len(argv) > 2:
-        odir = argv[2]
-
-    main(ifile, odir)
+    parser.add_argument("odir", nargs="?", default=".", help="output directory for the log file")
+    parser.add_argument("--filename-only", action="store_true",
+                        help="only run the file name checks (T1.000 to T1.003), without opening the file")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="read the time axis in chunks of this many steps (for very long time axes)")
+    parser.add_argument("--no-short-circuit", action="store_true",
+                        help="run every check, even if the checks it depends on did not pass")
+    parser.add_argument("--checks", default=None,
+                        help="comma separated codes of the checks to run, e.g. T1.000,T1.004 (default: all)")
+    parser.add_argument("--diagnose-layout", action="store_true",
+                        help="also report a time variable stored in many small chunks (P1.000)")
+    parser.add_argument("--profile", default=None, metavar="DIR",
+                        help="profile the run with cProfile, writing the profile to DIR")
+    args = parser.parse_args()
+
+    codes = args.checks.split(",") if args.checks else None
+    kwargs = dict(filename_only=args.filename_only, chunk_size=args.chunk_size,
+                  short_circuit=not args.no_short_circuit, codes=codes, diagnostics=args.diagnose_layout)
+    if args.profile:
+        # Imported here so that a normal run does not import the batch runner
+        from time_checks.profiling import profile_call, clear_profiles
+        from time_checks.scripts.run_batch_timechecks import write_merged_profile
+
+        clear_profiles(args.profile)
+        profile_call(args.profile, main, args.ifile, args.odir, **kwargs)
+        write_merged_profile(args.profile)
+    else:
+        main(args.ifile, args.odir, **kwargs)
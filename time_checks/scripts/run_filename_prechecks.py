@@ -0,0 +1,54 @@
+"""
+run_filename_prechecks.py
+=========================
+
+Runs the file name checks (T1.000 to T1.003) over a listing of paths, one per
+line, read from a file or from stdin. No files are opened.
+
+One line is written per failure, in the form:
+
+    <path>\t<error code>: [<check name>]: FAILED:: <message>
+
+Example:
+
+    find /badc/cmip5/data -name "*.nc" | python run_filename_prechecks.py - -o failures.txt
+
+"""
+
+import sys
+import argparse
+
+from time_checks.filename_prechecks import precheck_stream
+
+
+def main(listing, ofile=None, batch_size=10000):
+    """
+    Runs the file name pre-checks over a listing of paths.
+
+    :param listing: path to the listing file, or "-" for stdin [string]
+    :param ofile: path to the output file, stdout if not set [string]
+    :param batch_size: number of paths checked per batch [int]
+    :return: tuple of: (number of paths checked, number of paths that failed)
+    """
+    instream = sys.stdin if listing == "-" else open(listing)
+    outstream = sys.stdout if ofile is None else open(ofile, "w")
+
+    try:
+        return precheck_stream(instream, outstream, batch_size=batch_size)
+    finally:
+        if instream is not sys.stdin:
+            instream.close()
+        if outstream is not sys.stdout:
+            outstream.close()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Run the file name time checks over a listing of paths.")
+    parser.add_argument("listing", nargs="?", default="-", help="file listing one path per line ('-' for stdin)")
+    parser.add_argument("-o", "--output", default=None, help="file to write failures to (default: stdout)")
+    parser.add_argument("--batch-size", type=int, default=10000, help="number of paths checked per batch")
+    args = parser.parse_args()
+
+    n_checked, n_failed = main(args.listing, args.output, batch_size=args.batch_size)
+    sys.stderr.write("Checked {} paths: {} failed\n".format(n_checked, n_failed))
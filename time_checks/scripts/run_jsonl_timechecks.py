@@ -0,0 +1,90 @@
+"""
+run_jsonl_timechecks.py
+=======================
+
+Runs the file level time checks (T1.000 to T1.005) over CEDA-CC style
+metadata records, one JSON record per line, read from a file or from stdin.
+No netCDF files are opened (see `time_checks.jsonl_ingest`).
+
+One line is written per result, in the order of the input records:
+
+    <path>\t<error code>: [<check name>]: <status>[:: <message>]
+
+Records that cannot be decoded or checked are reported as:
+
+    <path or line number>\tFATAL could not check: <error>
+
+Example:
+
+    python run_jsonl_timechecks.py harvest.jsonl -o results.txt --failures-only
+
+"""
+
+import sys
+import argparse
+
+from time_checks.jsonl_ingest import ingest_stream
+from time_checks.results import ResultTable
+from time_checks.scripts.run_file_timechecks import run_tests
+
+
+def main(listing, ofile=None, batch_size=1000, failures_only=False, export=None):
+    """
+    Runs the file level checks over a JSON Lines file of metadata records.
+
+    :param listing: path to the JSON Lines file, or "-" for stdin [string]
+    :param ofile: path to the output file, stdout if not set [string]
+    :param batch_size: number of records checked per batch [int]
+    :param failures_only: only write the results that are not OK [boolean]
+    :param export: path to also write all the results to (.npy, .parquet or .arrow), or None [string]
+    :return: tuple of: (number of records checked, number of records with a check not OK)
+    """
+    instream = sys.stdin if listing == "-" else open(listing)
+    outstream = sys.stdout if ofile is None else open(ofile, "w")
+    table = ResultTable() if export else None
+    n_checked = n_failed = 0
+
+    try:
+        for number, key, results in ingest_stream(instream, run_tests, batch_size=batch_size):
+            n_checked += 1
+
+            if isinstance(results, Exception):
+                n_failed += 1
+                outstream.write("{}\tFATAL could not check: {}\n".format(key, results))
+                continue
+
+            if not all(res.ok for res in results):
+                n_failed += 1
+
+            for res in results:
+                if not (failures_only and res.ok):
+                    outstream.write("{}\t{}\n".format(key, res))
+
+            if table is not None:
+                table.extend(results)
+    finally:
+        if instream is not sys.stdin:
+            instream.close()
+        if outstream is not sys.stdout:
+            outstream.close()
+
+    if table is not None:
+        table.write(export)
+
+    return n_checked, n_failed
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Run the file level time checks over JSON Lines metadata records.")
+    parser.add_argument("listing", nargs="?", default="-", help="JSON Lines file, one record per line ('-' for stdin)")
+    parser.add_argument("-o", "--output", default=None, help="file to write results to (default: stdout)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="number of records checked per batch")
+    parser.add_argument("--failures-only", action="store_true", help="only write results that are not OK")
+    parser.add_argument("--export", default=None,
+                        help="also write all the results to this .npy, .parquet or .arrow file")
+    args = parser.parse_args()
+
+    n_checked, n_failed = main(args.listing, args.output, batch_size=args.batch_size,
+                               failures_only=args.failures_only, export=args.export)
+    sys.stderr.write("Checked {} records: {} not OK\n".format(n_checked, n_failed))
@@ -18,49 +18,62 @@ from time_checks import utils, constants
 from time_checks.utils import resolve_dataset_type
 from time_checks import utils, time_utils, settings, constants
 from time_checks.multifile_time_checks import check_multifile_temporal_continuity
+from time_checks.results import CheckResult, FAILED
 
  
 @resolve_dataset_type
 def test_check_multifile_temporal_continuity(files):
 
     res, msg = check_multifile_temporal_continuity(files)
+    return CheckResult.from_check("T1.006", "check_multifile_temporal_continuity", res, msg)
 
-    if res == False:
-        return "T1.006: [check_multifile_temporal_continuity]: FAILED:: " + msg
-    else:
-        return "T1.006: [check_multifile_temporal_continuity]: OK"
 
+def check_files(ifiles):
+    """
+    Opens the files of a dataset and runs the multifile check on them.
 
-def main(ifiles, odir):
-
-    institute, model, experiment, frequency, realm, table, ensemble, version, variable, ncfile = ifiles[0].split('/')[6:]
-    logdir = os.path.join(odir, institute, model, experiment, frequency, realm, version)
-    logfile = os.path.join(logdir, ncfile.replace('.nc', '__multifile_timecheck.log'))
-
-    if not os.path.isdir(logdir):
-        os.makedirs(logdir)
- 
+    :param ifiles: sequence of NetCDF file paths
+    :return: CheckResult
+    """
     dataset = []
-    for f in ifiles:
-        try:
+    try:
+        for f in ifiles:
             dataset.append(Dataset(f))
-        except IOError as err:
-            with open(logfile, 'w+') as w:
-                w.writelines(["Error could not perform multifile timechecks", '\n'])
-                w.writelines(['File: ', f,  '\n'])
-                w.writelines(["Has IOError, ({})".format(str(err)), '\n'])
-            return
 
-    res = test_check_multifile_temporal_continuity(dataset)
+        return test_check_multifile_temporal_continuity(dataset)
+    except Exception as err:
+        return CheckResult("T1.006", "check_multifile_temporal_continuity", FAILED,
+                           "Check could not be run: {}: {}".format(type(err).__name__, err))
+    finally:
+        for ds in dataset:
+            ds.close()
+
 
+def write_log(logfile, res, ifiles):
+    """
+    Writes the result of the multifile check on `ifiles` to `logfile`.
+    """
     with open(logfile, 'w+') as w:
-        w.writelines([res, '\n'])
+        w.writelines([str(res), '\n'])
         w.writelines([' ', '\n'])
         w.writelines(["Multifile time check on files:", '\n'])
         for f in ifiles:
             w.writelines([f, '\n'])
 
 
+def main(ifiles, odir):
+
+    institute, model, experiment, frequency, realm, table, ensemble, version, variable, ncfile = ifiles[0].split('/')[6:]
+    logdir = os.path.join(odir, institute, model, experiment, frequency, realm, version)
+    logfile = os.path.join(logdir, ncfile.replace('.nc', '__multifile_timecheck.log'))
+
+    if not os.path.isdir(logdir):
+        os.makedirs(logdir)
+
+    res = check_files(ifiles)
+    write_log(logfile, res, ifiles)
+
+
 if __name__ == '__main__':
 
     ifiles = argv[1:]
@@ -0,0 +1,82 @@
+"""
+run_store_timechecks.py
+=======================
+
+Extracts the time axes of 1:n .nc files into a time axis store, and runs the
+file level time checks against a store without reopening the netCDF files.
+
+Usage:
+
+    python run_store_timechecks.py extract <store_dir> <file.nc> [<file.nc> ...]
+    python run_store_timechecks.py check <store_dir> [<output_dir>]
+
+`extract` leaves out (and reports) the files that cannot be read. `check`
+writes the same log files as `run_file_timechecks.py`, one per file in the store.
+
+If `<store_dir>` ends with ".tca" a single file container (see
+`time_checks.axis_container`) is written or read instead of a store directory.
+
+"""
+
+import os
+import sys
+import argparse
+
+from time_checks.axis_store import AxisStore, write_axis_store
+from time_checks.axis_container import AxisContainer, extract_to_container, CONTAINER_SUFFIX
+from time_checks.scripts.run_file_timechecks import run_tests, get_log_path
+
+
+def extract(store_dir, ifiles):
+    """
+    Writes the time axes of `ifiles` to a store in `store_dir` (or to a
+    container if it ends with ".tca").
+    """
+    if store_dir.endswith(CONTAINER_SUFFIX):
+        return extract_to_container(ifiles, store_dir)
+
+    n_written = write_axis_store(ifiles, store_dir)
+    for record in AxisStore(store_dir).skipped:
+        sys.stderr.write("Skipped {}: {}\n".format(record["path"], record["error"]))
+
+    return n_written
+
+
+def check(store_dir, odir):
+    """
+    Runs all the file level checks against each file in the store in `store_dir`
+    and writes a log file per file to `odir`.
+    """
+    if not os.path.isdir(odir):
+        os.makedirs(odir)
+
+    store = AxisContainer(store_dir) if store_dir.endswith(CONTAINER_SUFFIX) else AxisStore(store_dir)
+
+    for ifile, ds in zip(store.paths, store):
+        with open(get_log_path(ifile, odir), 'w+') as w:
+            w.writelines(["Time checks of: {} \n".format(ifile)])
+            for res in run_tests(ifile, ds):
+                w.writelines([str(res), '\n'])
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Run the file level time checks against a time axis store.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    extract_parser = subparsers.add_parser("extract", help="extract time axes of NetCDF files into a store")
+    extract_parser.add_argument("store_dir", help="directory of the time axis store")
+    extract_parser.add_argument("ifiles", nargs="+", help="NetCDF files to extract")
+
+    check_parser = subparsers.add_parser("check", help="run the time checks against a store")
+    check_parser.add_argument("store_dir", help="directory of the time axis store")
+    check_parser.add_argument("odir", nargs="?", default=".", help="output directory for the log files")
+
+    args = parser.parse_args()
+
+    if args.command == "extract":
+        extract(args.store_dir, args.ifiles)
+    elif args.command == "check":
+        check(args.store_dir, args.odir)
+    else:
+        parser.print_help()
@@ -0,0 +1,143 @@
+"""
+run_triage.py
+=============
+
+Triages many files from a sample of their time axes (see `time_checks.triage`)
+and promotes only the suspicious ones to the full file level checks.
+
+Files are given as arguments or, with `--file-list`, read from a file ("-"
+for stdin). A line is written per file to the report (stdout by default):
+
+    <path>\t<score>\t<PROMOTE|PASS>\t<finding; finding...>
+
+Files scoring at least `--threshold` are promoted. With `--promoted <file>`
+their paths are written to a file (e.g. for `run_batch_timechecks.py
+--file-list`), and with `--check <odir>` the full checks are run on them
+straight away, writing a log per file to `odir`.
+
+Reads are scheduled as in `run_batch_timechecks.py` (per storage tier), in
+worker processes (`--processes`, default: the sum of the tier limits) as the
+netCDF and HDF5 libraries are not thread-safe.
+
+Example:
+
+    python run_triage.py --file-list files.txt --samples 64 --promoted suspicious.txt --check logs
+
+"""
+
+import sys
+import argparse
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+from time_checks.async_scheduler import AsyncCheckScheduler, TierLimits, DEFAULT_TIER_LIMIT, pass_results
+from time_checks.triage import triage_file, read_error_result, is_suspicious, DEFAULT_SAMPLES, DEFAULT_PROMOTE_SCORE
+from time_checks.scripts import run_batch_timechecks
+
+
+def format_result(result, threshold=DEFAULT_PROMOTE_SCORE):
+    """
+    Returns the report line of a TriageResult.
+    """
+    return "{}\t{:g}\t{}\t{}".format(result.path, result.score,
+                                     "PROMOTE" if is_suspicious(result, threshold) else "PASS",
+                                     "; ".join("{}: {}".format(name, msg) for name, msg in result.findings))
+
+
+def triage_files(ifiles, tier_limits=None, n_samples=DEFAULT_SAMPLES, processes=None):
+    """
+    Triages `ifiles`, reading them concurrently per storage tier.
+
+    :param ifiles: sequence of NetCDF file paths
+    :param tier_limits: TierLimits instance
+    :param n_samples: approximate number of time values to read per file [int]
+    :param processes: number of reader processes (default: the sum of the tier limits) [int]
+    :return: list of TriageResult in the order of `ifiles`. A file whose read failed
+             outside `triage_file` (e.g. its worker process died) gets a "read_error" finding
+    """
+    read_executor = ProcessPoolExecutor(max_workers=processes) if processes else None
+    scheduler = AsyncCheckScheduler(pass_results, reader=functools.partial(triage_file, n_samples=n_samples),
+                                    tier_limits=tier_limits, read_executor=read_executor)
+
+    try:
+        results = scheduler.run(ifiles)
+    finally:
+        if read_executor is not None:
+            read_executor.shutdown()
+
+    return [read_error_result(path, result) if isinstance(result, Exception) else result
+            for path, result in results]
+
+
+def main(ifiles, report=None, tier_limits=None, n_samples=DEFAULT_SAMPLES, threshold=DEFAULT_PROMOTE_SCORE,
+         promoted=None, odir=None, processes=None):
+    """
+    Triages `ifiles`, writes the report and runs the full checks on the suspicious files.
+
+    :param ifiles: sequence of NetCDF file paths
+    :param report: path of the report file, or None for stdout [string]
+    :param tier_limits: TierLimits instance
+    :param n_samples: approximate number of time values to read per file [int]
+    :param threshold: score from which files are promoted [float]
+    :param promoted: path to write the paths of the promoted files to, or None [string]
+    :param odir: if set, run the full checks on the promoted files and write their logs here [string]
+    :param processes: number of reader processes (default: the sum of the tier limits) [int]
+    :return: list of the promoted file paths
+    """
+    tier_limits = tier_limits or TierLimits()
+    results = triage_files(ifiles, tier_limits, n_samples=n_samples, processes=processes)
+
+    writer = sys.stdout if report is None else open(report, 'w+')
+    try:
+        for result in results:
+            writer.write(format_result(result, threshold) + '\n')
+    finally:
+        if writer is not sys.stdout:
+            writer.close()
+
+    suspicious = [result.path for result in results if is_suspicious(result, threshold)]
+
+    if promoted:
+        with open(promoted, 'w+') as w:
+            w.writelines([path + '\n' for path in suspicious])
+
+    n_read = sum(result.n_read for result in results)
+    length = sum(result.length for result in results)
+    sys.stderr.write("Triaged {} files (read {} of {} time values): {} promoted\n".format(
+        len(results), n_read, length, len(suspicious)))
+
+    if odir and suspicious:
+        run_batch_timechecks.main(suspicious, odir, tier_limits, processes=processes)
+
+    return suspicious
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Triage NetCDF files from a sample of their time axes.")
+    parser.add_argument("ifiles", nargs="*", help="NetCDF files to triage")
+    parser.add_argument("--file-list", default=None,
+                        help="file listing paths to triage, one per line ('-' for stdin)")
+    parser.add_argument("--report", default=None, help="file to write the report to (default: stdout)")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES,
+                        help="approximate number of time values read per file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_PROMOTE_SCORE,
+                        help="score from which files are promoted to the full checks")
+    parser.add_argument("--promoted", default=None, help="file to write the paths of the promoted files to")
+    parser.add_argument("--check", default=None, metavar="ODIR",
+                        help="run the full checks on the promoted files, writing their logs to ODIR")
+    parser.add_argument("--tier", action="append", default=[],
+                        help="storage tier as <path prefix>=<max concurrent reads> (can be repeated)")
+    parser.add_argument("--default-limit", type=int, default=DEFAULT_TIER_LIMIT,
+                        help="max concurrent reads for paths matching no tier")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="number of reader processes (default: the sum of the tier limits)")
+    args = parser.parse_args()
+
+    ifiles = list(args.ifiles)
+    if args.file_list:
+        ifiles.extend(run_batch_timechecks.read_file_list(args.file_list))
+
+    tier_limits = TierLimits.from_strings(args.tier, default_limit=args.default_limit)
+    main(ifiles, report=args.report, tier_limits=tier_limits, n_samples=args.samples, threshold=args.threshold,
+         promoted=args.promoted, odir=args.check, processes=args.processes)
@@ -0,0 +1,99 @@
+"""
+shard_file_list.py
+==================
+
+Splits a list of files into N shards of balanced cost for a job array (see
+`time_checks.sharding`), keeping the files of each dataset (directory) in
+the same shard.
+
+Files are given as arguments or, with `--file-list`, read from a file ("-"
+for stdin). Shard i is written to "<prefix><i>.txt" (i from 0, padded to 3
+digits), one path per line, ready for `run_batch_timechecks.py --file-list`:
+
+    python shard_file_list.py --file-list files.txt -n 100 --prefix shards/shard_
+
+The cost of each file is estimated from its size and the length of its time
+axis, read from its header (or, with `--names-only`, worked out from its file
+name so that no file is opened). With `--timings results.npy` (a results
+export of an earlier run, see `run_batch_timechecks.py --export`) the
+recorded timings are used for the files they cover.
+
+The estimated cost of each shard, and the makespan (cost of the most costly
+shard) compared with shards of equal counts, are printed to stderr.
+
+"""
+
+import os
+import sys
+import argparse
+
+from time_checks.sharding import shard_files, shard_by_count, read_timings
+from time_checks.scripts.run_batch_timechecks import read_file_list
+
+
+def get_shard_path(prefix, index):
+    return "{}{:03d}.txt".format(prefix, index)
+
+
+def write_shards(sharding, prefix):
+    """
+    Writes each shard to "<prefix><index>.txt".
+
+    :return: list of the paths written
+    """
+    directory = os.path.dirname(prefix)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    paths = []
+    for index, shard in enumerate(sharding.shards):
+        paths.append(get_shard_path(prefix, index))
+        with open(paths[-1], 'w+') as w:
+            w.writelines([fpath + '\n' for fpath in shard])
+
+    return paths
+
+
+def main(ifiles, n_shards, prefix="shard_", timings=None, names_only=False):
+    """
+    Shards `ifiles` into `n_shards` shards of balanced cost and writes them.
+
+    :param ifiles: sequence of NetCDF file paths
+    :param n_shards: number of shards [int]
+    :param prefix: prefix of the shard files [string]
+    :param timings: path of a results export with recorded timings, or None [string]
+    :param names_only: estimate the costs from the file names only, without opening the files [boolean]
+    :return: Sharding
+    """
+    recorded = read_timings(timings) if timings else None
+    sharding, costs = shard_files(ifiles, n_shards, timings=recorded, read_header=not names_only)
+    write_shards(sharding, prefix)
+
+    for index, (shard, cost) in enumerate(zip(sharding.shards, sharding.costs)):
+        sys.stderr.write("{}: {} files, estimated {:.1f} s\n".format(get_shard_path(prefix, index), len(shard), cost))
+
+    by_count = shard_by_count(costs, n_shards)
+    sys.stderr.write("Makespan: {:.1f} s (shards of equal counts: {:.1f} s)\n".format(
+        max(sharding.costs), max(by_count.costs)))
+
+    return sharding
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Split a list of NetCDF files into shards of balanced cost.")
+    parser.add_argument("ifiles", nargs="*", help="NetCDF files to shard")
+    parser.add_argument("--file-list", default=None, help="file listing paths to shard, one per line ('-' for stdin)")
+    parser.add_argument("-n", "--shards", type=int, required=True, help="number of shards")
+    parser.add_argument("--prefix", default="shard_", help="prefix of the shard files")
+    parser.add_argument("--timings", default=None,
+                        help="results export (.npy) of an earlier run, to use its recorded timings")
+    parser.add_argument("--names-only", action="store_true",
+                        help="estimate the costs from the file names only (no file is opened)")
+    args = parser.parse_args()
+
+    ifiles = list(args.ifiles)
+    if args.file_list:
+        ifiles.extend(read_file_list(args.file_list))
+
+    main(ifiles, args.shards, prefix=args.prefix, timings=args.timings, names_only=args.names_only)
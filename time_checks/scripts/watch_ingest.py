@@ -0,0 +1,146 @@
+"""
+watch_ingest.py
+===============
+
+Watches an ingest directory tree and checks files as they land, rather than
+re-scanning the whole tree on a schedule.
+
+The tree is polled every `--interval` seconds (see `time_checks.watcher`).
+Each new file is checked once two polls have found it unchanged and it has
+not changed for `--settle-time` seconds, and its log is written to the output directory as
+`run_file_timechecks.py` does. Then the multifile check (T1.006) is run on
+every dataset (directory) that gained a file, over all its files checked so
+far, and written to "<dataset id>__multifile_timecheck.log".
+
+Example:
+
+    python watch_ingest.py /datacentre/ingest -o logs --interval 5 --settle-time 30
+
+With `--skip-existing` the files already in the tree when the watch starts
+are not checked.
+
+The state of the watcher is saved after each poll to ".watch_state.json" in
+the output directory, and loaded back when the watch is started again with
+the same output directory: only the files that landed (or changed) since are
+checked, and only the directories that changed are listed. With `--once` the
+tree is polled a single time, e.g. to be run from cron:
+
+    */10 * * * * python watch_ingest.py /datacentre/ingest -o logs --once --skip-existing
+
+A file found by one run is then checked by the next one.
+
+`--skip-existing` only applies to the first run, when there is no saved state.
+
+"""
+
+import os
+import sys
+import time
+import argparse
+
+from time_checks.watcher import IngestWatcher, datasets_of, DEFAULT_SETTLE_TIME
+from time_checks.scripts import run_file_timechecks, run_multifile_timechecks
+from time_checks.scripts.run_batch_timechecks import write_log
+
+
+DEFAULT_INTERVAL = 5.
+
+WATCH_STATE = ".watch_state.json"
+
+
+def get_multifile_log_path(dataset_id, odir):
+    return os.path.join(odir, "{}__multifile_timecheck.log".format(dataset_id))
+
+
+def check_new_files(watcher, odir, multifile=True, chunk_size=None):
+    """
+    Polls the watcher once, checks the files that have settled and runs the
+    multifile check on their datasets.
+
+    :param watcher: IngestWatcher instance
+    :param odir: output directory [string]
+    :param multifile: run the multifile check on the datasets that gained files [boolean]
+    :param chunk_size: if set, read the time axes in chunks of this many steps [int]
+    :return: list of the files checked
+    """
+    ready = watcher.poll()
+
+    for ifile in ready:
+        try:
+            run_file_timechecks.main(ifile, odir, chunk_size=chunk_size)
+        except Exception as err:
+            write_log(ifile, odir, err)
+
+    if multifile:
+        for dataset_dir in datasets_of(ready):
+            ifiles = watcher.dataset_files(dataset_dir)
+            res = run_multifile_timechecks.check_files(ifiles)
+            run_multifile_timechecks.write_log(get_multifile_log_path(watcher.dataset_id(dataset_dir), odir),
+                                               res, ifiles)
+
+    return ready
+
+
+def main(root, odir, interval=DEFAULT_INTERVAL, settle_time=DEFAULT_SETTLE_TIME, pattern="*.nc",
+         skip_existing=False, multifile=True, chunk_size=None, once=False):
+    """
+    Watches `root` and checks new files as they land, until interrupted. The
+    state of the watcher is kept in `odir` between runs.
+
+    :param root: root directory of the ingest tree [string]
+    :param odir: output directory [string]
+    :param interval: seconds between polls [float]
+    :param settle_time: seconds a file must be unchanged for before it is checked [float]
+    :param pattern: glob pattern of the file names to check [string]
+    :param skip_existing: do not check the files already in the tree (if there is no saved state) [boolean]
+    :param multifile: run the multifile check on the datasets that gained files [boolean]
+    :param chunk_size: if set, read the time axes in chunks of this many steps [int]
+    :param once: poll only once [boolean]
+    """
+    if not os.path.isdir(odir):
+        os.makedirs(odir)
+
+    watcher = IngestWatcher(root, pattern=pattern, settle_time=settle_time)
+    state_path = os.path.join(odir, WATCH_STATE)
+
+    if os.path.isfile(state_path):
+        watcher.load_state(state_path)
+    elif skip_existing:
+        watcher.scan(mark_seen=True)
+        watcher.save_state(state_path)
+
+    while True:
+        for ifile in check_new_files(watcher, odir, multifile=multifile, chunk_size=chunk_size):
+            sys.stderr.write("Checked: {}\n".format(ifile))
+
+        watcher.save_state(state_path)
+
+        if once:
+            return
+
+        time.sleep(interval)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Check NetCDF files as they land in an ingest directory.")
+    parser.add_argument("root", help="root directory of the ingest tree")
+    parser.add_argument("-o", "--odir", default=".", help="output directory for the log files")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="seconds between polls")
+    parser.add_argument("--settle-time", type=float, default=DEFAULT_SETTLE_TIME,
+                        help="seconds a file must be unchanged for before it is checked")
+    parser.add_argument("--pattern", default="*.nc", help="glob pattern of the file names to check")
+    parser.add_argument("--skip-existing", action="store_true", help="do not check the files already there")
+    parser.add_argument("--no-multifile", action="store_true",
+                        help="do not run the multifile check on the datasets that gain files")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="read the time axis in chunks of this many steps")
+    parser.add_argument("--once", action="store_true", help="poll once and exit")
+    args = parser.parse_args()
+
+    try:
+        main(args.root, args.odir, interval=args.interval, settle_time=args.settle_time, pattern=args.pattern,
+             skip_existing=args.skip_existing, multifile=not args.no_multifile, chunk_size=args.chunk_size,
+             once=args.once)
+    except KeyboardInterrupt:
+        pass
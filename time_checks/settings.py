@@ -1,3 +1,17 @@
+"""
+settings.py
+===========
 
-from netCDF4 import Dataset
-supported_datasets = [Dataset]
+`supported_datasets` is built on first access so that importing the settings
+does not import netCDF4.
+"""
+
+
+def __getattr__(name):
+    if name == 'supported_datasets':
+        from netCDF4 import Dataset
+        global supported_datasets
+        supported_datasets = [Dataset]
+        return supported_datasets
+
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
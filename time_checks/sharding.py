@@ -0,0 +1,270 @@
+"""
+sharding.py
+===========
+
+Static sharding of a list of files into N shards of balanced cost, for job
+array schedulers (one task per shard).
+
+Splitting a list by count puts files of very different costs together (a
+shard of 3-hourly files takes far longer than a shard of monthly ones) and
+the whole job waits for the slowest shard. Instead the cost of each file is
+estimated and the shards are packed longest-processing-time first: the
+datasets, most costly first, each go to the shard with the least cost so far.
+
+The cost of a file is, in order of preference:
+
+ - its recorded timing: the sum of the durations of its check results in a
+   results export (see `time_checks.results.ResultTable`), which include the
+   time taken to read the file (attributed to its first data check);
+ - an estimate from its size and the length of its time axis (read from its
+   header or, without opening it, worked out from the period and frequency in
+   its file name). Estimates are scaled to the recorded timings when there are
+   both, so that files with and without timings can be mixed. Only the files
+   without a timing (and a sample of at most `MAX_SCALE_SAMPLES` of the others,
+   for the scale) are estimated, so the headers of files with recorded
+   timings are not read.
+
+The files of one dataset (directory) are always put in the same shard so that
+the multifile check of a dataset only needs the files of its shard.
+
+"""
+
+import os
+import heapq
+import datetime
+from collections import OrderedDict, namedtuple
+
+from time_checks import constants, utils
+
+
+# Cost model of the file level checks (measured on the test data on local disk)
+SECONDS_PER_FILE = 5e-3
+SECONDS_PER_TIME_VALUE = 6e-6
+SECONDS_PER_BYTE = 1e-9
+
+# Number of files with recorded timings estimated to scale the estimates to them
+MAX_SCALE_SAMPLES = 100
+
+Sharding = namedtuple("Sharding", ["shards", "costs"])
+
+
+def _parse_time_component(comp):
+    """
+    Returns a datetime from a time component of a file name (4 to 12 digits).
+    Days that are not in the standard calendar (e.g. 30 February in a 360
+    day calendar) are moved back to the 28th.
+    """
+    fields = [int(comp[0:4]), int(comp[4:6] or 1), int(comp[6:8] or 1), int(comp[8:10] or 0),
+              int(comp[10:12] or 0)]
+    try:
+        return datetime.datetime(*fields)
+    except ValueError:
+        fields[2] = min(fields[2], 28)
+        return datetime.datetime(*fields)
+
+
+def name_time_length(fpath, time_index_in_name=-1, frequency_index=1):
+    """
+    Works out the length of the time axis of a file from the period and the
+    frequency (CMOR table) in its file name, without opening it. Calendars are
+    taken as standard, which is close enough for a cost.
+
+    :param fpath: file path [string]
+    :return: number of time values [int], or None if it cannot be worked out
+    """
+    try:
+        (start, end), frequency = utils.get_start_end_freq(utils.get_file_name_components(fpath),
+                                                           time_index_in_name, frequency_index)
+        start, end = _parse_time_component(start), _parse_time_component(end)
+    except (ValueError, IndexError, TypeError):
+        return None
+
+    mapping = constants.FREQUENCY_MAPPINGS.get(frequency)
+    if mapping is None or end < start:
+        return None
+
+    n, unit = mapping
+    if unit == "year":
+        return (end.year - start.year) // n + 1
+    if unit == "month":
+        return ((end.year - start.year) * 12 + end.month - start.month) // n + 1
+
+    span_hours = (end - start).total_seconds() / 3600.
+    step_hours = n * (24. if unit == "day" else 1.)
+    return int(span_hours // step_hours) + 1
+
+
+def estimate_cost(length, size):
+    """
+    Returns the estimated cost (seconds) of checking a file.
+
+    :param length: number of time values, or None if not known [int]
+    :param size: file size in bytes [int]
+    """
+    return SECONDS_PER_FILE + (length or 0) * SECONDS_PER_TIME_VALUE + size * SECONDS_PER_BYTE
+
+
+def estimate_file_cost(fpath, read_header=True):
+    """
+    Estimates the cost of checking a file from its size and the length of its
+    time axis (from its header, or from its file name if the header cannot be
+    read or `read_header` is False).
+
+    :param fpath: file path [string]
+    :param read_header: read the length of the time axis from the file header [boolean]
+    :return: estimated cost in seconds [float]
+    """
+    try:
+        size = os.path.getsize(fpath)
+    except OSError:
+        size = 0
+
+    length = None
+    if read_header:
+        # Imported here so that sharding by file names does not import netCDF4
+        from time_checks.memory_budget import header_time_length
+
+        try:
+            length = header_time_length(fpath)
+        except Exception:
+            length = None
+
+    if length is None:
+        length = name_time_length(fpath)
+
+    return estimate_cost(length, size)
+
+
+def read_timings(path):
+    """
+    Reads the recorded cost of each file from a results export (".npy"): the
+    sum of the durations of its check results, including the time taken to
+    load its data.
+
+    :param path: path of the export [string]
+    :return: dictionary of {file path: seconds}
+    """
+    from time_checks.results import ResultTable
+
+    timings = {}
+    for res in ResultTable.read(path):
+        timings[res.key] = timings.get(res.key, 0.) + float(res.duration)
+
+    return timings
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.
+
+
+def get_file_costs(fpaths, timings=None, read_header=True, estimator=None):
+    """
+    Returns the cost of each file: its recorded timing if there is one,
+    otherwise its estimated cost, scaled to the recorded timings (by the
+    median ratio of timing to estimate over a sample of up to
+    `MAX_SCALE_SAMPLES` files with timings, spread evenly over them).
+
+    :param fpaths: sequence of file paths
+    :param timings: dictionary of {file path: seconds}, or None
+    :param read_header: read the length of the time axes from the file headers [boolean]
+    :param estimator: callable returning the estimated cost of a path (default: `estimate_file_cost`)
+    :return: OrderedDict of {file path: cost} in the order of `fpaths`
+    """
+    timings = timings or {}
+    estimator = estimator or (lambda fpath: estimate_file_cost(fpath, read_header=read_header))
+
+    fpaths = list(fpaths)
+    untimed = [fpath for fpath in fpaths if fpath not in timings]
+    if not untimed:
+        return OrderedDict((fpath, timings[fpath]) for fpath in fpaths)
+
+    estimates = dict((fpath, estimator(fpath)) for fpath in untimed)
+
+    timed = [fpath for fpath in fpaths if fpath in timings]
+    step = max(1, -(-len(timed) // MAX_SCALE_SAMPLES))
+    ratios = [timings[fpath] / estimate for fpath, estimate in
+              ((fpath, estimator(fpath)) for fpath in timed[::step]) if estimate > 0]
+    scale = _median(ratios) if ratios else 1.
+
+    return OrderedDict((fpath, timings[fpath] if fpath in timings else estimates[fpath] * scale)
+                       for fpath in fpaths)
+
+
+def group_by_dataset(costs):
+    """
+    Groups files by dataset (directory).
+
+    :param costs: OrderedDict of {file path: cost}
+    :return: list of tuples of: (dataset directory, cost, list of file paths), in order of first appearance
+    """
+    groups = OrderedDict()
+    for fpath, cost in costs.items():
+        group = groups.setdefault(os.path.dirname(fpath), [0., []])
+        group[0] += cost
+        group[1].append(fpath)
+
+    return [(dataset_dir, cost, fpaths) for dataset_dir, (cost, fpaths) in groups.items()]
+
+
+def pack_shards(groups, n_shards):
+    """
+    Packs groups of files into `n_shards` shards, longest processing time
+    first: the groups, most costly first, each go to the shard with the least
+    cost so far (the lowest numbered shard on ties).
+
+    :param groups: list of tuples of: (key, cost, list of file paths)
+    :param n_shards: number of shards [int]
+    :return: Sharding of: (list of the lists of file paths of each shard, list of the cost of each shard)
+    """
+    if n_shards < 1:
+        raise ValueError("Number of shards must be at least 1, not: {}".format(n_shards))
+
+    shards = [[] for _ in range(n_shards)]
+    costs = [0.] * n_shards
+    heap = [(0., index) for index in range(n_shards)]
+
+    for _, (_, cost, fpaths) in sorted(enumerate(groups), key=lambda item: (-item[1][1], item[0])):
+        load, index = heapq.heappop(heap)
+        shards[index].extend(fpaths)
+        costs[index] = load + cost
+        heapq.heappush(heap, (costs[index], index))
+
+    return Sharding(shards, costs)
+
+
+def shard_by_count(costs, n_shards):
+    """
+    Splits files into `n_shards` contiguous shards of (nearly) equal counts,
+    for comparison with `pack_shards`.
+
+    :param costs: OrderedDict of {file path: cost}
+    :return: Sharding
+    """
+    fpaths = list(costs)
+    size, extra = divmod(len(fpaths), n_shards)
+    shards, start = [], 0
+
+    for index in range(n_shards):
+        end = start + size + (1 if index < extra else 0)
+        shards.append(fpaths[start:end])
+        start = end
+
+    return Sharding(shards, [sum(costs[fpath] for fpath in shard) for shard in shards])
+
+
+def shard_files(fpaths, n_shards, timings=None, read_header=True, estimator=None):
+    """
+    Shards files into `n_shards` shards of balanced cost, keeping the files of
+    each dataset in one shard.
+
+    :param fpaths: sequence of file paths
+    :param n_shards: number of shards [int]
+    :param timings: dictionary of {file path: seconds}, or None
+    :param read_header: read the length of the time axes from the file headers [boolean]
+    :param estimator: callable returning the estimated cost of a path (default: `estimate_file_cost`)
+    :return: tuple of: (Sharding, OrderedDict of {file path: cost})
+    """
+    costs = get_file_costs(fpaths, timings=timings, read_header=read_header, estimator=estimator)
+    return pack_shards(group_by_dataset(costs), n_shards), costs
@@ -0,0 +1,164 @@
+"""
+shared_axes.py
+==============
+
+Transport of time axes between reader and checker processes through shared
+memory, without pickling the time values.
+
+A reader process extracts the time axis of a file into a new
+`multiprocessing.shared_memory` segment and returns an `AxisDescriptor`: the
+segment name, data type and shape plus the time metadata (units, calendar...)
+and file name components. Only the descriptor is pickled. A checker process
+opens the segment and checks a dataset dictionary whose "_data" is a NumPy
+view on the segment (no copy).
+
+Segment lifetime:
+
+ - the reader closes its own mapping once the values are copied in, and
+   unlinks the segment itself if anything fails before the descriptor is
+   returned;
+ - `open_shared_axis` unlinks the segment when the checker is done with it,
+   even if the check raised;
+ - any segment left behind (e.g. if a checker process dies) is unlinked by
+   the multiprocessing resource tracker when the main process exits, as long
+   as the tracker was started (`start_resource_tracker`) before the process
+   pools were created.
+
+"""
+
+from collections import namedtuple
+from contextlib import contextmanager
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from time_checks import chunk_layout, time_utils, utils
+
+
+AxisDescriptor = namedtuple("AxisDescriptor", ["name", "dtype", "shape", "path", "time", "filename"])
+
+
+def start_resource_tracker():
+    """
+    Starts the multiprocessing resource tracker in this process, so that the
+    processes created from it share it and it can clean up any segment left
+    behind. Call before creating the reader and checker process pools.
+    """
+    resource_tracker.ensure_running()
+
+
+def share_axis(values, metadata, path):
+    """
+    Copies time values into a new shared memory segment.
+
+    :param values: time values [array]
+    :param metadata: time metadata (see `utils._get_time_metadata`) [dictionary]
+    :param path: file path [string]
+    :return: AxisDescriptor
+    """
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    shm = SharedMemory(create=True, size=max(values.nbytes, 1))
+
+    try:
+        view = np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)
+        view[...] = values
+        del view
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+
+    shm.close()
+    return AxisDescriptor(shm.name, values.dtype.str, values.shape, path, metadata,
+                          utils.get_file_name_components(path))
+
+
+def publish_axis(fpath):
+    """
+    Reads the time axis of a netCDF file into shared memory. Used as the
+    reader in the reader processes.
+
+    :param fpath: path of the netCDF file [string]
+    :return: AxisDescriptor
+    """
+    ds = utils._netcdf4().Dataset(fpath)
+    try:
+        time_var = time_utils.get_time_variable(ds)
+        metadata = utils._get_time_metadata(time_var)
+        values, layout = chunk_layout.read_time_values(time_var)
+        values = np.ma.filled(np.ma.asarray(values, dtype=np.float64), np.nan).ravel()
+        metadata["_storage"] = chunk_layout.layout_as_dict(layout)
+    finally:
+        ds.close()
+
+    return share_axis(values, metadata, fpath)
+
+
+def release_axis(descriptor):
+    """
+    Unlinks the segment of a descriptor that will not be checked.
+    """
+    try:
+        shm = SharedMemory(name=descriptor.name)
+    except FileNotFoundError:
+        return
+
+    shm.close()
+    shm.unlink()
+
+
+@contextmanager
+def open_shared_axis(descriptor, unlink=True):
+    """
+    Opens the segment of a descriptor as a dataset dictionary (CEDA-CC style)
+    whose time values are a view on the segment.
+
+    The dictionary is emptied on exit so that the segment can be closed; the
+    caller must not keep references to the time values.
+
+    :param descriptor: AxisDescriptor
+    :param unlink: unlink the segment on exit [boolean]
+    :return: context manager giving the dataset dictionary
+    """
+    shm = SharedMemory(name=descriptor.name)
+
+    try:
+        time_dict = dict(descriptor.time)
+        time_dict["_data"] = np.ndarray(descriptor.shape, dtype=descriptor.dtype, buffer=shm.buf)
+        ds = {"time": time_dict, "filename": list(descriptor.filename)}
+
+        try:
+            yield ds
+        finally:
+            # Drop the views (a copy holding an axis summary is dropped by the checks)
+            time_dict.clear()
+            ds.clear()
+            del time_dict
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # A view is still referenced: the mapping goes when the view does
+            pass
+
+        if unlink:
+            shm.unlink()
+
+
+class SharedAxisChecker(object):
+    """
+    Checker for the checker processes: runs `checker(path, dataset dictionary)`
+    on the axis of a descriptor, then releases the segment.
+    """
+
+    def __init__(self, checker):
+        """
+
+        :param checker: callable taking (path, dataset dictionary), must be picklable
+        """
+        self.checker = checker
+
+    def __call__(self, path, descriptor):
+        with open_shared_axis(descriptor) as ds:
+            return self.checker(path, ds)
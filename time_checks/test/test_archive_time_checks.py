@@ -0,0 +1,64 @@
+"""
+test_archive_time_checks.py
+===========================
+
+Tests for the `archive_time_checks.py` module.
+"""
+
+from time_checks.archive_time_checks import (CoverageIndex, check_cross_variable_coverage, get_reference_coverage,
+                                             iter_coverage_results)
+
+
+PATHS = ["/a/tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411.nc",
+         "/a/tas_Amon_HadGEM2-ES_historical_r1i1p1_188412-200511.nc",
+         "/a/pr_Amon_HadGEM2-ES_historical_r1i1p1_185912-200511.nc",
+         "/a/psl_Amon_HadGEM2-ES_historical_r1i1p1_185912-199911.nc",
+         "/a/tas_Omon_HadGEM2-ES_historical_r1i1p1_185912-199911.nc",
+         "/a/tas_Amon_HadGEM2-ES_historical_r2i1p1_185912-200511.nc",
+         "/a/pr_Amon_HadGEM2-ES_historical_r2i1p1_185912-200511.nc",
+         "/a/orog_fx_HadGEM2-ES_historical_r0i0p0.nc"]
+
+
+def test_coverage_index():
+    index = CoverageIndex()
+    index.add_paths(PATHS)
+
+    assert(len(index) == 6 and index.n_files == 7)
+    assert(index.skipped == ["/a/orog_fx_HadGEM2-ES_historical_r0i0p0.nc"])
+    assert(index.coverage[(("Amon", "HadGEM2-ES", "historical", "r1i1p1"), "tas")] == ("185912", "200511"))
+
+
+def test_reference_coverage():
+    coverages = {"a": ("1850", "2005"), "b": ("1850", "2005"), "c": ("1850", "2000")}
+    assert(get_reference_coverage(coverages) == (("1850", "2005"), 2))
+
+    # Ties go to the earliest start, then the latest end
+    coverages = {"a": ("1860", "2005"), "b": ("1850", "2000"), "c": ("1850", "2005")}
+    assert(get_reference_coverage(coverages) == (("1850", "2005"), 1))
+
+
+def test_check_cross_variable_coverage():
+    results = check_cross_variable_coverage({"tas": ("1850", "2005"), "pr": ("1850", "2005"),
+                                             "psl": ("1850", "1999")})
+
+    assert(results["tas"] == (True, "") and results["pr"] == (True, ""))
+    assert(results["psl"] == (False, "Variable covers 1850-1999 but 2 of its 2 sibling variables cover 1850-2005"))
+
+    assert(check_cross_variable_coverage({"tas": ("1850", "1999")}) == {"tas": (True, "")})
+
+
+def test_iter_coverage_results():
+    index = CoverageIndex()
+    index.add_paths(reversed(PATHS))
+
+    results = list(iter_coverage_results(index))
+    assert([res.key for res in results] == ["pr_Amon_HadGEM2-ES_historical_r1i1p1",
+                                            "psl_Amon_HadGEM2-ES_historical_r1i1p1",
+                                            "tas_Amon_HadGEM2-ES_historical_r1i1p1",
+                                            "pr_Amon_HadGEM2-ES_historical_r2i1p1",
+                                            "tas_Amon_HadGEM2-ES_historical_r2i1p1",
+                                            "tas_Omon_HadGEM2-ES_historical_r1i1p1"])
+
+    failed = [res for res in results if not res.ok]
+    assert(len(failed) == 1 and failed[0].key == "psl_Amon_HadGEM2-ES_historical_r1i1p1")
+    assert(str(failed[0]).startswith("T1.007: [cross_variable_coverage]: FAILED:: Variable covers 185912-199911"))
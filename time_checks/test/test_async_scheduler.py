@@ -0,0 +1,75 @@
+"""
+test_async_scheduler.py
+=======================
+
+Tests for the `async_scheduler.py` module.
+"""
+
+import os
+import glob
+from concurrent.futures import ThreadPoolExecutor
+
+from time_checks.async_scheduler import AsyncCheckScheduler, TierLimits, LatencyInjectingReader, read_dataset_dict
+from time_checks.scripts.run_file_timechecks import run_tests
+
+
+def _fake_reader(path):
+    if path.endswith("bad"):
+        raise IOError("Cannot read: {}".format(path))
+    return path.upper()
+
+
+def test_tier_limits_longest_prefix_wins():
+    limits = TierLimits.from_strings(["/badc=8", "/badc/tape=2"], default_limit=3)
+    assert(limits.tier_for("/badc/cmip5/a.nc") == "/badc")
+    assert(limits.tier_for("/badc/tape/a.nc") == "/badc/tape")
+    assert(limits.tier_for("/other/a.nc") is None)
+    assert(limits.limit_for("/badc/tape") == 2 and limits.limit_for(None) == 3)
+
+    assert(TierLimits(by_mount=True).tier_for("/root/package") is not None)
+
+
+def test_scheduler_respects_tier_limits():
+    reader = LatencyInjectingReader(_fake_reader, {"/fast": 0.01, "/slow": 0.05})
+    tier_limits = TierLimits({"/fast": 4, "/slow": 1})
+    paths = ["/slow/{}".format(i) for i in range(4)] + ["/fast/{}".format(i) for i in range(16)]
+
+    # The fake reader does not use netCDF, so can run in threads (and count the reads at once)
+    with ThreadPoolExecutor(max_workers=5) as threads:
+        scheduler = AsyncCheckScheduler(lambda path, data: data.lower(), reader=reader, tier_limits=tier_limits,
+                                        read_executor=threads)
+        results = scheduler.run(paths)
+
+    assert(reader.peak["/slow"] == 1)
+    assert(reader.peak["/fast"] == 4)
+    assert(results == [(path, path) for path in paths])
+
+
+def test_scheduler_returns_errors_in_place():
+    with ThreadPoolExecutor(max_workers=4) as threads:
+        scheduler = AsyncCheckScheduler(lambda path, data: data, reader=_fake_reader, read_executor=threads)
+        results = scheduler.run(["/a", "/b/bad", "/c"])
+
+    assert(results[0] == ("/a", "/A") and results[2] == ("/c", "/C"))
+    assert(results[1][0] == "/b/bad" and isinstance(results[1][1], IOError))
+
+
+def test_scheduler_runs_file_checks():
+    f = 'test_data/cmip5/tas_Amon_GFDL-CM2p1_historical_r1i1p1_200101-200512.nc'
+    scheduler = AsyncCheckScheduler(run_tests)
+    [(path, results)] = scheduler.run([f])
+
+    assert(path == f)
+    assert(all(res.ok for res in results))
+
+
+def test_scheduler_concurrent_reads():
+    # Many netCDF reads at once with the default settings: reads in threads crash HDF5
+    files = sorted(glob.glob('test_data/cmip5/*.nc')) * 4
+    scheduler = AsyncCheckScheduler(run_tests, tier_limits=TierLimits(default_limit=8))
+    results = scheduler.run(files)
+
+    expected = dict((f, [str(res) for res in run_tests(f, read_dataset_dict(f))]) for f in set(files))
+    assert([path for path, _ in results] == files)
+    assert(all(not isinstance(res_list, Exception) for _, res_list in results))
+    assert(all([str(res) for res in res_list] == expected[path] for path, res_list in results))
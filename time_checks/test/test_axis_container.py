@@ -0,0 +1,105 @@
+"""
+test_axis_container.py
+======================
+
+Tests for the `axis_container.py` module.
+"""
+
+import os
+import struct
+
+import numpy as np
+
+from time_checks import utils
+from time_checks.axis_container import (AxisContainer, ContainerWriter, write_container, extract_to_container,
+                                        TRAILER, VERSION)
+from time_checks.scripts.run_file_timechecks import run_tests
+
+
+FILES = ['test_data/cmip5/tas_Amon_GFDL-CM2p1_historical_r1i1p1_200101-200512.nc',
+         'test_data/test_mon_360_day.nc']
+
+
+def _records():
+    return [{"time": {"units": "days since 1850-01-01", "calendar": "360_day", "bounds": "time_bnds",
+                      "_data": np.array([15., 45., 75.]),
+                      "_bounds": np.array([[0., 30.], [30., 60.], [60., 90.]])},
+             "filename": ["tas", "Amon", "m", "e", "r1i1p1", "185001-185003"], "path": "/a/tas.nc"},
+            {"time": {"units": "hours since 2000-01-01", "calendar": "standard",
+                      "_data": np.arange(5, dtype=np.int32)},
+             "filename": ["pr", "3hr", "m", "e", "r1i1p1", "200001010000-200001011200"]}]
+
+
+def test_round_trip(tmpdir):
+    path = str(tmpdir.join("axes.tca"))
+    assert(write_container(_records(), path) == 2)
+
+    container = AxisContainer(path)
+    assert(len(container) == 2 and container.version == VERSION)
+
+    first, second = container[0], container[-1]
+    assert(first["path"] == "/a/tas.nc" and first["filename"][-1] == "185001-185003")
+    assert(first["time"]["calendar"] == "360_day" and first["time"]["bounds"] == "time_bnds")
+    assert(first["time"]["_data"].tolist() == [15., 45., 75.])
+    assert(first["time"]["_bounds"].shape == (3, 2) and first["time"]["_bounds"][2, 1] == 90.)
+
+    # Integer axes keep their type and the arrays are views on the mapped file
+    assert(second["time"]["_data"].dtype == np.dtype("<i4"))
+    assert(second["time"]["_data"].tolist() == [0, 1, 2, 3, 4])
+    assert(np.shares_memory(second["time"]["_data"], container.buf))
+
+
+def test_index_rebuilt_without_trailer(tmpdir):
+    path = str(tmpdir.join("axes.tca"))
+    write_container(_records(), path)
+
+    # Cut off the index and trailer, as if the writer had been interrupted
+    with open(path, "rb") as reader:
+        data = reader.read()
+    index_offset, count, _ = TRAILER.unpack_from(data, len(data) - TRAILER.size)
+    with open(path, "wb") as writer:
+        writer.write(data[:index_offset])
+
+    container = AxisContainer(path)
+    assert(len(container) == count == 2)
+    assert(container[1]["time"]["_data"].tolist() == [0, 1, 2, 3, 4])
+
+
+def test_unsupported_version(tmpdir):
+    path = str(tmpdir.join("axes.tca"))
+    write_container(_records(), path)
+
+    with open(path, "r+b") as f:
+        f.seek(4)
+        f.write(struct.pack("<H", VERSION + 1))
+
+    try:
+        AxisContainer(path)
+    except ValueError as err:
+        assert("version" in str(err))
+    else:
+        raise AssertionError("Expected ValueError")
+
+
+def test_writer_failure_leaves_no_file(tmpdir):
+    path = str(tmpdir.join("axes.tca"))
+    try:
+        with ContainerWriter(path) as writer:
+            writer.write(_records()[0])
+            raise RuntimeError("interrupted")
+    except RuntimeError:
+        pass
+
+    assert(os.listdir(str(tmpdir)) == [])
+
+
+def test_checks_match_netcdf(tmpdir):
+    path = str(tmpdir.join("axes.tca"))
+    assert(extract_to_container(FILES, path) == len(FILES))
+
+    container = AxisContainer(path)
+    assert(container.paths == FILES)
+
+    for f, ds in zip(FILES, container):
+        expected = [str(res) for res in run_tests(f, utils._netcdf4().Dataset(f))]
+        assert([str(res) for res in run_tests(f, ds)] == expected)
@@ -0,0 +1,90 @@
+"""
+test_axis_store.py
+==================
+
+Tests for the `axis_store.py` module.
+"""
+
+import os
+
+import numpy as np
+from netCDF4 import Dataset
+
+from time_checks.axis_store import AxisStore, write_axis_store
+from time_checks.file_time_checks import check_file_name_matches_time_var
+from time_checks.file_time_checks import check_regular_time_axis_increments
+
+CMIP5_DATA_DIR = "test_data/cmip5"
+
+FILE_NAMES = ['tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411.nc',
+              'mrsos_day_HadGEM2-ES_historical_r2i1p1_19991201-20051130.nc',
+              'tasmax_Amon_HadGEM2-ES_historical_r2i1p1_185912-185912.nc']
+
+
+def _write_store(tmpdir):
+    paths = [os.path.join(CMIP5_DATA_DIR, fname) for fname in FILE_NAMES]
+    store_dir = str(tmpdir.join("store"))
+    write_axis_store(paths, store_dir)
+    return paths, store_dir
+
+
+def test_axis_store_round_trip_success(tmpdir):
+    paths, store_dir = _write_store(tmpdir)
+    store = AxisStore(store_dir)
+
+    assert(len(store) == 3)
+    assert(store.paths == paths)
+
+    for fpath, ds in zip(paths, store):
+        nc = Dataset(fpath)
+        time_var = nc.variables['time']
+
+        assert(np.array_equal(ds['time']['_data'], time_var[:]))
+        assert(ds['time']['units'] == time_var.units)
+        assert(ds['time']['calendar'] == time_var.calendar)
+        assert(ds['filename'] == os.path.basename(fpath)[:-3].split("_"))
+
+        if ds['time']['bounds']:
+            assert(np.array_equal(ds['time']['_bounds'], nc.variables[ds['time']['bounds']][:]))
+
+
+def test_unreadable_files_skipped_and_store_replaced(tmpdir):
+    paths, store_dir = _write_store(tmpdir)
+
+    bad_path = str(tmpdir.join("tas_Amon_HadGEM2-ES_historical_r1i1p1_190001-190012.nc"))
+    with open(bad_path, "w") as writer:
+        writer.write("not netcdf")
+
+    # Rewritten over the earlier store, with an unreadable file
+    new_paths = [paths[1], bad_path, paths[0]]
+    assert(write_axis_store(new_paths, store_dir) == 2)
+    assert(sorted(os.listdir(store_dir)) == ["bounds.f8", "bounds_offsets.npy", "index.json", "offsets.npy",
+                                             "skipped.json", "times.f8"])
+
+    store = AxisStore(store_dir)
+    assert(store.paths == [paths[1], paths[0]])
+    assert([record["path"] for record in store.skipped] == [bad_path])
+    assert(store.skipped[0]["error"].startswith("OSError"))
+
+    for fpath, ds in zip(store.paths, store):
+        assert(np.array_equal(ds['time']['_data'], Dataset(fpath).variables['time'][:]))
+
+
+def test_axis_store_data_is_memory_mapped(tmpdir):
+    _, store_dir = _write_store(tmpdir)
+    store = AxisStore(store_dir)
+
+    data = store[1]['time']['_data']
+    assert(isinstance(data, np.memmap))
+    assert(np.shares_memory(data, store.times))
+
+
+def test_checks_run_against_store_success(tmpdir):
+    paths, store_dir = _write_store(tmpdir)
+    store = AxisStore(store_dir)
+
+    for fpath, ds in zip(paths, store):
+        nc = Dataset(fpath)
+        assert(check_regular_time_axis_increments(ds) == check_regular_time_axis_increments(nc))
+        assert(check_file_name_matches_time_var(ds, tolerance='days:16') ==
+               check_file_name_matches_time_var(nc, tolerance='days:16'))
@@ -0,0 +1,125 @@
+"""
+test_axis_stream.py
+===================
+
+Tests for the `axis_stream.py` module.
+"""
+
+import numpy as np
+from netCDF4 import Dataset
+
+from time_checks.axis_stream import StreamingAxisState, StreamingBoundsState, iter_chunks, stream_time_axis
+from time_checks.file_time_checks import check_regular_time_axis_increments
+
+
+def _stream(values, chunk_size, valid_steps=None, monthly=None):
+    state = StreamingAxisState(valid_steps, monthly=monthly)
+    for chunk in iter_chunks(np.asarray(values), chunk_size):
+        state.update(chunk)
+    return state
+
+
+def test_stream_time_axis_matches_full_check():
+    files = ['test_data/cmip5/mrsos_day_HadGEM2-ES_historical_r1i1p1_19991201-20051130.nc',
+             'test_data/cmip5/mrsos_day_HadGEM2-ES_historical_r2i1p1_19991201-20051130.nc',
+             'test_data/cmip5/tas_Amon_GFDL-CM2p1_historical_r1i1p1_200101-200512.nc',
+             'test_data/cmip5/tasmax_Amon_HadGEM2-ES_historical_r2i1p1_185912-185912.nc',
+             'test_data/cmip6/ua_EdayZ_HadGEM3-GC31-LL_ssp246_r1i1p1f1_gn_19790101-19971230.nc']
+
+    for f in files:
+        ds = Dataset(f)
+        expected = check_regular_time_axis_increments(ds, frequency_index=1)
+        times = ds.variables['time'][:]
+        bounds = ds.variables[ds.variables['time'].bounds][:]
+        increasing = bool(np.all(np.diff(times) > 0))
+        contiguous = bool(np.all(bounds[1:, 0] == bounds[:-1, 1]))
+
+        for chunk_size in (7, 500, 1000000):
+            axis_state, bounds_state = stream_time_axis(ds, chunk_size=chunk_size)
+            assert(axis_state.regular_result() == expected)
+            assert(axis_state.monotonic_result()[0] == increasing)
+            assert(axis_state.count == len(ds.variables['time']))
+            assert(bounds_state.result()[0] == contiguous)
+
+
+def test_streaming_state_across_chunk_boundaries():
+    values = [0., 1., 2., 3., 5., 6., 6., 7.]
+
+    for chunk_size in (1, 3, 4, 8):
+        state = _stream(values, chunk_size)
+        assert(state.first == 0 and state.last == 7 and state.count == 8)
+        assert(state.first_irregular == (4, 2.0))
+        assert(not state.regular_result()[0])
+        assert(state.monotonic_result() == (False, "Time values are not strictly increasing at index 6"))
+
+    state = _stream([0., 1., 2., 1., 2.], 2)
+    assert(state.first_irregular == (3, -1.0) and state.first_non_increasing == 3)
+
+    state = _stream([15.5, 45., 74.5, 105.], 2, valid_steps=[29.5, 30.5, 30.0, 31.0])
+    assert(state.regular_result() == (True, ""))
+
+
+def test_streaming_monthly_midpoints():
+    units, calendar = "days since 2001-01-01", "noleap"
+    values = [15.5, 45., 74.5, 105., 135.5, 166., 196.5, 227.5]
+
+    for chunk_size in (1, 3, 8):
+        state = _stream(values, chunk_size, monthly=(units, calendar, "float64"))
+        assert(state.regular_result() == (True, ""))
+
+    values[3], values[4] = 104., 134.5
+    for chunk_size in (1, 3, 8):
+        state = _stream(values, chunk_size, monthly=(units, calendar, "float64"))
+        assert(state.regular_result() == (False, "Time value 104.0 at index 3 is not the middle of its month "
+                                                 "(expected 105.0)"))
+
+
+def test_streaming_decreasing_and_constant_axes():
+    # With no valid steps the first step is the only valid one, so these axes are "regular"
+    for values in (list(range(9, -1, -1)), [5.] * 10):
+        for chunk_size in (1, 3, 10):
+            state = _stream(values, chunk_size)
+            assert(state.regular_result() == (True, ""))
+            assert(state.monotonic_result() == (False, "Time values are not strictly increasing at index 1"))
+
+
+def _stream_bounds(times, bounds, chunk_size):
+    state = StreamingBoundsState()
+    for start in range(0, len(times), chunk_size):
+        state.update(times[start:start + chunk_size], bounds[start:start + chunk_size])
+    return state
+
+
+def test_streaming_bounds():
+    times = [0.5, 1.5, 2.5, 3.5, 4.5]
+    bounds = [[0, 1], [1, 2], [2, 3], [3, 4], [4, 5]]
+
+    for chunk_size in (1, 2, 5):
+        assert(_stream_bounds(times, bounds, chunk_size).result() == (True, ""))
+
+        # A gap across a chunk boundary
+        gap = bounds[:2] + [[2.5, 3]] + bounds[3:]
+        assert(_stream_bounds(times, gap, chunk_size).result() == (False, "Time bounds are not contiguous at index 2"))
+
+        outside = times[:3] + [5.5] + times[4:]
+        assert(_stream_bounds(outside, bounds, chunk_size).result() == (False, "Time value outside its bounds at index 3"))
+
+
+def test_chunked_run_reports_streamed_checks(tmpdir):
+    from time_checks.scripts.run_file_timechecks import check_file_in_chunks
+
+    f = str(tmpdir.join("tas_day_HadGEM2-ES_historical_r1i1p1_20000101-20000110.nc"))
+    ds = Dataset(f, "w")
+    ds.createDimension("time", None)
+    ds.createDimension("bnds", 2)
+    time_var = ds.createVariable("time", "f8", ("time",))
+    time_var.units, time_var.calendar, time_var.bounds = "days since 2000-01-01", "360_day", "time_bnds"
+    time_var[:] = np.arange(9, -1, -1) + 0.5
+    ds.createVariable("time_bnds", "f8", ("time", "bnds"))[:] = np.array([np.arange(9, -1, -1), np.arange(10, 0, -1)]).T
+    ds.close()
+
+    results = dict((res.code, res) for res in check_file_in_chunks(f, chunk_size=3))
+    assert(results["T1.006"].status == "FAILED")
+    assert("not strictly increasing at index 1" in results["T1.006"].message)
+    assert(results["T1.007"].status == "FAILED")
+    assert("not contiguous at index 1" in results["T1.007"].message)
@@ -0,0 +1,63 @@
+"""
+test_axis_summary.py
+====================
+
+Tests for the `axis_summary.py` module.
+"""
+
+import numpy as np
+from netCDF4 import Dataset
+
+from time_checks import utils
+from time_checks.axis_summary import summarise_axis, with_axis_summary, get_axis_summary
+from time_checks.file_time_checks import check_regular_time_axis_increments
+
+
+def test_summarise_axis():
+    times = np.ma.masked_array([0., 1., 2., 2., 4., 3., 6., 7.], mask=[0, 0, 0, 0, 0, 0, 1, 0])
+    summary = summarise_axis(times, max_irregular=2)
+
+    assert(summary.count == 8 and summary.first == 0 and summary.last == 7)
+    assert(summary.min == 0 and summary.max == 7)
+    assert(summary.has_missing is True and summary.increasing is False)
+    # Only counted on an axis that never decreases
+    assert(summary.n_duplicates is None)
+    assert(summary.n_valid_steps == 2)
+    assert(summary.irregular_histogram == {-1.0: 1, 0.0: 1, 2.0: 1})
+    assert(summary.irregular == [(3, 0.0), (4, 2.0)])
+    res, msg = summary.regular_result()
+    assert(res is False and msg.startswith("Time difference 0.0 is irregular"))
+
+    summary = summarise_axis([15.5, 45., 74.5], valid_steps=[29.5, 30.5, 30.0, 31.0])
+    assert(summary.increasing is True and summary.n_duplicates == 0)
+    assert(summary.has_missing is False and summary.min == 15.5 and summary.max == 74.5)
+    assert(summary.n_valid_steps == 2 and summary.irregular_histogram == {})
+    assert(summary.regular_result() == (True, ""))
+
+    summary = summarise_axis([0., 1., 1., 1., 3.])
+    assert(summary.increasing is False and summary.n_duplicates == 2)
+    assert(summary.irregular_histogram == {0.0: 2, 2.0: 1})
+
+    summary = summarise_axis(np.ma.masked_array([5.], mask=[1]))
+    assert(summary.has_missing is True and summary.min is None)
+
+
+def test_attached_summary_is_used():
+    ds = utils._convert_dataset_to_dict(Dataset('test_data/cmip5/mrsos_day_HadGEM2-ES_historical_r2i1p1_19991201-20051130.nc'))
+    expected = check_regular_time_axis_increments(ds, frequency_index=1)
+    assert(expected[0] is False)
+
+    summarised = with_axis_summary(ds)
+    summary = summarised["time"]["_summary"]
+    assert(get_axis_summary(summarised) is summary)
+    assert(summary.regular_result() == expected)
+    assert(check_regular_time_axis_increments(summarised, frequency_index=1) == expected)
+
+    # The dictionary given is left unchanged
+    assert("_summary" not in ds["time"])
+    ds = summarised
+
+    # Monthly data in a noleap calendar has different valid steps, so a new summary is made
+    ds["filename"][1] = "Amon"
+    ds["time"]["calendar"] = "noleap"
+    assert(get_axis_summary(ds) is not summary)
@@ -0,0 +1,56 @@
+"""
+test_cache.py
+=============
+
+Tests for the `cache.py` module.
+"""
+
+import threading
+
+from time_checks.cache import LRUCache
+
+
+def test_lru_cache_eviction_and_counters():
+    cache = LRUCache(maxsize=2)
+
+    cache.put("a", 1, group="360_day")
+    cache.put("b", 2, group="standard")
+    assert(cache.get("a", group="360_day") == 1)
+
+    # "b" is now least recently used so is evicted
+    cache.put("c", 3, group="360_day")
+    assert("b" not in cache)
+    assert(cache.get("b", group="standard") is None)
+
+    assert(cache.stats("360_day") == {"hits": 1, "misses": 0, "evictions": 0})
+    assert(cache.stats("standard") == {"hits": 0, "misses": 1, "evictions": 1})
+    assert(cache.stats() == {"hits": 1, "misses": 1, "evictions": 1, "size": 2})
+
+    cache.clear()
+    assert(len(cache) == 0)
+    assert(cache.group_stats() == {})
+
+
+def test_lru_cache_shared_between_threads():
+    cache = LRUCache(maxsize=8)
+    errors = []
+
+    def use(offset):
+        try:
+            for i in range(20000):
+                key = (offset + i) % 16
+                if cache.get(key) is None:
+                    cache.put(key, key)
+        except Exception as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=use, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert(errors == [])
+    stats = cache.stats()
+    assert(stats["hits"] + stats["misses"] == 8 * 20000)
+    assert(stats["size"] == 8)
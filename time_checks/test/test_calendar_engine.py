@@ -0,0 +1,99 @@
+"""
+test_calendar_engine.py
+=======================
+
+Tests for the `calendar_engine.py` module, against cftime.
+"""
+
+import numpy as np
+import cftime
+
+from time_checks import calendar_engine
+
+CALENDARS = ['360_day', 'noleap', '365_day', 'all_leap', '366_day', 'julian',
+             'proleptic_gregorian', 'standard', 'gregorian']
+
+COMPONENTS = ['year', 'month', 'day', 'hour', 'minute', 'second', 'microsecond']
+
+
+def _cftime_components(values, units, calendar):
+    dates = cftime.num2date(values, units, calendar)
+    return np.array([[getattr(d, comp) for comp in COMPONENTS] for d in dates])
+
+
+def _engine_components(values, units, calendar):
+    comps = calendar_engine.num2components(values, units, calendar)
+    return np.stack([comps[comp] for comp in COMPONENTS], axis=1)
+
+
+def test_num2components_matches_cftime_all_calendars():
+    # Quarter days are exact in floating point, so results must match exactly
+    values = np.arange(-4000, 800000, 97.25)
+
+    for calendar in CALENDARS:
+        for units in ("days since 1850-01-01", "days since 1582-10-01 06:30:00", "hours since 2000-02-28 12:00"):
+            if units.startswith("days since 1850"):
+                scaled = values
+            else:
+                scaled = values * (24 if units.startswith("hours") else 1)
+
+            expected = _cftime_components(scaled, units, calendar)
+            assert(np.array_equal(_engine_components(scaled, units, calendar), expected))
+
+
+def test_num2components_fractional_values_within_microseconds():
+    values = np.random.RandomState(0).uniform(0, 700000, 2000).round(4)
+    units = "days since 0001-01-01 00:00:00"
+
+    for calendar in CALENDARS:
+        expected = _cftime_components(values, units, calendar)
+        got = _engine_components(values, units, calendar)
+
+        to_us = "microseconds since 0001-01-01"
+        diff = (calendar_engine.components2num(to_us, calendar, *expected.T) -
+                calendar_engine.components2num(to_us, calendar, *got.T))
+        assert(np.abs(diff).max() <= 20)
+
+
+def test_components2num_matches_cftime():
+    years = np.arange(1, 3001, 7)
+    months = (years % 12) + 1
+    days = (years % 28) + 1
+
+    for calendar in CALENDARS:
+        for units in ("days since 1850-01-01", "hours since 1000-06-15 12:00:00"):
+            dates = [cftime.datetime(y, m, d, 6, calendar=calendar) for y, m, d in zip(years, months, days)]
+            expected = cftime.date2num(dates, units, calendar)
+            got = calendar_engine.components2num(units, calendar, years, months, days, 6)
+            assert(np.allclose(got, expected, rtol=0, atol=1e-6))
+
+
+def test_month_lengths_and_leap_years():
+    assert(calendar_engine.month_lengths(2000, 2, "standard") == 29)
+    assert(calendar_engine.month_lengths(1900, 2, "standard") == 28)
+    assert(calendar_engine.month_lengths(1900, 2, "julian") == 29)
+    assert(calendar_engine.month_lengths(1582, 10, "standard") == 21)
+    assert(calendar_engine.month_lengths(2000, 2, "noleap") == 28)
+    assert(calendar_engine.month_lengths(2001, 2, "366_day") == 29)
+    assert(list(calendar_engine.month_lengths(2001, np.arange(1, 13), "360_day")) == [30] * 12)
+
+
+def test_unsupported_units_and_calendars():
+    for units, calendar in (("days since 0001-01", "noleap"),
+                            ("months since 2000-01-01", "360_day"),
+                            ("days since 2000-01-01", "none")):
+        try:
+            calendar_engine.num2components([0], units, calendar)
+            worked = True
+        except ValueError:
+            worked = False
+
+        assert(worked is False)
+
+
+def test_month_midpoints():
+    midpoints = calendar_engine.month_midpoints("days since 2000-01-01", "standard", 2000, 1, 4)
+    assert(midpoints.tolist() == [15.5, 45.5, 75.5, 106.])
+
+    midpoints = calendar_engine.month_midpoints("hours since 1859-12-01", "360_day", 1859, 12, 2, start=1)
+    assert(midpoints.tolist() == [1080., 1800.])
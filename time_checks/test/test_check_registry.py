@@ -0,0 +1,153 @@
+"""
+test_check_registry.py
+======================
+
+Tests for the `check_registry.py` module.
+"""
+
+import glob
+import time
+
+from time_checks.check_registry import CheckRegistry, run_checks
+from time_checks.results import CheckResult, OK, FAILED, SKIPPED
+from time_checks.scripts.run_file_timechecks import FILE_CHECKS, run_tests
+
+
+GOOD_NAME = "tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411.nc"
+BAD_NAME = "tas_Amon_HadGEM2-ES_historical_r1i1p1_1859-1884.nc"
+
+
+def _no_data():
+    raise AssertionError("Data should not be loaded")
+
+
+def _check(code, status):
+    return lambda item: CheckResult(code, code.lower(), status, "" if status == OK else "bad")
+
+
+def test_plan_cheapest_first_after_dependencies():
+    registry = CheckRegistry()
+    registry.register("A", "a", _check("A", OK), cost=5.)
+    registry.register("B", "b", _check("B", OK), cost=1.)
+    registry.register("C", "c", _check("C", OK), depends=["A"], cost=0.)
+
+    assert([spec.code for spec in registry.plan()] == ["B", "A", "C"])
+    # Dependencies that are not selected do not hold a check back
+    assert([spec.code for spec in registry.plan(codes=["B", "C"])] == ["C", "B"])
+
+
+def test_register_unknown_dependency_fails():
+    registry = CheckRegistry()
+    try:
+        registry.register("A", "a", _check("A", OK), depends=["Z"])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected ValueError")
+
+
+def test_file_checks_order():
+    assert([spec.code for spec in FILE_CHECKS.plan()] ==
+           ["T1.000", "T1.001", "T1.002", "T1.003", "T1.004", "T1.005"])
+
+
+def test_bad_file_name_skips_data_checks():
+    results = run_checks(FILE_CHECKS, BAD_NAME, _no_data)
+
+    assert([res.status for res in results] == [OK, OK, OK, FAILED, SKIPPED, SKIPPED])
+    assert(str(results[4]) == "T1.004: [file_name_matches_time_var]: SKIPPED:: "
+                              "Prerequisite checks not passed: T1.003")
+
+
+def test_data_loaded_once_for_all_data_checks():
+    calls = []
+
+    registry = CheckRegistry()
+    registry.register("A", "a", _check("A", OK), takes="name")
+    registry.register("B", "b", _check("B", OK), takes="data", depends=["A"])
+    registry.register("C", "c", _check("C", OK), takes="data", depends=["A"])
+
+    results = run_checks(registry, GOOD_NAME, lambda: calls.append(1) or {})
+    assert(len(calls) == 1)
+    assert(all(res.status == OK and res.key == GOOD_NAME for res in results))
+
+
+def test_load_time_in_first_data_check_duration():
+    registry = CheckRegistry()
+    registry.register("A", "a", _check("A", OK), takes="name")
+    registry.register("B", "b", _check("B", OK), takes="data")
+    registry.register("C", "c", _check("C", OK), takes="data")
+
+    results = run_checks(registry, GOOD_NAME, lambda: time.sleep(0.2) or {})
+    assert([res.code for res in results] == ["A", "B", "C"])
+    assert(results[1].duration >= 0.2)
+    assert(results[0].duration < 0.2 and results[2].duration < 0.2)
+
+
+def test_header_checks_do_not_load_data():
+    registry = CheckRegistry()
+    registry.register("A", "a", _check("A", FAILED), takes="name")
+    registry.register("B", "b", _check("B", OK), takes="data", depends=["A"])
+    registry.register("H", "h", lambda header: CheckResult("H", "h", OK if header == "header" else FAILED),
+                      takes="header")
+
+    results = run_checks(registry, GOOD_NAME, _no_data, load_header=lambda: "header")
+    assert([res.status for res in results] == [FAILED, SKIPPED, OK])
+
+    # Without a header loader the header checks take the data
+    results = run_checks(registry, GOOD_NAME, lambda: "header")
+    assert(results[-1].status == OK)
+
+
+def test_exception_recorded_as_failure():
+    def broken(ds):
+        raise KeyError("EdayZ")
+
+    registry = CheckRegistry()
+    registry.register("A", "a", broken, takes="name")
+    registry.register("B", "b", _check("B", OK), takes="data", depends=["A"])
+
+    results = run_checks(registry, GOOD_NAME, _no_data)
+    assert(str(results[0]) == "A: [a]: FAILED:: Check could not be run: KeyError: 'EdayZ'")
+    assert(results[1].status == SKIPPED)
+
+
+def test_no_short_circuit_runs_everything():
+    registry = CheckRegistry()
+    registry.register("A", "a", _check("A", FAILED), takes="name")
+    registry.register("B", "b", _check("B", OK), takes="data", depends=["A"])
+
+    results = run_checks(registry, GOOD_NAME, lambda: {}, short_circuit=False)
+    assert([res.status for res in results] == [FAILED, OK])
+
+
+def test_run_tests_selected_codes():
+    f = sorted(glob.glob("test_data/cmip5/tas_Amon_*.nc"))[0]
+    from time_checks import utils
+
+    results = run_tests(f, utils._netcdf4().Dataset(f), codes=["T1.000", "T1.005"])
+    assert([res.code for res in results] == ["T1.000", "T1.005"])
+    assert(all(res.ok for res in results))
+
+
+def test_load_failure_recorded_for_data_checks(tmpdir):
+    from time_checks import utils
+    from time_checks.scripts.run_file_timechecks import main, get_log_path
+
+    # A file with no time variable
+    f = str(tmpdir.join("tas_Amon_HadGEM2-ES_historical_r1i1p1_200101-200112.nc"))
+    ds = utils._netcdf4().Dataset(f, "w")
+    ds.createDimension("lat", 2)
+    ds.createVariable("lat", "f8", ("lat",))[:] = [1., 2.]
+    ds.close()
+
+    main(f, str(tmpdir))
+    with open(get_log_path(f, str(tmpdir))) as reader:
+        lines = reader.read().splitlines()
+
+    message = "FAILED:: Check could not be run: ValueError: No time variable found in: {}".format(f)
+    assert(lines[1:5] == ["T1.00{}: [{}]: OK".format(i, name) for i, name in enumerate(
+        ["file_extension", "check_file_name_time_format", "check_valid_temporal_element",
+         "time_format_matches_frequency"])])
+    assert(lines[5:] == ["T1.004: [file_name_matches_time_var]: " + message,
+                         "T1.005: [regular_time_axis_increments]: " + message])
@@ -0,0 +1,115 @@
+"""
+test_chunk_layout.py
+====================
+
+Tests for the `chunk_layout.py` module.
+"""
+
+import os
+
+import numpy as np
+
+from time_checks import utils
+from time_checks.chunk_layout import (ChunkLayout, get_chunk_layout, is_pathological, aligned_chunk_size,
+                                      check_time_chunk_layout)
+from time_checks.scripts.run_file_timechecks import run_tests, run_streaming_tests, main, get_log_path
+
+
+def _make_file(tmpdir, chunk_length, zlib=False):
+    n = 240
+    fpath = os.path.join(str(tmpdir), "tas_day_HadGEM2-ES_historical_r1i1p1_18500101-18500828.nc")
+    ds = utils._netcdf4().Dataset(fpath, "w")
+    ds.createDimension("time", None if chunk_length else n)
+    ds.createDimension("bnds", 2)
+
+    options = {"chunksizes": [chunk_length]} if chunk_length else {"contiguous": True}
+    time_var = ds.createVariable("time", "f8", ("time",), zlib=zlib, **options)
+    time_var.units = "days since 1850-01-01"
+    time_var.calendar = "standard"
+    time_var.standard_name = "time"
+    time_var.bounds = "time_bnds"
+    time_var[:] = np.arange(n) + 0.5
+
+    bounds_var = ds.createVariable("time_bnds", "f8", ("time", "bnds"))
+    bounds_var[:] = np.stack([np.arange(n), np.arange(n) + 1.], axis=1)
+    ds.close()
+
+    return fpath
+
+
+def test_get_chunk_layout(tmpdir):
+    ds = utils._netcdf4().Dataset(_make_file(tmpdir.mkdir("a"), 1, zlib=True))
+    layout = get_chunk_layout(ds.variables["time"])
+    assert(layout == ChunkLayout(240, 1, ["shuffle", "zlib"], 8) or layout == ChunkLayout(240, 1, ["zlib"], 8))
+    assert(is_pathological(layout))
+    ds.close()
+
+    ds = utils._netcdf4().Dataset(_make_file(tmpdir.mkdir("b"), None))
+    layout = get_chunk_layout(ds.variables["time"])
+    assert(layout == ChunkLayout(240, None, [], 8) and not is_pathological(layout))
+    ds.close()
+
+    ds = utils._netcdf4().Dataset('test_data/cmip5/tas_Amon_GFDL-CM2p1_historical_r1i1p1_200101-200512.nc')
+    assert(get_chunk_layout(ds.variables["time"]) == ChunkLayout(60, None, [], 8))
+    ds.close()
+
+
+def test_aligned_chunk_size():
+    assert(aligned_chunk_size(1000, ChunkLayout(10000, None, [], 8)) == 1000)
+    assert(aligned_chunk_size(1000, ChunkLayout(10000, 512, [], 8)) == 512)
+    assert(aligned_chunk_size(100, ChunkLayout(10000, 512, [], 8)) == 512)
+    assert(aligned_chunk_size(1000, ChunkLayout(10000, 1, [], 8)) == 1000)
+
+
+def test_check_time_chunk_layout():
+    assert(check_time_chunk_layout(ChunkLayout(10000, 512, [], 8)) == (True, ""))
+
+    # A single chunk is read in one go, however small
+    assert(check_time_chunk_layout(ChunkLayout(1, 1, [], 8)) == (True, ""))
+
+    res, msg = check_time_chunk_layout(ChunkLayout(100, 1, ["zlib"], 8))
+    assert(res is False and msg.startswith("Time variable of 100 steps is stored in 100 chunks of 1 step(s) "
+                                           "compressed (zlib)"))
+    assert(check_time_chunk_layout(None)[0] is None)
+
+
+def test_layout_diagnostic_in_results(tmpdir):
+    fpath = _make_file(tmpdir, 1)
+    ds = utils._netcdf4().Dataset(fpath)
+
+    results = run_tests(fpath, ds, diagnostics=True)
+    assert([res.code for res in results] == ["T1.000", "T1.001", "T1.002", "T1.003", "T1.004", "T1.005", "P1.000"])
+    assert(results[-1].status == "FAILED")
+
+    # Read in chunks aligned to the storage chunks, the results are the same
+    streamed = run_streaming_tests(fpath, ds, chunk_size=7, diagnostics=True)
+    assert([str(res) for res in streamed if res.code not in ("T1.006", "T1.007")] == [str(res) for res in results])
+
+    assert(len(run_tests(fpath, ds)) == 6)
+    ds.close()
+
+    # Dataset dictionaries without a storage layout are skipped
+    record = utils._convert_dataset_to_dict(utils._netcdf4().Dataset(fpath))
+    del record["time"]["_storage"]
+    assert(run_tests(fpath, record, diagnostics=True)[-1].status == "SKIPPED")
+
+
+def test_layout_diagnostic_does_not_read_data(tmpdir, monkeypatch):
+    # A bad file name skips every data check: only the header is read for P1.000
+    fpath = _make_file(tmpdir, 1)
+    bad_name = str(tmpdir.join("tas_day_HadGEM2-ES_historical_r1i1p1_1850-1850.nc"))
+    os.rename(fpath, bad_name)
+
+    def no_read(*args, **kwargs):
+        raise AssertionError("Time values should not be read")
+
+    monkeypatch.setattr(utils, "_convert_dataset_to_dict", no_read)
+
+    for chunk_size in (None, 7):
+        main(bad_name, str(tmpdir), chunk_size=chunk_size, diagnostics=True)
+        with open(get_log_path(bad_name, str(tmpdir))) as reader:
+            lines = reader.read().splitlines()
+
+        skipped = [line.split(":")[0] for line in lines if ": SKIPPED::" in line]
+        assert(skipped == (["T1.004", "T1.005"] if chunk_size is None else ["T1.004", "T1.005", "T1.006", "T1.007"]))
+        assert(lines[-1].startswith("P1.000: [time_chunk_layout]: FAILED:: Storage layout of the time variable"))
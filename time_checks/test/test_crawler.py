@@ -0,0 +1,98 @@
+"""
+test_crawler.py
+===============
+
+Tests for the `crawler.py` module.
+"""
+
+import os
+
+from time_checks.crawler import DRSCrawler, parse_filters, read_journal
+
+
+def _make_archive(root):
+    """
+    Creates a small DRS archive with a `latest` link in each dataset, and
+    returns the dataset directories.
+    """
+    datasets = []
+    for model, table, freq in [("HadGEM2-ES", "Amon", "mon"), ("HadGEM2-ES", "day", "day"),
+                               ("HadGEM2-CC", "Amon", "mon")]:
+        ens_dir = root.join("cmip5", "output1", "MOHC", model, "historical", freq, "atmos", table, "r1i1p1")
+        var_dir = ens_dir.join("v20110101", "tas")
+        var_dir.ensure(dir=True)
+        for years in ("185912-188411", "188412-190911"):
+            var_dir.join("tas_{}_{}_historical_r1i1p1_{}.nc".format(table, model, years)).write("")
+        var_dir.join("README").write("")
+
+        ens_dir.join("latest").mksymlinkto(ens_dir.join("v20110101"))
+        ens_dir.join("files", "tas_20110101").ensure(dir=True)
+        datasets.append(str(var_dir))
+
+    return datasets
+
+
+def test_crawl_resolves_links_and_filters(tmpdir):
+    datasets = _make_archive(tmpdir)
+    records = list(DRSCrawler(str(tmpdir), workers=4))
+
+    assert(len(records) == 6)
+    assert(len(set(path for _, path in records)) == 6)
+    assert(all("latest" not in path and "/files/" not in path for _, path in records))
+    assert(sorted(os.path.dirname(path) for _, path in records) == sorted(datasets * 2))
+    assert("cmip5.output1.MOHC.HadGEM2-ES.historical.mon.atmos.Amon.r1i1p1.v20110101.tas" in
+           set(dataset_id for dataset_id, _ in records))
+
+    filters = parse_filters(["table=Amon", "model=HadGEM2-E*"])
+    assert(filters == {"table": ["Amon"], "model": ["HadGEM2-E*"]})
+    records = list(DRSCrawler(str(tmpdir), filters=filters))
+    assert(len(records) == 2 and all("HadGEM2-ES/historical/mon" in path for _, path in records))
+
+
+def test_crawl_resumes_from_journal(tmpdir):
+    _make_archive(tmpdir.mkdir("archive"))
+    root = str(tmpdir.join("archive"))
+    journal = str(tmpdir.join("crawl.journal"))
+
+    crawl = DRSCrawler(root, workers=1, journal=journal).crawl()
+    first = [next(crawl) for i in range(3)]
+    crawl.close()
+
+    # Only the dataset whose files were all consumed is recorded
+    done = read_journal(journal)
+    assert(len([path for path in done if path.endswith("tas")]) == 1)
+
+    rest = list(DRSCrawler(root, workers=1, journal=journal))
+    assert(len(rest) == 4)
+    assert(len(set(path for _, path in first + rest)) == 6)
+
+    assert(root in read_journal(journal))
+    assert(list(DRSCrawler(root, journal=journal)) == [])
+
+
+def test_deferred_crawl_journals_checked_directories(tmpdir):
+    datasets = _make_archive(tmpdir.mkdir("archive"))
+    root = str(tmpdir.join("archive"))
+    journal = str(tmpdir.join("crawl.journal"))
+
+    crawler = DRSCrawler(root, workers=1, journal=journal, deferred=True)
+    crawl = crawler.crawl()
+    first = [next(crawl) for i in range(3)]
+
+    # Consumed but not checked: nothing is recorded
+    assert(read_journal(journal) == set())
+
+    crawler.acknowledge([path for _, path in first[:2]])
+    done = read_journal(journal)
+    assert([path for path in done if path.endswith("tas")] == [os.path.dirname(first[0][1])])
+    assert(os.path.dirname(first[2][1]) not in done)
+
+    # Interrupted before the third file was checked: it is crawled again
+    crawl.close()
+    crawler = DRSCrawler(root, workers=1, journal=journal, deferred=True)
+    rest = list(crawler)
+    assert(len(rest) == 4 and first[2] in rest)
+
+    crawler.acknowledge([path for _, path in rest])
+    done = read_journal(journal)
+    assert(root in done and set(datasets) <= done)
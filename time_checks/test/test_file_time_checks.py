@@ -5,6 +5,9 @@ test_file_time_checks.py
 Tests for the checks in the `file_time_checks.py` module.
 """
 
+import subprocess
+import sys
+
 from netCDF4 import Dataset, date2num
 
 from time_checks.file_time_checks import *
@@ -160,6 +163,21 @@ def test_check_regular_time_axis_increments_fail_1():
         assert(check_regular_time_axis_increments(ds, frequency_index=1)[0] is False)
  
 
+def test_check_regular_time_axis_increments_monthly_midpoints():
+    ds = utils._convert_dataset_to_dict(Dataset('test_data/cmip5/tas_Amon_GFDL-CM2p1_historical_r1i1p1_200101-200512.nc'))
+    assert(check_regular_time_axis_increments(ds, frequency_index=1) == (True, ""))
+
+    # Swap two increments: every step is still a valid monthly step, but two values are in the wrong place
+    times = ds["time"]["_data"]
+    times[2] = times[1] + (times[3] - times[2])
+    ds["time"]["_data"] = times
+
+    res, msg = check_regular_time_axis_increments(ds, frequency_index=1)
+    assert(res is False)
+    assert(msg.startswith("Time value 51210.5 at index 2 is not the middle of its month (expected 51209.5)"))
+    assert(check_regular_time_axis_increments(ds, frequency_index=1, monthly_mode="steps")[0] is True)
+
+
 def test_check_valid_temporal_element_success_1():
     eg_names = ['mrsos_Oyr_HadGEM2-ES_historical_r1i1p1_1999-2005.nc',
                 'mrsos_Amon_HadGEM2-ES_historical_r1i1p1_199912-200511.nc',
@@ -184,3 +202,13 @@ def test_check_valid_temporal_element_fail_1():
         mock_ds = MockNCDataset(fname)
         assert(check_valid_temporal_element(mock_ds, time_index_in_name=-1)[0] is False)
 
+
+def test_filename_checks_do_not_import_netcdf4():
+    code = ("import sys\n"
+            "from time_checks.file_time_checks import check_file_name_time_format, check_valid_temporal_element\n"
+            "ds = {'filename': ['mrsos', 'day', 'HadGEM2-ES', 'historical', 'r1i1p1', '19991201-20051130']}\n"
+            "assert check_file_name_time_format(ds)[0] is True\n"
+            "assert check_valid_temporal_element(ds)[0] is True\n"
+            "assert 'netCDF4' not in sys.modules\n"
+            "assert 'numpy' not in sys.modules\n")
+    subprocess.check_call([sys.executable, "-c", code])
@@ -0,0 +1,74 @@
+"""
+test_filename_prechecks.py
+==========================
+
+Tests for the `filename_prechecks.py` module.
+"""
+
+import io
+import itertools
+
+from time_checks import filename_prechecks
+from time_checks.filename_prechecks import check_file_name, precheck_batch, precheck_stream
+
+
+def test_valid_name_regex_agrees_with_checks():
+    tables = ('Oyr', 'Amon', 'day', '3hr', '6hrPlev', 'mon')
+    time_ranges = ('1999-2005', '4001-4002', '199912-200511', '199900-200513',
+                   '19991201-20051130', '19991201-20051132', '1999120100-2005113024',
+                   '199912010100-200511300159', '199912010100-200511300160', '1999', '19991201')
+
+    for table, time_range in itertools.product(tables, time_ranges):
+        fpath = '/badc/cmip5/data/tas_{}_HadGEM2-ES_historical_r1i1p1_{}.nc'.format(table, time_range)
+
+        if filename_prechecks.VALID_NAME_REGEX.search(fpath):
+            assert(check_file_name(fpath) == [])
+
+
+def test_check_file_name_failures():
+    assert(check_file_name('tas_day_HadGEM2-ES_historical_r1i1p1_19991201-20051130.nc') == [])
+
+    codes = [f[0] for f in check_file_name('tas_day_HadGEM2-ES_historical_r1i1p1_19991201-20051132.txt')]
+    assert(codes == ['T1.000', 'T1.002'])
+
+    # Unknown CMOR table raises in the check and is reported as a failure
+    codes = [f[0] for f in check_file_name('tas_mon_HadGEM2-ES_historical_r1i1p1_199912-200511.nc')]
+    assert(codes == ['T1.003'])
+
+
+def test_precheck_batch_success_1():
+    paths = ['a/tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411.nc',
+             'a/tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-1884.nc',
+             'a/tas_day_HadGEM2-ES_historical_r1i1p1_18591201-18841130.nc']
+
+    failures = list(precheck_batch(paths))
+    assert(set(f[0] for f in failures) == set([paths[1]]))
+
+
+def test_precheck_stream_reads_lazily():
+    good = 'tas_day_HadGEM2-ES_historical_r1i1p1_19991201-20051130.nc\n'
+    bad = 'tas_day_HadGEM2-ES_historical_r1i1p1_19991201-20051130\n'
+    consumed = []
+
+    def listing():
+        for i in range(25):
+            consumed.append(i)
+            yield bad if i % 10 == 0 else good
+
+    class Output(io.StringIO):
+        read_at_first_write = None
+
+        def write(self, text):
+            if self.read_at_first_write is None:
+                self.read_at_first_write = len(consumed)
+            return io.StringIO.write(self, text)
+
+    output = Output()
+    n_checked, n_failed = precheck_stream(listing(), output, batch_size=10)
+
+    assert((n_checked, n_failed) == (25, 3))
+    # The first failure is written once the first batch is checked
+    assert(output.read_at_first_write == 10)
+    lines = output.getvalue().splitlines()
+    assert(len(lines) == 3)
+    assert(lines[0] == bad.strip() + "\tT1.000: [file_extension]: FAILED:: File does not end with '.nc'")
@@ -0,0 +1,85 @@
+"""
+test_fingerprint.py
+===================
+
+Tests for the `fingerprint.py` module.
+"""
+
+import copy
+
+import numpy as np
+
+from netCDF4 import Dataset
+
+from time_checks import utils
+from time_checks.fingerprint import axis_fingerprint, set_result_cache_size, RESULT_CACHE, DEFAULT_RESULT_CACHE_SIZE
+from time_checks.file_time_checks import check_regular_time_axis_increments
+from time_checks.file_time_checks import check_file_name_matches_time_var
+
+
+def _get_dict(fpath):
+    return utils._convert_dataset_to_dict(Dataset(fpath))
+
+
+def test_axis_fingerprint_success():
+    ds = _get_dict('test_data/cmip5/tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411.nc')
+    other = copy.deepcopy(ds)
+    assert(axis_fingerprint(ds['time']) == axis_fingerprint(other['time']))
+
+    other['time']['calendar'] = 'standard'
+    assert(axis_fingerprint(ds['time']) != axis_fingerprint(other['time']))
+
+    other = copy.deepcopy(ds)
+    other['time']['_data'][-1] += 1
+    assert(axis_fingerprint(ds['time']) != axis_fingerprint(other['time']))
+
+
+def test_results_memoized_across_members_and_variables():
+    RESULT_CACHE.clear()
+
+    ds = _get_dict('test_data/cmip5/tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411.nc')
+    result = check_regular_time_axis_increments(ds)
+    assert(RESULT_CACHE.stats()['misses'] == 1)
+
+    # Another variable and ensemble member with the same time axis
+    sibling = copy.deepcopy(ds)
+    sibling['filename'][0] = 'pr'
+    sibling['filename'][4] = 'r2i1p1'
+    assert(check_regular_time_axis_increments(sibling) == result)
+    assert(RESULT_CACHE.stats()['hits'] == 1)
+
+    # Different time component in the file name must not reuse the result
+    renamed = copy.deepcopy(ds)
+    renamed['filename'][-1] = '185912-188410'
+    check_file_name_matches_time_var(ds, tolerance='days:16')
+    res, _ = check_file_name_matches_time_var(renamed, tolerance='days:16')
+    assert(res is False)
+    assert(RESULT_CACHE.stats()['hits'] == 1)
+
+
+def test_data_type_in_key():
+    RESULT_CACHE.clear()
+
+    # Whole day values: only the middles of the months of an integer axis
+    ds = _get_dict('test_data/cmip5/tas_Amon_GFDL-CM2p1_historical_r1i1p1_200101-200512.nc')
+    ds['time']['_data'] = np.floor(ds['time']['_data'])
+    int_twin = copy.deepcopy(ds)
+    int_twin['time']['_data'] = ds['time']['_data'].astype('int32')
+    int_twin['time']['_type'] = 'int32'
+
+    assert(check_regular_time_axis_increments(int_twin) == (True, ""))
+    res, msg = check_regular_time_axis_increments(ds)
+    assert(res is False and msg.startswith("Time value 51150.0 at index 0"))
+    assert(RESULT_CACHE.stats()['hits'] == 0)
+
+
+def test_result_cache_turned_off():
+    ds = _get_dict('test_data/cmip5/tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411.nc')
+
+    try:
+        set_result_cache_size(0)
+        result = check_regular_time_axis_increments(ds)
+        assert(check_regular_time_axis_increments(copy.deepcopy(ds)) == result)
+        assert(len(RESULT_CACHE) == 0 and RESULT_CACHE.stats()['hits'] == 0)
+    finally:
+        set_result_cache_size(DEFAULT_RESULT_CACHE_SIZE)
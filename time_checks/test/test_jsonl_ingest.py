@@ -0,0 +1,89 @@
+"""
+test_jsonl_ingest.py
+====================
+
+Tests for the `jsonl_ingest.py` module.
+"""
+
+import io
+import json
+
+import numpy as np
+
+from time_checks import utils
+from time_checks.jsonl_ingest import decode_data, decode_record, record_key, ingest_stream
+from time_checks.scripts.run_file_timechecks import run_tests
+
+
+def _record(filename, data, calendar="standard", units="days since 1850-01-01"):
+    return {"time": {"units": units, "calendar": calendar, "_data": data},
+            "filename": filename.split("_")}
+
+
+def test_decode_data():
+    values = decode_data(" 1.5, 2e3 ,-4")
+    assert(values.dtype == np.float64 and values.tolist() == [1.5, 2000., -4.])
+
+    assert(decode_data("").size == 0)
+    assert(np.isnan(decode_data("1, null, 3")[1]))
+
+    # Malformed lists are not truncated
+    for text in ("1,,2", "1,2,", ",1", "1 2"):
+        try:
+            decode_data(text)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Malformed list decoded: {}".format(text))
+
+
+def test_decode_record():
+    record = decode_record(json.dumps(_record("tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411", [15.5, 45.])))
+
+    assert(isinstance(record["time"]["_data"], np.ndarray))
+    assert(record["time"]["_data"].tolist() == [15.5, 45.])
+    assert(record["time"]["units"] == "days since 1850-01-01")
+    assert(record_key(record) == "tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411.nc")
+
+    # Other "_data" lists, before or after the time values, are left alone
+    for line in ('{"lat": {"_data": [1, 2]}, "time": {"units": "days since 1850-01-01", "_data": [15.5, 45, 74.5]}, '
+                 '"filename": ["tas", "Amon", "x", "y", "r1i1p1", "185912-188411"]}',
+                 '{"time": {"units": "days since 1850-01-01", "_data": [15.5, 45, 74.5]}, "lat": {"_data": [1, 2]}, '
+                 '"filename": ["tas", "Amon", "x", "y", "r1i1p1", "185912-188411"]}',
+                 '{"lat": {"time": {"_data": [1, 2]}}, "time": {"units": "days since 1850-01-01", '
+                 '"_data": [15.5, 45, 74.5]}, "filename": ["tas", "Amon", "x", "y", "r1i1p1", "185912-188411"]}'):
+        record = decode_record(line)
+        assert(isinstance(record["time"]["_data"], np.ndarray))
+        assert(record["time"]["_data"].tolist() == [15.5, 45., 74.5])
+        assert(json.loads(line)["lat"] == record["lat"])
+
+    record = decode_record('{"path": "/a/tas_Amon_x_y_r1i1p1_185912-188411.nc", "time": {"_data": []}}')
+    assert(record["filename"][-1] == "185912-188411")
+    assert(record_key(record) == "/a/tas_Amon_x_y_r1i1p1_185912-188411.nc")
+
+
+def test_ingest_matches_file_checks_in_order():
+    # The last batch is checked in a different order (360_day first) from its lines
+    files = ['test_data/cmip5/tas_Amon_GFDL-CM2p1_historical_r1i1p1_200101-200512.nc',
+             'test_data/cmip5/tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411.nc',
+             'test_data/test_mon_360_day.nc']
+
+    lines, expected = [], []
+    for f in files:
+        ds = utils._netcdf4().Dataset(f)
+        record = utils._convert_dataset_to_dict(ds)
+        record["time"]["_data"] = [float(value) for value in record["time"]["_data"]]
+        record["path"] = f
+        lines.append(json.dumps(record) + "\n")
+        expected.append((f, [str(res) for res in run_tests(f, ds)]))
+
+    lines.insert(1, "\n")
+    lines.insert(2, "{not json\n")
+
+    results = list(ingest_stream(io.StringIO("".join(lines)), run_tests, batch_size=2))
+
+    assert([number for number, key, res in results] == [1, 3, 4, 5])
+    assert(isinstance(results[1][2], ValueError))
+
+    checked = [(key, [str(r) for r in res]) for number, key, res in results if not isinstance(res, Exception)]
+    assert(checked == expected)
@@ -0,0 +1,97 @@
+"""
+test_memory_budget.py
+=====================
+
+Tests for the `memory_budget.py` module.
+"""
+
+import os
+import time
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from time_checks import utils
+from time_checks.async_scheduler import AsyncCheckScheduler
+from time_checks.memory_budget import (MemoryBudget, ReportingPeakRSS, parse_size, header_time_length,
+                                       estimate_axis_bytes)
+from time_checks.scripts.run_file_timechecks import run_tests, check_file_in_chunks
+
+
+def test_parse_size():
+    assert(parse_size("512") == 512)
+    assert(parse_size("4K") == 4096)
+    assert(parse_size("1.5G") == int(1.5 * 1024 ** 3))
+    assert(parse_size("2MB") == 2 * 1024 ** 2)
+
+
+def test_header_time_length():
+    f = 'test_data/cmip5/tas_Amon_GFDL-CM2p1_historical_r1i1p1_200101-200512.nc'
+    ds = utils._netcdf4().Dataset(f)
+    expected = len(utils._convert_dataset_to_dict(ds)["time"]["_data"])
+    ds.close()
+
+    assert(header_time_length(f) == expected == 60)
+
+
+class _Tracker(object):
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def read(self, path):
+        with self._lock:
+            self.active += int(path)
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.01)
+        return path
+
+    def check(self, path, data):
+        with self._lock:
+            self.active -= int(path)
+        return "whole"
+
+
+def test_scheduler_admits_within_budget():
+    tracker = _Tracker()
+    budget = MemoryBudget(10, chunk_size=0, max_file_bytes=6, sizer=int)
+    budget.chunked_bytes = 1
+
+    paths = ["4", "5", "3", "9", "6", "2", "1", "5"]
+    with ThreadPoolExecutor(max_workers=4) as threads:
+        scheduler = AsyncCheckScheduler(tracker.check, reader=tracker.read, memory_budget=budget,
+                                        fallback_reader=lambda path: "chunked", read_executor=threads)
+        results = scheduler.run(paths)
+
+    assert(tracker.peak <= 10 and budget.peak <= 10)
+    assert(budget.used == 0)
+    assert([result for path, result in results] == ["whole"] * 3 + ["chunked"] + ["whole"] * 4)
+
+
+def test_report_peak_rss():
+    result, pid, peak = ReportingPeakRSS(len)("abc")
+    assert(result == 3 and pid == os.getpid() and peak > 0)
+
+    with ThreadPoolExecutor(max_workers=2) as threads:
+        scheduler = AsyncCheckScheduler(lambda path, data: data, reader=lambda path: path, report_rss=True,
+                                        read_executor=threads)
+        scheduler.run(["/a", "/b"])
+    assert(list(scheduler.peak_rss) == [os.getpid()])
+
+
+def test_oversized_file_checked_in_chunks():
+    f = 'test_data/cmip5/tas_Amon_GFDL-CM2p1_historical_r1i1p1_200101-200512.nc'
+    expected = [str(res) for res in run_tests(f, utils._netcdf4().Dataset(f))]
+
+    budget = MemoryBudget(estimate_axis_bytes(100), chunk_size=7, max_file_bytes=estimate_axis_bytes(10))
+    scheduler = AsyncCheckScheduler(run_tests, memory_budget=budget,
+                                    fallback_reader=functools.partial(check_file_in_chunks,
+                                                                      chunk_size=budget.chunk_size))
+    [(path, results)] = scheduler.run([f])
+
+    # The streamed checks also report monotonicity and bounds (T1.006 and T1.007)
+    assert([str(res) for res in results[:-2]] == expected)
+    assert([str(res) for res in results[-2:]] == ["T1.006: [time_axis_increasing]: OK", "T1.007: [time_bounds]: OK"])
+    assert(budget.peak == budget.chunked_bytes)
@@ -0,0 +1,127 @@
+"""
+test_profiling.py
+=================
+
+Tests for the `profiling.py` module.
+"""
+
+import os
+import pstats
+
+from time_checks.profiling import (is_sampled, ProfiledCall, profile_call, clear_profiles, merge_profiles,
+                                   collapse_stacks, MERGED_PROFILE, COLLAPSED_STACKS)
+
+
+def _leaf(n):
+    return sum(i * i for i in range(n))
+
+
+def _caller(n):
+    return _leaf(n) + _leaf(n)
+
+
+def test_is_sampled():
+    keys = ["/d/f{}.nc".format(i) for i in range(1000)]
+    assert(all(is_sampled(key, 1.) for key in keys))
+    assert(not any(is_sampled(key, 0.) for key in keys))
+
+    sampled = [key for key in keys if is_sampled(key, 0.2)]
+    assert(150 < len(sampled) < 250)
+
+    # The sample is the same in every worker
+    assert(sampled == [key for key in keys if is_sampled(key, 0.2)])
+
+
+def test_profiled_call(tmpdir):
+    profile_dir = str(tmpdir.join("prof"))
+    profiled = ProfiledCall(_caller, profile_dir)
+    assert(profiled(1000) == 2 * _leaf(1000))
+    assert(profiled(2000) == 2 * _leaf(2000))
+
+    # The calls of one thread accumulate in one profile
+    paths = os.listdir(profile_dir)
+    assert(len(paths) == 1 and paths[0].endswith(".pstats"))
+
+    stats = pstats.Stats(os.path.join(profile_dir, paths[0]))
+    calls = dict((func[2], entry[1]) for func, entry in stats.stats.items())
+    assert(calls["_caller"] == 2 and calls["_leaf"] == 4)
+
+
+def test_unsampled_calls_are_not_profiled(tmpdir):
+    profile_dir = str(tmpdir.join("prof"))
+    profiled = ProfiledCall(_caller, profile_dir, sample_rate=0.)
+    assert(profiled(10) == 2 * _leaf(10))
+    assert(not os.path.exists(profile_dir))
+
+
+def test_merge_profiles(tmpdir):
+    profile_dir = str(tmpdir)
+    assert(merge_profiles(profile_dir) is None)
+
+    ProfiledCall(_caller, profile_dir)(20000)
+    # Written as the profile of another worker
+    profile_call(os.path.join(profile_dir, "other"), _caller, 20000)
+    os.rename(os.path.join(profile_dir, "other", os.listdir(os.path.join(profile_dir, "other"))[0]),
+              os.path.join(profile_dir, "other.pstats"))
+
+    stats, merged_path, collapsed_path = merge_profiles(profile_dir)
+    assert(merged_path == os.path.join(profile_dir, MERGED_PROFILE))
+    assert(collapsed_path == os.path.join(profile_dir, COLLAPSED_STACKS))
+
+    calls = dict((func[2], entry[1]) for func, entry in pstats.Stats(merged_path).stats.items())
+    assert(calls["_caller"] == 2 and calls["_leaf"] == 4)
+
+    # Merging again does not merge the merged profile
+    stats, _, _ = merge_profiles(profile_dir)
+    assert(dict((func[2], entry[1]) for func, entry in stats.stats.items())["_caller"] == 2)
+
+    with open(collapsed_path) as reader:
+        lines = reader.read().splitlines()
+    for line in lines:
+        stack, micros = line.rsplit(" ", 1)
+        assert(int(micros) > 0 and " " not in stack)
+
+    assert(any(line.split(" ")[0].endswith("test_profiling.py:_caller;test_profiling.py:_leaf")
+               for line in lines))
+
+
+def test_clear_profiles(tmpdir):
+    profile_dir = str(tmpdir)
+    clear_profiles(str(tmpdir.join("missing")))
+
+    ProfiledCall(_caller, profile_dir)(1000)
+    merge_profiles(profile_dir)
+    tmpdir.join("other.txt").write("kept")
+
+    clear_profiles(profile_dir)
+    assert(os.listdir(profile_dir) == ["other.txt"])
+
+
+def test_rerun_does_not_merge_earlier_profiles(tmpdir):
+    from time_checks.async_scheduler import TierLimits
+    from time_checks.scripts.run_batch_timechecks import main
+
+    files = ["test_data/cmip5/tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411.nc"]
+    profile_dir = str(tmpdir.join("prof"))
+
+    def n_runs():
+        stats = pstats.Stats(os.path.join(profile_dir, MERGED_PROFILE))
+        return max(entry[1] for func, entry in stats.stats.items() if func[2] == "run_tests")
+
+    for _ in range(2):
+        main(files, str(tmpdir.join("logs")), TierLimits(default_limit=1), processes=1, profile_dir=profile_dir)
+        assert(n_runs() == 1)
+
+
+def test_collapse_stacks():
+    # A leaf called from two functions: its time is shared in proportion to the time under each
+    a = ("a.py", 1, "a")
+    b = ("b.py", 1, "b")
+    leaf = ("c.py", 1, "leaf")
+    stats = pstats.Stats.__new__(pstats.Stats)
+    stats.stats = {a: (1, 1, 1., 4., {}),
+                   b: (1, 1, 1., 2., {}),
+                   leaf: (2, 2, 4., 4., {a: (1, 1, 3., 3.), b: (1, 1, 1., 1.)})}
+
+    assert(collapse_stacks(stats) == {"a.py:a": 1000000, "a.py:a;c.py:leaf": 3000000,
+                                      "b.py:b": 1000000, "b.py:b;c.py:leaf": 1000000})
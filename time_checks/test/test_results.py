@@ -0,0 +1,45 @@
+"""
+test_results.py
+===============
+
+Tests for the `results.py` module.
+"""
+
+from time_checks.results import CheckResult, ResultTable, summarise, OK, FAILED
+from time_checks.scripts.run_file_timechecks import run_filename_tests
+
+
+def test_check_result_string_format():
+    ok = CheckResult.from_check("T1.004", "file_name_matches_time_var", True, "")
+    assert(ok.ok and str(ok) == "T1.004: [file_name_matches_time_var]: OK")
+
+    failed = CheckResult.from_check("T1.005", "regular_time_axis_increments", False, "Gap at 3",
+                                    prefix="Time axis increments are not regular. ")
+    assert(failed.status == FAILED)
+    assert(str(failed) == "T1.005: [regular_time_axis_increments]: FAILED:: "
+                          "Time axis increments are not regular. Gap at 3")
+
+
+def test_runner_returns_records():
+    results = run_filename_tests("tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411.txt")
+
+    assert([res.code for res in results] == ["T1.000", "T1.001", "T1.002", "T1.003"])
+    assert([res.status for res in results] == [FAILED, OK, OK, OK])
+    assert(str(results[0]) == "T1.000: [file_extension]: FAILED:: File does not end with '.nc'")
+    assert(all(res.key.startswith("tas_Amon") and res.duration >= 0 for res in results))
+
+
+def test_result_table_export(tmpdir):
+    results = (run_filename_tests("tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411.nc") +
+               run_filename_tests("tas_Amon_HadGEM2-ES_historical_r1i1p1_185913-188411.nc"))
+    table = ResultTable(results)
+    assert(len(table) == 8)
+
+    array = table.to_numpy()
+    assert(array["key"][4].endswith("185913-188411.nc"))
+    assert(summarise(array) == {("T1.000", OK): 2, ("T1.001", OK): 2, ("T1.002", OK): 1,
+                                ("T1.002", FAILED): 1, ("T1.003", OK): 2})
+
+    path = str(tmpdir.join("results.npy"))
+    table.write(path)
+    assert(list(ResultTable.read(path)) == results)
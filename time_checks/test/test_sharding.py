@@ -0,0 +1,104 @@
+"""
+test_sharding.py
+================
+
+Tests for the `sharding.py` module.
+"""
+
+import os
+
+from time_checks.results import CheckResult, ResultTable
+from time_checks.sharding import (name_time_length, estimate_file_cost, get_file_costs, group_by_dataset, MAX_SCALE_SAMPLES,
+                                  pack_shards, shard_by_count, shard_files, read_timings)
+from time_checks.scripts.shard_file_list import main as shard_file_list
+
+
+def test_name_time_length():
+    assert(name_time_length("tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411.nc") == 300)
+    assert(name_time_length("o2_Oyr_HadGEM2-CC_piControl_r1i1p1_1860-1959.nc") == 100)
+    assert(name_time_length("ua_day_IPSL-CM5A-LR_historical_r1i1p1_20000101-20051231.nc") == 2192)
+    assert(name_time_length("psl_6hrPlev_HadGEM2-ES_rcp85_r1i1p1_2099120106-2100010100.nc") == 124)
+
+    # 360 day calendar dates are accepted
+    assert(name_time_length("tos_day_HadGEM2-ES_esmControl_r1i1p1_19200301-19300230.nc") > 3600)
+
+    assert(name_time_length("orog_fx_HadGEM2-ES_historical_r0i0p0.nc") is None)
+
+
+def test_estimate_file_cost():
+    fpath = 'test_data/cmip5/ua_day_IPSL-CM5A-LR_historical_r1i1p1_20000101-20051231.nc'
+    assert(estimate_file_cost(fpath) < estimate_file_cost(fpath, read_header=False))
+    assert(estimate_file_cost("/does/not/exist/tas_Amon_M_historical_r1i1p1_185001-185012.nc") > 0)
+
+
+def test_pack_shards():
+    groups = [(name, cost, [name]) for name, cost in zip("abcdef", [3, 7, 2, 5, 3, 4])]
+    sharding = pack_shards(groups, 2)
+
+    # b (7) and d (5) first, then each group goes to the shard with the least cost so far
+    assert(sharding.shards == [["b", "a", "c"], ["d", "f", "e"]])
+    assert(sharding.costs == [12, 12])
+
+
+def test_datasets_stay_together():
+    paths = ["/d1/a_3hr.nc", "/d1/b_3hr.nc", "/d2/c.nc", "/d3/d.nc", "/d4/e.nc"]
+    costs = {"/d1/a_3hr.nc": 5., "/d1/b_3hr.nc": 5., "/d2/c.nc": 1., "/d3/d.nc": 1., "/d4/e.nc": 1.}
+
+    sharding, _ = shard_files(paths, 2, estimator=costs.get)
+    assert(sharding.shards == [["/d1/a_3hr.nc", "/d1/b_3hr.nc"], ["/d2/c.nc", "/d3/d.nc", "/d4/e.nc"]])
+    assert(sharding.costs == [10., 3.])
+
+    assert(group_by_dataset(get_file_costs(paths, estimator=costs.get))[0] ==
+           ("/d1", 10., ["/d1/a_3hr.nc", "/d1/b_3hr.nc"]))
+
+    # Equal counts put both costly files in the first shard too, with a third file
+    assert(shard_by_count(get_file_costs(paths, estimator=costs.get), 2).costs == [11., 2.])
+
+
+def test_timings_scale_estimates(tmpdir):
+    table = ResultTable([CheckResult("T1.004", "x", "OK", key="/d/a.nc", duration=1.5),
+                         CheckResult("T1.005", "y", "OK", key="/d/a.nc", duration=0.5),
+                         CheckResult("T1.004", "x", "OK", key="/d/b.nc", duration=2.)])
+    table.write(str(tmpdir.join("results.npy")))
+
+    timings = read_timings(str(tmpdir.join("results.npy")))
+    assert(timings == {"/d/a.nc": 2., "/d/b.nc": 2.})
+
+    costs = get_file_costs(["/d/a.nc", "/d/b.nc", "/d/c.nc"], timings=timings, estimator=lambda fpath: 1.)
+    assert(list(costs.items()) == [("/d/a.nc", 2.), ("/d/b.nc", 2.), ("/d/c.nc", 2.)])
+
+
+def test_timed_files_are_not_all_estimated():
+    paths = ["/d/f{:04d}.nc".format(i) for i in range(1000)]
+    timings = dict((fpath, 2.) for fpath in paths[:-1])
+    estimated = []
+
+    def estimator(fpath):
+        estimated.append(fpath)
+        return 1.
+
+    costs = get_file_costs(paths, timings=timings, estimator=estimator)
+    assert(costs[paths[-1]] == 2. and costs[paths[0]] == 2.)
+    assert(paths[-1] in estimated and len(estimated) <= MAX_SCALE_SAMPLES + 1)
+
+    # With every file timed, nothing is estimated
+    del estimated[:]
+    assert(list(get_file_costs(paths[:-1], timings=timings, estimator=estimator).values()) == [2.] * 999)
+    assert(estimated == [])
+
+
+def test_shard_file_list(tmpdir):
+    files = ['test_data/cmip5/tas_Amon_GFDL-CM2p1_historical_r1i1p1_200101-200512.nc',
+             'test_data/cmip6/ua_EdayZ_HadGEM3-GC31-LL_ssp245_r1i1p1f1_gn_19790101-19971230.nc',
+             'test_data/cmip5/tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411.nc']
+    prefix = os.path.join(str(tmpdir), "shards", "shard_")
+
+    sharding = shard_file_list(files, 3, prefix=prefix)
+    assert(sorted(os.listdir(os.path.join(str(tmpdir), "shards"))) == ["shard_000.txt", "shard_001.txt",
+                                                                       "shard_002.txt"])
+
+    # The files of a dataset stay together: two datasets leave a shard empty
+    assert(sharding.shards == [[files[1]], [files[0], files[2]], []])
+
+    with open(prefix + "001.txt") as reader:
+        assert(reader.read().splitlines() == [files[0], files[2]])
@@ -0,0 +1,66 @@
+"""
+test_shared_axes.py
+===================
+
+Tests for the `shared_axes.py` module.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+
+from time_checks import shared_axes
+from time_checks.async_scheduler import AsyncCheckScheduler
+from time_checks.scripts.run_file_timechecks import run_tests
+
+
+FILES = ['test_data/cmip5/tas_Amon_GFDL-CM2p1_historical_r1i1p1_200101-200512.nc',
+         'test_data/cmip5/mrsos_day_HadGEM2-ES_historical_r2i1p1_19991201-20051130.nc',
+         'test_data/cmip5/tas_day_CMCC-CM_piControl_r1i1p1_17400101-17401231.nc']
+
+
+def _raise(path, ds):
+    raise ValueError(path)
+
+
+def test_shared_axis_is_a_view_and_is_released():
+    values = np.arange(10.) + 0.5
+    descriptor = shared_axes.share_axis(values, {"units": "days since 2000-01-01", "calendar": "noleap"},
+                                        "tas_day_M_historical_r1i1p1_20000101-20000110.nc")
+    assert(descriptor.shape == (10,) and descriptor.filename[1] == "day")
+
+    with shared_axes.open_shared_axis(descriptor, unlink=False) as ds:
+        assert(ds["time"]["_data"].tolist() == values.tolist())
+        ds["time"]["_data"][0] = -1.
+
+    with shared_axes.open_shared_axis(descriptor) as ds:
+        assert(ds["time"]["_data"][0] == -1.)
+        assert(ds["time"]["calendar"] == "noleap")
+
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=descriptor.name)
+
+
+def test_segment_released_when_check_fails():
+    descriptor = shared_axes.share_axis(np.arange(3.), {}, "a.nc")
+
+    with pytest.raises(ValueError):
+        shared_axes.SharedAxisChecker(_raise)("a.nc", descriptor)
+
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=descriptor.name)
+
+
+def test_reader_and_checker_processes():
+    shared_axes.start_resource_tracker()
+    expected = [[str(res) for res in run_tests(f, shared_axes.utils._netcdf4().Dataset(f))] for f in FILES]
+
+    with ProcessPoolExecutor(max_workers=2) as readers, ProcessPoolExecutor(max_workers=1) as checkers:
+        scheduler = AsyncCheckScheduler(shared_axes.SharedAxisChecker(run_tests), reader=shared_axes.publish_axis,
+                                        read_executor=readers, check_executor=checkers)
+        results = scheduler.run(FILES)
+
+    assert([path for path, _ in results] == FILES)
+    assert([[str(res) for res in result] for _, result in results] == expected)
@@ -0,0 +1,66 @@
+"""
+test_time_utils.py
+==================
+
+Tests for the `time_utils.py` module.
+"""
+
+import json
+
+from netCDF4 import Dataset
+
+from time_checks import time_utils
+from time_checks.time_utils import SchemaCache, get_main_variable, get_time_layout, schema_signature
+
+
+def _make_dataset(name, time_name="time"):
+    ds = Dataset(name, "w", diskless=True)
+    ds.createDimension(time_name, 4)
+    ds.createDimension("bnds", 2)
+    time_var = ds.createVariable(time_name, "f8", (time_name,))
+    time_var.standard_name = "time"
+    time_var.bounds = "time_bnds"
+    ds.createVariable("time_bnds", "f8", (time_name, "bnds"))
+    ds.createVariable("a", "f4", (time_name, "bnds"))
+    return ds
+
+
+def test_get_main_variable_ties():
+    ds = _make_dataset("ties.nc")
+    assert(get_main_variable(ds).name == "time_bnds")
+    ds.close()
+
+
+def test_get_time_layout_cached_by_schema(tmpdir, monkeypatch):
+    cache = SchemaCache(str(tmpdir.join("schemas.json")))
+
+    ds = _make_dataset("first.nc", time_name="t")
+    layout = get_time_layout(ds, cache=cache)
+    assert(layout == {"time": "t", "bounds": "time_bnds", "dimensions": ["t"]})
+
+    # A file with the same schema gets the cached layout without a search
+    other = _make_dataset("second.nc", time_name="t")
+    assert(schema_signature(other) == schema_signature(ds))
+
+    def fail(ds):
+        raise AssertionError("time variable searched for")
+
+    monkeypatch.setattr(time_utils, "_find_time_variable", fail)
+    assert(get_time_layout(other, cache=cache) == layout)
+    monkeypatch.undo()
+
+    # Layouts are persisted for the next run
+    with open(cache.path) as reader:
+        assert(json.load(reader) == {schema_signature(ds): layout})
+    assert(SchemaCache(cache.path).get(schema_signature(ds)) == layout)
+
+    ds.close()
+    other.close()
+
+
+def test_get_time_variable_real_files():
+    for f in ['test_data/cmip5/tas_Amon_GFDL-CM2p1_historical_r1i1p1_200101-200512.nc',
+              'test_data/cmip6/ua_EdayZ_HadGEM3-GC31-LL_ssp246_r1i1p1f1_gn_19790101-19971230.nc']:
+        ds = Dataset(f)
+        assert(time_utils.get_time_variable(ds).name == "time")
+        ds.close()
@@ -0,0 +1,121 @@
+"""
+test_triage.py
+==============
+
+Tests for the `triage.py` module.
+"""
+
+import os
+import glob
+
+import numpy as np
+
+from time_checks.triage import (AxisSample, triage_file, check_sample_regular, check_dimension_length,
+                                check_sample_bounds, is_suspicious)
+from time_checks.async_scheduler import TierLimits
+from time_checks.scripts.run_triage import main as run_triage, triage_files
+
+
+GOOD_FILES = ['test_data/cmip5/tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411.nc',
+              'test_data/cmip5/tas_Amon_GFDL-CM2p1_historical_r1i1p1_200101-200512.nc']
+
+BAD_FILE = 'test_data/cmip5/mrsos_day_HadGEM2-ES_historical_r2i1p1_19991201-20051130.nc'
+
+DAY_METADATA = {"units": "days since 1850-01-01", "calendar": "standard"}
+
+
+def _sample(times, indices, length, bounds=None, filename=None):
+    filename = filename or ["tas", "day", "HadGEM2-ES", "historical", "r1i1p1", "18500101-18500110"]
+    return AxisSample(np.array(indices), np.array(times, dtype=np.float64), bounds, length, DAY_METADATA, filename)
+
+
+def test_triage_good_files():
+    for fpath in GOOD_FILES:
+        result = triage_file(fpath, n_samples=8)
+        assert(result.score == 0 and result.findings == [])
+        assert(not is_suspicious(result))
+        assert(result.n_read < result.length)
+
+
+def test_triage_bad_file():
+    result = triage_file(BAD_FILE, n_samples=16)
+    assert([name for name, _ in result.findings] == ["regular_sample", "dimension_length"])
+    assert(result.score == 1.0 and is_suspicious(result))
+
+
+def test_triage_unreadable_file(tmpdir):
+    fpath = str(tmpdir.join("tas_day_HadGEM2-ES_historical_r1i1p1_18500101-18500110.nc"))
+    with open(fpath, "w") as writer:
+        writer.write("not netcdf")
+
+    result = triage_file(fpath)
+    assert(result.findings[0][0] == "read_error" and is_suspicious(result))
+
+
+def test_triage_files_concurrently():
+    # Many reads at once with the default settings: no spurious read errors
+    files = sorted(glob.glob('test_data/cmip5/*.nc')) * 4
+    results = triage_files(files, TierLimits(default_limit=8), n_samples=16)
+
+    expected = dict((fpath, triage_file(fpath, n_samples=16).findings) for fpath in set(files))
+    assert([result.path for result in results] == files)
+    assert(all(result.findings == expected[result.path] for result in results))
+    assert(not any(name == "read_error" for findings in expected.values() for name, _ in findings))
+
+
+def _crash_worker(path, n_samples):
+    os._exit(1)
+
+
+def test_triage_worker_crash_promotes_files(tmpdir, monkeypatch):
+    # A worker process that dies (e.g. in the HDF5 library) breaks the pool
+    import time_checks.scripts.run_triage as run_triage_module
+    monkeypatch.setattr(run_triage_module, "triage_file", _crash_worker)
+
+    report = str(tmpdir.join("report.txt"))
+    assert(run_triage(GOOD_FILES, report=report, processes=1) == GOOD_FILES)
+
+    with open(report) as reader:
+        lines = reader.read().splitlines()
+    assert([line.split("\t")[:3] for line in lines] == [[fpath, "1", "PROMOTE"] for fpath in GOOD_FILES])
+    assert(all("read_error: Could not read time axis: BrokenProcessPool" in line for line in lines))
+
+
+def test_check_sample_regular():
+    assert(check_sample_regular(_sample([0.5, 3.5, 6.5, 9.5], [0, 3, 6, 9], 10)) == (True, ""))
+
+    res, msg = check_sample_regular(_sample([0.5, 3.5, 7.5, 9.5], [0, 3, 6, 9], 10))
+    assert(res is False and msg.startswith("Mean time step 1.3333333333333333 between indices 3 and 6"))
+
+
+def test_check_dimension_length():
+    assert(check_dimension_length(_sample([0.5, 9.5], [0, 9], 10)) == (True, ""))
+    # One step missing after index 2
+    assert(check_dimension_length(_sample([0.5, 1.5, 2.5, 9.5], [0, 1, 2, 8], 9)) ==
+           (False, "Time dimension has 9 steps, 10 expected"))
+
+
+def test_check_sample_bounds():
+    bounds = np.array([[0., 1.], [3., 4.], [np.nan, np.nan]])
+    assert(check_sample_bounds(_sample([0.5, 3.5, 6.5], [0, 3, 6], 7, bounds=bounds)) == (True, ""))
+
+    bounds[1] = [4., 5.]
+    assert(check_sample_bounds(_sample([0.5, 3.5, 6.5], [0, 3, 6], 7, bounds=bounds)) ==
+           (False, "Time value outside its bounds at index 3"))
+
+
+def test_run_triage_promotes_suspicious_files(tmpdir):
+    report, promoted = str(tmpdir.join("report.txt")), str(tmpdir.join("promoted.txt"))
+    odir = str(tmpdir.join("logs"))
+
+    assert(run_triage(GOOD_FILES + [BAD_FILE], report=report, n_samples=16, promoted=promoted, odir=odir) ==
+           [BAD_FILE])
+
+    with open(report) as reader:
+        lines = [line.split("\t") for line in reader.read().splitlines()]
+    assert([line[2] for line in lines] == ["PASS", "PASS", "PROMOTE"])
+
+    with open(promoted) as reader:
+        assert(reader.read().splitlines() == [BAD_FILE])
+
+    assert(os.listdir(odir) == [os.path.basename(BAD_FILE).replace(".nc", "__file_timecheck.log")])
@@ -233,3 +233,40 @@ def test_proleptic_gregorian_day_out_of_range_for_month_error():
     except:
         print("Failed as expected for 1st March 300 for proleptic_gregorian calendar")
 
+
+
+def test_conversion_cache_per_calendar_stats():
+    utils.CONVERSION_CACHE.clear()
+    units = "days since 2000-02-01 00:00:00"
+
+    for _ in range(3):
+        x = utils.get_nc_datetime(29, units, calendar="360_day")
+        assert(x.timetuple()[:3] == (2000, 2, 30))
+
+    utils.get_nc_datetime(29, units, calendar="noleap")
+
+    assert(utils.conversion_cache_stats("360_day") == {"hits": 2, "misses": 1, "evictions": 0})
+    assert(utils.conversion_cache_stats()["noleap"]["misses"] == 1)
+
+    # date2num is keyed on the date/time components, not the (mutable) object
+    anytime = utils.DateTimeAnyTime(2000, 2, 30)
+    assert(utils.cached_date2num(anytime, units, "360_day") == 29)
+    anytime.day = 1
+    assert(utils.cached_date2num(anytime, units, "360_day") == 0)
+
+
+def test_check_month_midpoints_integer_types():
+    units, calendar = "days since 2000-01-01", "standard"
+
+    # The middles of the months are 15.5, 45.5, 75.5, 106.0: either rounding is valid for integers
+    for times in ([16, 46, 76, 106], [15, 45, 75, 106], [15, 46, 75, 106]):
+        assert(utils.check_month_midpoints(times, units, calendar, type_name="int32") == (True, ""))
+
+    assert(utils.check_month_midpoints([16, 46, 76, 106], units, calendar, type_name="float64")[0] is False)
+    assert(utils.check_month_midpoints([15, 45, 77, 106], units, calendar, type_name="int32") ==
+           (False, "Time value 77.0 at index 2 is not the middle of its month (expected 75.5)"))
+
+    # Before the reference date of the units
+    units = "days since 2001-01-01"
+    for times in ([-351, -321, -291], [-350, -320, -290]):
+        assert(utils.check_month_midpoints(times, units, calendar, type_name="int64") == (True, ""))
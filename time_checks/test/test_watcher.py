@@ -0,0 +1,209 @@
+"""
+test_watcher.py
+===============
+
+Tests for the `watcher.py` module.
+"""
+
+import os
+import time
+import shutil
+
+from time_checks.watcher import IngestWatcher, datasets_of
+from time_checks.scripts.watch_ingest import check_new_files, main as watch_ingest, WATCH_STATE
+
+
+FILES = ['test_data/cmip5/tas_Amon_GFDL-CM2p1_historical_r1i1p1_200101-200512.nc',
+         'test_data/cmip5/tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411.nc']
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.offset = 0.
+
+    def __call__(self):
+        return time.time() + self.offset
+
+
+def _touch(path, age=0.):
+    with open(path, "w") as writer:
+        writer.write("data")
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+
+def test_new_files_settle_before_they_are_ready(tmpdir):
+    root = str(tmpdir)
+    clock = _Clock()
+    watcher = IngestWatcher(root, settle_time=10., clock=clock)
+
+    os.makedirs(os.path.join(root, "a", "b"))
+    _touch(os.path.join(root, "a", "b", "old.nc"), age=60.)
+    _touch(os.path.join(root, "a", "b", "ignored.txt"), age=60.)
+
+    # Even an old file is only handed out by the poll after the one that found it
+    assert(watcher.poll() == [])
+    assert(watcher.poll() == [os.path.join(root, "a", "b", "old.nc")])
+
+    # A file being written is held back until it is old enough
+    _touch(os.path.join(root, "a", "b", "new.nc"))
+    assert(watcher.poll() == [])
+    assert(watcher.poll() == [])
+    assert(list(watcher.pending) == [os.path.join(root, "a", "b", "new.nc")])
+
+    clock.offset = 20.
+    assert(watcher.poll() == [os.path.join(root, "a", "b", "new.nc")])
+    assert(watcher.poll() == [])
+    assert(watcher.dataset_files(os.path.join(root, "a", "b")) ==
+           [os.path.join(root, "a", "b", "new.nc"), os.path.join(root, "a", "b", "old.nc")])
+    assert(watcher.dataset_id(os.path.join(root, "a", "b")) == "a.b")
+
+
+def test_unchanged_directories_are_not_listed(tmpdir):
+    root = str(tmpdir)
+    for name in ("a", "b", "c"):
+        os.makedirs(os.path.join(root, name))
+
+    clock = _Clock()
+    clock.offset = 60.
+    watcher = IngestWatcher(root, settle_time=0., clock=clock)
+    watcher.poll()
+    n_listed = watcher.n_listed
+
+    assert(watcher.poll() == [] and watcher.n_listed == n_listed)
+
+    # Only the directory that changed is listed again
+    _touch(os.path.join(root, "b", "x.nc"), age=30.)
+    os.makedirs(os.path.join(root, "b", "new"))
+    assert(watcher.poll() == [])
+    assert(watcher.n_listed == n_listed + 2)
+
+    # The pending file is stat'ed, its directory is not listed again
+    assert(watcher.poll() == [os.path.join(root, "b", "x.nc")])
+    assert(watcher.n_listed == n_listed + 2)
+
+
+def test_replaced_files_are_checked_again(tmpdir):
+    root = str(tmpdir)
+    clock = _Clock()
+    clock.offset = 60.
+    watcher = IngestWatcher(root, settle_time=0., clock=clock)
+    fpath = os.path.join(root, "x.nc")
+    _touch(fpath, age=30.)
+
+    assert(watcher.poll() == [] and watcher.poll() == [fpath])
+
+    # A new version renamed into place changes the directory
+    tmp_path = os.path.join(root, ".x.nc.part")
+    with open(tmp_path, "w") as writer:
+        writer.write("new version")
+    os.rename(tmp_path, fpath)
+    clock.offset = 0.
+
+    assert(watcher.poll() == [])
+    clock.offset = 60.
+    assert(watcher.poll() == [fpath])
+
+
+def test_removed_files_are_forgotten(tmpdir):
+    root = str(tmpdir)
+    watcher = IngestWatcher(root, settle_time=0.)
+    os.makedirs(os.path.join(root, "a"))
+    _touch(os.path.join(root, "a", "x.nc"), age=30.)
+    watcher.poll()
+
+    shutil.rmtree(os.path.join(root, "a"))
+    watcher.poll()
+    assert(watcher.seen == {} and watcher.dir_mtimes == {root: watcher.dir_mtimes[root]})
+
+
+def test_skip_existing(tmpdir):
+    root = str(tmpdir)
+    _touch(os.path.join(root, "x.nc"), age=30.)
+
+    watcher = IngestWatcher(root, settle_time=0.)
+    watcher.scan(mark_seen=True)
+    assert(watcher.poll() == [])
+
+
+def test_check_new_files(tmpdir):
+    root, odir = str(tmpdir.mkdir("ingest")), str(tmpdir.mkdir("logs"))
+    dataset_dir = os.path.join(root, "tas")
+    os.makedirs(dataset_dir)
+    watcher = IngestWatcher(root, settle_time=0.)
+
+    shutil.copy(FILES[0], dataset_dir)
+    assert(check_new_files(watcher, odir) == [])
+    ready = check_new_files(watcher, odir)
+    assert(datasets_of(ready) == [dataset_dir])
+
+    shutil.copy(FILES[1], dataset_dir)
+    assert(check_new_files(watcher, odir) == [])
+    assert(check_new_files(watcher, odir) == [os.path.join(dataset_dir, os.path.basename(FILES[1]))])
+
+    logs = sorted(os.listdir(odir))
+    assert(logs == sorted([os.path.basename(f).replace(".nc", "__file_timecheck.log") for f in FILES] +
+                          ["tas__multifile_timecheck.log"]))
+
+    with open(os.path.join(odir, "tas__multifile_timecheck.log")) as reader:
+        lines = reader.read().splitlines()
+    assert(lines[0].startswith("T1.006: [check_multifile_temporal_continuity]"))
+    assert(lines[3:] == [os.path.join(dataset_dir, os.path.basename(f)) for f in sorted(FILES)])
+
+
+def test_state_carries_over_between_runs(tmpdir):
+    root = str(tmpdir.mkdir("ingest"))
+    state_path = str(tmpdir.join("state.json"))
+    for name in ("a", "b"):
+        os.makedirs(os.path.join(root, name))
+    _touch(os.path.join(root, "a", "x.nc"), age=60.)
+    _touch(os.path.join(root, "b", "pending.nc"))
+
+    watcher = IngestWatcher(root, settle_time=10.)
+    assert(watcher.poll() == [])
+    assert(watcher.poll() == [os.path.join(root, "a", "x.nc")])
+    watcher.save_state(state_path)
+
+    # A new watcher does not list unchanged directories, and still hands out the pending file once settled
+    clock = _Clock()
+    clock.offset = 20.
+    watcher = IngestWatcher(root, settle_time=10., clock=clock)
+    watcher.load_state(state_path)
+    _touch(os.path.join(root, "a", "y.nc"), age=60.)
+
+    assert(watcher.poll() == [os.path.join(root, "b", "pending.nc")])
+    assert(watcher.poll() == [os.path.join(root, "a", "y.nc")])
+    assert(watcher.dataset_files(os.path.join(root, "a")) ==
+           [os.path.join(root, "a", "x.nc"), os.path.join(root, "a", "y.nc")])
+
+    try:
+        IngestWatcher(root, pattern="*.nc4").load_state(state_path)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("State loaded for another pattern")
+
+
+def test_watch_once_from_cron(tmpdir):
+    root, odir = str(tmpdir.mkdir("ingest")), str(tmpdir.join("logs"))
+    dataset_dir = os.path.join(root, "tas")
+    os.makedirs(dataset_dir)
+    shutil.copy(FILES[0], dataset_dir)
+
+    # The first run only records the files already there
+    watch_ingest(root, odir, settle_time=0., skip_existing=True, once=True)
+    assert(os.listdir(odir) == [WATCH_STATE])
+
+    # A new file is found by one run and checked by the next
+    shutil.copy(FILES[1], dataset_dir)
+    watch_ingest(root, odir, settle_time=0., skip_existing=True, once=True)
+    assert(os.listdir(odir) == [WATCH_STATE])
+    watch_ingest(root, odir, settle_time=0., skip_existing=True, once=True)
+    assert(sorted(os.listdir(odir)) == sorted([WATCH_STATE, "tas__multifile_timecheck.log",
+                                               os.path.basename(FILES[1]).replace(".nc", "__file_timecheck.log")]))
+
+    # Nothing new: nothing is checked again
+    os.remove(os.path.join(odir, "tas__multifile_timecheck.log"))
+    watch_ingest(root, odir, settle_time=0., skip_existing=True, once=True)
+    assert("tas__multifile_timecheck.log" not in os.listdir(odir))
@@ -0,0 +1,126 @@
+"""
+test_work_queue.py
+==================
+
+Tests for the `work_queue.py` module.
+"""
+
+import os
+import time
+
+from time_checks.work_queue import WorkQueue, Heartbeat, run_worker
+from time_checks.scripts.run_distributed_timechecks import submit, start_workers, merge_results
+
+
+FILES = ['test_data/cmip5/tas_Amon_GFDL-CM2p1_historical_r1i1p1_200101-200512.nc',
+         'test_data/cmip5/tas_Amon_HadGEM2-ES_historical_r1i1p1_185912-188411.nc',
+         'test_data/cmip5/tas_Amon_HadGEM2-ES_historical_r1i1p1_188412-190911.nc']
+
+
+def _queue(tmpdir, n_tasks=3, **kwargs):
+    queue = WorkQueue(str(tmpdir), **kwargs)
+    queue.create()
+    for index in range(n_tasks):
+        queue.submit("file", {"paths": ["f{}.nc".format(index)]}, "task-{}".format(index))
+    return queue
+
+
+def test_claims_are_exclusive(tmpdir):
+    queue = _queue(tmpdir, n_tasks=2)
+
+    task_a, claimed_a = queue.claim("a")
+    task_b, claimed_b = queue.claim("b")
+    assert((task_a["id"], task_b["id"]) == ("task-0", "task-1"))
+    assert(os.path.basename(claimed_a) == "task-0@a.json")
+    assert(queue.claim("c") is None)
+    assert(queue.status() == {"pending": 0, "claimed": 2, "done": 0, "results": 0})
+
+    queue.complete(task_a, claimed_a, ["ok"], "a")
+    assert(queue.status() == {"pending": 0, "claimed": 1, "done": 1, "results": 1})
+    assert(not queue.is_finished() and queue.missing_results() == ["task-1"])
+
+
+def test_stale_leases_are_reclaimed(tmpdir):
+    queue = _queue(tmpdir, n_tasks=2, lease_time=60.)
+    _, claimed_dead = queue.claim("dead")
+    _, claimed_alive = queue.claim("alive")
+
+    # The dead worker stopped renewing its lease two minutes ago
+    past = time.time() - 120.
+    os.utime(claimed_dead, (past, past))
+
+    assert(queue.reclaim_stale() == ["task-0"])
+    assert(not queue.heartbeat(claimed_dead) and queue.heartbeat(claimed_alive))
+
+    task, claimed = queue.claim("other")
+    assert(task["id"] == "task-0")
+
+    # Results written after the lease was lost are kept
+    queue.complete(task, claimed_dead, ["late"], "dead")
+    assert([res["results"] for res in queue.iter_results()] == [["late"]])
+
+
+def test_heartbeat(tmpdir):
+    queue = _queue(tmpdir, n_tasks=1)
+    _, claimed = queue.claim("a")
+    past = time.time() - 120.
+    os.utime(claimed, (past, past))
+
+    with Heartbeat(queue, claimed, interval=0.01) as heartbeat:
+        time.sleep(0.1)
+    assert(os.stat(claimed).st_mtime > past + 60. and not heartbeat.lost)
+
+
+def test_run_worker(tmpdir):
+    queue = _queue(tmpdir, n_tasks=3)
+
+    def run_task(task):
+        if task["id"] == "task-1":
+            raise ValueError("bad task")
+        return task["payload"]["paths"]
+
+    assert(run_worker(queue, run_task, worker_id="w") == ["task-0", "task-1", "task-2"])
+    assert(queue.is_finished())
+
+    results = list(queue.iter_results())
+    assert([res["results"] for res in results] == [["f0.nc"], None, ["f2.nc"]])
+    assert(results[1]["error"] == "ValueError: bad task")
+
+
+def test_distributed_run(tmpdir):
+    queue = WorkQueue(str(tmpdir.join("queue")))
+    assert(len(submit(queue, FILES, shard_size=2, multifile=True)) == 3)
+
+    start_workers(queue.queue_dir, workers=2, poll_interval=0.1)
+    assert(queue.status()["done"] == 3)
+
+    odir = str(tmpdir.join("logs"))
+    assert(merge_results(queue, odir) == [])
+
+    logs = os.listdir(odir)
+    assert(len(logs) == 4 and len([log for log in logs if log.endswith("cmip5__multifile_timecheck.log")]) == 1)
+
+    with open(os.path.join(odir, os.path.basename(FILES[0]).replace(".nc", "__file_timecheck.log"))) as reader:
+        lines = reader.read().splitlines()
+    assert(lines[0] == "Time checks of: {} ".format(FILES[0]) and lines[1] == "T1.000: [file_extension]: OK")
+
+
+def test_submit_to_used_queue(tmpdir):
+    queue = WorkQueue(str(tmpdir.join("queue")))
+    submit(queue, FILES, shard_size=2, multifile=True)
+    start_workers(queue.queue_dir, workers=1, poll_interval=0.1)
+
+    try:
+        submit(queue, FILES[:1])
+        raise AssertionError("Submitting to a used queue should fail")
+    except ValueError as err:
+        assert("--force" in str(err))
+
+    # The earlier results are cleared, so none of them are merged into the new logs
+    assert(submit(queue, FILES[:1], force=True) == ["file-000000"])
+    assert(queue.status() == {"pending": 1, "claimed": 0, "done": 0, "results": 0})
+
+    start_workers(queue.queue_dir, workers=1, poll_interval=0.1)
+    odir = str(tmpdir.join("logs"))
+    assert(merge_results(queue, odir) == [])
+    assert(os.listdir(odir) == [os.path.basename(FILES[0]).replace(".nc", "__file_timecheck.log")])
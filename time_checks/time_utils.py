@@ -4,30 +4,121 @@ time_utils.py
 
 Utilities for working with time.
 
+The layout of the time axis found in a file (time variable name, bounds
+variable name and dimensions) is cached per schema signature: the names and
+dimensions of the variables in the file. Files of one model/table share the
+same layout, so only the first file of each schema is searched for its time
+variable; the others need a direct lookup of the known variable name.
+
+If the `TIME_CHECKS_SCHEMA_CACHE` environment variable is set to a file path,
+the layouts are persisted there (as JSON) across runs.
+
 """
 
+import os
+import json
+import hashlib
+import tempfile
+
 
 def get_main_variable(ds):
     """
-    Returns biggest variable in netCDF4 Dataset.
+    Returns biggest variable in netCDF4 Dataset (the first one if several have
+    the same size).
 
     :param ds: netCDF4 Dataset object
     :return: netCDF4 Variable object
     """
-    dsv = ds.variables
-    sizes = [(dsv[ncvar].size, dsv[ncvar]) for ncvar in dsv]
-    sizes.sort()
+    return max(ds.variables.values(), key=lambda var: var.size)
 
-    return sizes[-1][1]
 
+class SchemaCache(object):
+    """
+    Cache of time axis layouts by schema signature, optionally persisted to a
+    JSON file.
+    """
 
-def get_time_variable(ds):
-    '''
-    Returns the likeliest variable to be the time coordiante variable
+    def __init__(self, path=None):
+        """
+
+        :param path: path of the JSON file to persist the layouts to, or None [string]
+        """
+        self.path = path
+        self._layouts = None
+
+    def _load(self):
+        if self.path and os.path.isfile(self.path):
+            try:
+                with open(self.path) as reader:
+                    return json.load(reader)
+            except ValueError:
+                pass
+
+        return {}
+
+    @property
+    def layouts(self):
+        if self._layouts is None:
+            self._layouts = self._load()
+
+        return self._layouts
+
+    def get(self, signature):
+        return self.layouts.get(signature)
+
+    def put(self, signature, layout):
+        """
+        Caches a layout and, if the cache is persisted, writes it to the file
+        (merged with any layouts written there by other runs).
+        """
+        self.layouts[signature] = layout
+
+        if self.path:
+            layouts = self._load()
+            layouts.update(self.layouts)
+            self._layouts = layouts
+
+            dirname = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+            with os.fdopen(fd, "w") as writer:
+                json.dump(layouts, writer, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self._layouts = {}
+
+
+SCHEMA_CACHE = SchemaCache(os.environ.get("TIME_CHECKS_SCHEMA_CACHE"))
+
+
+def schema_signature(ds):
+    """
+    Returns the schema signature of a netCDF4 Dataset: a hash of its dimension
+    names and the names and dimensions of its variables. No attributes or data
+    are read.
+
+    :param ds: netCDF4 Dataset object
+    :return: signature [string]
+    """
+    schema = [list(ds.dimensions)] + [[name, list(var.dimensions)] for name, var in ds.variables.items()]
+    return hashlib.sha1(json.dumps(schema).encode("utf-8")).hexdigest()
+
+
+def _find_time_variable(ds):
+    """
+    Searches a netCDF4 Dataset for the likeliest time coordinate variable.
+    Coordinate variables (those named after a dimension) are looked at first,
+    so the attributes of every variable only need to be read if none of them
+    is a time axis.
+
+    :param ds: netCDF4 Dataset object
+    :return: netCDF4 Variable object or None
+    """
+    for dim in ds.dimensions:
+        var = ds.variables.get(dim)
+        if var is not None and (getattr(var, 'axis', '') == 'T' or getattr(var, 'standard_name', '') == 'time'):
+            return var
 
-    :param netCDF4.Dataset ds: An open netCDF4 Dataset
-    :return: the time variable 
-    '''
     for var in ds.variables:
         if getattr(ds.variables[var], 'axis', '') == 'T':
             return ds.variables[var]
@@ -44,10 +135,54 @@ def get_time_variable(ds):
 
     # Now look at main variable and try that
     main_var = get_main_variable(ds)
-    
+
     for dimension in main_var.dimensions:
         if dimension == 'time':
-            return ds.variables['time'] 
- 
+            return ds.variables['time']
+
     # Not found
     return None
+
+
+def get_time_layout(ds, cache=None):
+    """
+    Returns the layout of the time axis of a netCDF4 Dataset, from the cache
+    if a file with the same schema has been seen before.
+
+    :param ds: netCDF4 Dataset object
+    :param cache: SchemaCache instance (default: SCHEMA_CACHE)
+    :return: dictionary of {"time": time variable name, "bounds": bounds variable
+             name or None, "dimensions": dimensions of the time variable} or None
+    """
+    cache = SCHEMA_CACHE if cache is None else cache
+    signature = schema_signature(ds)
+
+    layout = cache.get(signature)
+    if layout is not None and layout["time"] in ds.variables:
+        return layout
+
+    time_var = _find_time_variable(ds)
+    if time_var is None:
+        return None
+
+    bounds = getattr(time_var, 'bounds', None)
+    layout = {"time": time_var.name,
+              "bounds": bounds if bounds in ds.variables else None,
+              "dimensions": list(time_var.dimensions)}
+
+    cache.put(signature, layout)
+    return layout
+
+
+def get_time_variable(ds):
+    '''
+    Returns the likeliest variable to be the time coordiante variable
+
+    :param netCDF4.Dataset ds: An open netCDF4 Dataset
+    :return: the time variable
+    '''
+    layout = get_time_layout(ds)
+    if layout is None:
+        return None
+
+    return ds.variables[layout["time"]]
@@ -0,0 +1,295 @@
+"""
+triage.py
+=========
+
+Fast triage of files from a sample of their time axes, to find the files
+worth a full check without reading every time axis in full.
+
+For each file only the first and last time values and a strided sample of
+the values in between (one hyperslab read), plus the bounds of the same
+steps if there are any, are read. From those:
+
+ - the file name checks (T1.000 to T1.003) are run, as they need no data;
+ - T1.004 is run exactly, as it only needs the first and last time values;
+ - T1.005 is approximated: the sampled values of a monthly axis (with
+   irregular months) must be the middles of their months, and those of
+   other axes must be evenly spaced for the steps between them;
+ - the length of the time dimension must be plausible for the period in the
+   file name (years or months in the period) or, for finer frequencies, for
+   the span of the axis and its step;
+ - the sampled time values must lie within their bounds.
+
+Each finding adds its weight to the score of the file. Files scoring at
+least the promotion threshold are suspicious and should be given the full
+checks.
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from time_checks import calendar_engine, constants, time_utils, utils
+from time_checks.axis_summary import get_valid_steps
+
+
+DEFAULT_SAMPLES = 64
+
+# Weights of the findings in the score of a file
+FINDING_WEIGHTS = {"read_error": 1.0,
+                   "file_name": 1.0,
+                   "file_name_matches_time_var": 1.0,
+                   "regular_sample": 0.5,
+                   "dimension_length": 0.5,
+                   "bounds_sample": 0.25}
+
+DEFAULT_PROMOTE_SCORE = 0.25
+
+# Relative tolerance on the steps of a sample of an evenly spaced axis
+STEP_TOLERANCE = 1e-6
+
+AxisSample = namedtuple("AxisSample", ["indices", "times", "bounds", "length", "metadata", "filename"])
+
+TriageResult = namedtuple("TriageResult", ["path", "score", "findings", "length", "n_read"])
+
+
+def read_axis_sample(ds, n_samples=DEFAULT_SAMPLES):
+    """
+    Reads the first and last time values of a netCDF4 Dataset and a strided
+    sample of those in between, with the matching bounds if there are any.
+
+    :param ds: netCDF4 Dataset object
+    :param n_samples: approximate number of time values to read [int]
+    :return: AxisSample
+    """
+    layout = time_utils.get_time_layout(ds)
+    if layout is None:
+        raise ValueError("No time variable found")
+
+    time_var = ds.variables[layout["time"]]
+    length = len(time_var)
+    if length == 0:
+        raise ValueError("Time axis is empty")
+
+    stride = max(1, (length - 1) // max(n_samples - 1, 1))
+    indices = np.arange(0, length, stride)
+    tail = [] if indices[-1] == length - 1 else [length - 1]
+
+    def read(var):
+        values = [np.ma.filled(np.ma.asarray(var[0:length:stride], dtype=np.float64), np.nan)]
+        if tail:
+            values.append(np.ma.filled(np.ma.asarray(var[length - 1:length], dtype=np.float64), np.nan))
+        return np.concatenate(values)
+
+    times = read(time_var).ravel()
+    bounds = read(ds.variables[layout["bounds"]]).reshape(-1, 2) if layout["bounds"] else None
+
+    return AxisSample(np.concatenate([indices, tail]).astype(np.int64), times, bounds, length,
+                      utils._get_time_metadata(time_var), utils.get_file_name_components(ds.filepath()))
+
+
+def check_sample_regular(sample, frequency_index=1):
+    """
+    Approximates T1.005 on a sample of a time axis.
+
+    :param sample: AxisSample
+    :param frequency_index: index of the frequency element in the filename [int]
+    :return: tuple of: (boolean [True for success], message)
+    """
+    times, indices = sample.times, sample.indices
+    if times.size < 2:
+        return True, ""
+
+    units, calendar = sample.metadata["units"], sample.metadata["calendar"]
+    frequency = sample.filename[frequency_index]
+    valid_steps = get_valid_steps(frequency, calendar)
+
+    if valid_steps is not None:
+        try:
+            origin = utils.get_month_of_time_value(times[0], units, calendar)
+            expected = calendar_engine.month_midpoints(units, calendar, origin[0], origin[1], sample.length)[indices]
+            tolerance = (constants.MONTHLY_MIDPOINT_TOLERANCE * calendar_engine.MICROSECONDS_PER_DAY /
+                         calendar_engine.parse_units(units)[0])
+        except ValueError:
+            # Units not supported by the calendar engine: check the mean steps instead
+            steps = np.diff(times) / np.diff(indices)
+            off = np.flatnonzero(~((steps >= min(valid_steps)) & (steps <= max(valid_steps))))
+            if off.size:
+                return False, "Mean time step {} between indices {} and {} is not in allowed values {}".format(
+                    steps[off[0]], indices[off[0]], indices[off[0] + 1], valid_steps)
+            return True, ""
+
+        off = np.flatnonzero(~(np.abs(times - expected) <= tolerance))
+        if off.size:
+            return False, utils.month_midpoint_message((int(indices[off[0]]), times[off[0]], expected[off[0]]))
+        return True, ""
+
+    steps = np.diff(times) / np.diff(indices)
+    off = np.flatnonzero(~(np.abs(steps - steps[0]) <= STEP_TOLERANCE * abs(steps[0])))
+    if off.size:
+        return False, "Mean time step {} between indices {} and {} differs from {}".format(
+            steps[off[0]], indices[off[0]], indices[off[0] + 1], steps[0])
+
+    return True, ""
+
+
+def get_expected_length(sample, time_index_in_name=-1, frequency_index=1):
+    """
+    Returns the number of time steps expected in a file: the number of years
+    or months in the period of its file name for yearly or monthly data,
+    otherwise the span of the time axis divided by its step (plus one).
+
+    :param sample: AxisSample
+    :return: expected length [int], or None if it cannot be told
+    """
+    (start, end), frequency = utils.get_start_end_freq(sample.filename, time_index_in_name, frequency_index)
+    name_length = constants.CMOR_TABLES_FORMAT.get(frequency)
+
+    if name_length == 4 and len(start) == len(end) == 4:
+        return int(end) - int(start) + 1
+
+    if name_length == 6 and len(start) == len(end) == 6:
+        return (int(end[:4]) - int(start[:4])) * 12 + int(end[4:]) - int(start[4:]) + 1
+
+    if sample.times.size < 2:
+        return None
+
+    step = np.median(np.diff(sample.times) / np.diff(sample.indices))
+    if not step > 0:
+        return None
+
+    return int(round((sample.times[-1] - sample.times[0]) / step)) + 1
+
+
+def check_dimension_length(sample, time_index_in_name=-1, frequency_index=1):
+    """
+    Checks that the length of the time dimension is plausible (see `get_expected_length`).
+
+    :param sample: AxisSample
+    :return: tuple of: (boolean [True for success], message)
+    """
+    try:
+        expected = get_expected_length(sample, time_index_in_name, frequency_index)
+    except (ValueError, KeyError, IndexError):
+        return True, ""
+
+    if expected is not None and expected != sample.length:
+        return False, "Time dimension has {} steps, {} expected".format(sample.length, expected)
+
+    return True, ""
+
+
+def check_sample_bounds(sample):
+    """
+    Checks that the sampled time values lie within their bounds (where set).
+
+    :param sample: AxisSample
+    :return: tuple of: (boolean [True for success], message)
+    """
+    if sample.bounds is None:
+        return True, ""
+
+    lower, upper = sample.bounds[:, 0], sample.bounds[:, 1]
+
+    # Bounds that are not set (fill values) are not checked
+    present = ~(np.isnan(lower) | np.isnan(upper))
+    off = np.flatnonzero(present & ~((lower <= sample.times) & (sample.times <= upper)))
+    if off.size:
+        return False, "Time value outside its bounds at index {}".format(sample.indices[off[0]])
+
+    return True, ""
+
+
+def check_endpoints(sample):
+    """
+    Runs T1.004 (with the tolerance of the file runner) on the first and last
+    time values of a sample, which is exact.
+
+    :param sample: AxisSample
+    :return: tuple of: (boolean [True for success], message)
+    """
+    from time_checks.scripts.run_file_timechecks import test_check_file_name_matches_time_var
+
+    time_dict = dict(sample.metadata)
+    time_dict["_data"] = [sample.times[0], sample.times[-1]]
+    res = test_check_file_name_matches_time_var({"time": time_dict, "filename": sample.filename})
+
+    return res.ok, res.message
+
+
+def triage_sample(path, sample):
+    """
+    Runs the triage checks on a sample of a time axis and scores the file.
+
+    :param path: file path [string]
+    :param sample: AxisSample
+    :return: TriageResult
+    """
+    # Imported here as it imports the scripts package
+    from time_checks.scripts import run_file_timechecks
+
+    findings = []
+    for res in run_file_timechecks.run_filename_tests(path):
+        if not res.ok:
+            findings.append(("file_name", str(res)))
+
+    checks = [("file_name_matches_time_var", lambda: check_endpoints(sample)),
+              ("regular_sample", lambda: check_sample_regular(sample)),
+              ("dimension_length", lambda: check_dimension_length(sample)),
+              ("bounds_sample", lambda: check_sample_bounds(sample))]
+
+    for name, check in checks:
+        try:
+            res, msg = check()
+        except Exception as err:
+            res, msg = False, "Check could not be run: {}: {}".format(type(err).__name__, err)
+
+        if res is False:
+            findings.append((name, msg))
+
+    n_read = sample.times.size * (1 if sample.bounds is None else 3)
+    return TriageResult(path, score(findings), findings, sample.length, n_read)
+
+
+def score(findings):
+    """
+    Returns the score of a list of findings: the sum of their weights, each kind counted once.
+    """
+    return sum(FINDING_WEIGHTS[name] for name in set(name for name, _ in findings))
+
+
+def read_error_result(path, err):
+    """
+    Returns the TriageResult of a file that could not be read: a "read_error" finding.
+
+    :param path: path of the netCDF file [string]
+    :param err: exception raised reading it
+    :return: TriageResult
+    """
+    findings = [("read_error", "Could not read time axis: {}: {}".format(type(err).__name__, err))]
+    return TriageResult(path, score(findings), findings, 0, 0)
+
+
+def triage_file(path, n_samples=DEFAULT_SAMPLES):
+    """
+    Opens a netCDF file, reads a sample of its time axis and triages it. A
+    file that cannot be read gets a "read_error" finding.
+
+    :param path: path of the netCDF file [string]
+    :param n_samples: approximate number of time values to read [int]
+    :return: TriageResult
+    """
+    try:
+        ds = utils._netcdf4().Dataset(path)
+        try:
+            sample = read_axis_sample(ds, n_samples)
+        finally:
+            ds.close()
+    except Exception as err:
+        return read_error_result(path, err)
+
+    return triage_sample(path, sample)
+
+
+def is_suspicious(result, threshold=DEFAULT_PROMOTE_SCORE):
+    return result.score >= threshold
@@ -1,13 +1,162 @@
 
 import os
 import re
+import sys
 from datetime import datetime, timedelta, date
 from functools import wraps
 
-from netCDF4 import Dataset, num2date, date2num
+from time_checks import chunk_layout, time_utils, constants
+from time_checks.cache import LRUCache
 
-from time_checks import time_utils, constants
 
+def _netcdf4():
+    """
+    Returns the netCDF4 module, importing it on first use.
+
+    netCDF4 (and the HDF5 libraries behind it) is only needed once a file is
+    opened or a time value converted, so it is not imported at module level.
+    This keeps the filename-level checks free of the import cost.
+
+    :return: netCDF4 module
+    """
+    import netCDF4
+    return netCDF4
+
+
+def num2date(*args, **kwargs):
+    """
+    Lazy wrapper around `netCDF4.num2date`.
+    """
+    return _netcdf4().num2date(*args, **kwargs)
+
+
+def date2num(*args, **kwargs):
+    """
+    Lazy wrapper around `netCDF4.date2num`.
+    """
+    return _netcdf4().date2num(*args, **kwargs)
+
+
+# Cache of num2date/date2num conversions, with counters per calendar
+CONVERSION_CACHE = LRUCache(maxsize=65536)
+
+# `close_to_zero_AD` times used in `_times_match_within_tolerance`, per calendar
+_CLOSE_TO_ZERO_AD = {}
+
+
+def cached_num2date(value, units, calendar):
+    """
+    Cached version of `num2date` for a single time value.
+
+    :param value: time value [number]
+    :param units: time units [string]
+    :param calendar: calendar [string]
+    :return: a netcdftime/datetime object.
+    """
+    key = ("num2date", float(value), units, calendar)
+    t = CONVERSION_CACHE.get(key, group=calendar)
+
+    if t is None:
+        t = num2date(value, units, calendar)
+        CONVERSION_CACHE.put(key, t, group=calendar)
+
+    return t
+
+
+def cached_date2num(dt, units, calendar):
+    """
+    Cached version of `date2num` for a single date/time. The date/time is keyed
+    on its components so that mutable DateTimeAnyTime objects are safe to use.
+
+    :param dt: some kind of date/time object
+    :param units: time units [string]
+    :param calendar: calendar [string]
+    :return: time value [number]
+    """
+    components = tuple(getattr(dt, attr, 0) for attr in
+                       ('year', 'month', 'day', 'hour', 'minute', 'second', 'microsecond'))
+    key = ("date2num", components, units, calendar)
+    value = CONVERSION_CACHE.get(key, group=calendar)
+
+    if value is None:
+        value = date2num(dt, units, calendar)
+        CONVERSION_CACHE.put(key, value, group=calendar)
+
+    return value
+
+
+def conversion_cache_stats(calendar=None):
+    """
+    Returns the hit/miss/eviction counters of the conversion cache.
+
+    :param calendar: calendar [string], if not set the counters of all calendars are returned
+    :return: dictionary of counters (or of counters per calendar)
+    """
+    if calendar is not None:
+        return CONVERSION_CACHE.stats(calendar)
+
+    return CONVERSION_CACHE.group_stats()
+
+
+def _close_to_zero_ad(calendar):
+    """
+    Returns the time 16 days after 0001-01-01 in `calendar`. The times for all
+    known calendars are computed on the first call.
+
+    :param calendar: calendar [string]
+    :return: a netcdftime/datetime object.
+    """
+    if not _CLOSE_TO_ZERO_AD:
+        for cal in constants.CALENDARS:
+            _CLOSE_TO_ZERO_AD[cal] = num2date(16, "days since 0001-01-01 00:00:00", cal)
+
+    if calendar not in _CLOSE_TO_ZERO_AD:
+        _CLOSE_TO_ZERO_AD[calendar] = num2date(16, "days since 0001-01-01 00:00:00", calendar)
+
+    return _CLOSE_TO_ZERO_AD[calendar]
+
+
+def is_netcdf_dataset(ds):
+    """
+    Returns True if `ds` is a netCDF4 Dataset. If netCDF4 has not been imported
+    yet then no Dataset can exist, so the import is not triggered here.
+
+    :param ds: a dataset object
+    :return: boolean
+    """
+    netcdf4 = sys.modules.get('netCDF4')
+    return netcdf4 is not None and isinstance(ds, netcdf4.Dataset)
+
+
+def get_file_name_components(fpath):
+    """
+    Returns the list of "_" separated components of a file name, with the
+    directory and the extension removed.
+
+    :param fpath: file name or path [string]
+    :return: list of file name components
+    """
+    return os.path.splitext(os.path.basename(fpath))[0].split("_")
+
+
+def resolve_dataset(ds):
+    """
+    Converts a dataset to the standard dictionary format used by the checks
+    (see `resolve_dataset_type`).
+
+    :param ds: netCDF4 Dataset, MockNCDataset or compliant dictionary
+    :return: ds [dictionary]
+    """
+    if is_netcdf_dataset(ds):
+        return _convert_dataset_to_dict(ds)
+    elif hasattr(ds, 'filepath'):
+        # If it is a MockDataset, only set the 'filename'
+        return {"filename": get_file_name_components(ds.filepath())}
+    elif isinstance(ds, dict):
+        return ds
+    else:
+        raise Exception("Unsupported data type. "
+                        "Data types supported are netCDF4 objects or CEDA-CC compliant dictionary objects")
 
 
 def resolve_dataset_type(func):
@@ -36,21 +185,7 @@ def resolve_dataset_type(func):
             datasets = [datasets]
 
         # Loop through all and convert them
-        converted_datasets = []
-
-        for ds in datasets:
-            if isinstance(ds, Dataset):
-                ds = _convert_dataset_to_dict(ds)
-            elif hasattr(ds, 'filepath'):
-                # If it is a MockDataset, only set the 'filename'
-                ds = {"filename": os.path.splitext(os.path.basename(ds.filepath()))[0].split("_")}
-            elif isinstance(ds, dict):
-                pass
-            else:
-                raise Exception("Unsupported data type. "
-                                "Data types supported are netCDF4 objects or CEDA-CC compliant dictionary objects")
-
-            converted_datasets.append(ds)
+        converted_datasets = [resolve_dataset(ds) for ds in datasets]
 
         if single_arg:
             return func(converted_datasets[0], **kwargs)
@@ -71,8 +206,7 @@ def get_start_end_freq(finfo, time_index_in_name=-1, frequency_index=1):
     :return: Tuple of: ((start, end), frequency)
     """
     if type(finfo) is str:
-        fname = os.path.splitext(os.path.basename(finfo))[0]
-        finfo = fname.split("_")
+        finfo = get_file_name_components(finfo)
 
     start, end = finfo[time_index_in_name].split("-")
     frequency = finfo[frequency_index]
@@ -100,6 +234,25 @@ def _get_nc_attr(var, attr, default=""):
         return default
 
 
+def _get_time_metadata(time_var):
+    """
+    Returns the attributes of a time variable as used in the CEDA-CC style
+    dictionary (everything except the "_data").
+
+    :param time_var: netCDF4 Variable object
+    :return: time variable metadata [dictionary]
+    """
+    return {
+        "_type": time_var.dtype.name,
+        "bounds": _get_nc_attr(time_var, "bounds"),
+        "long_name": _get_nc_attr(time_var, "long_name"),
+        "standard_name": _get_nc_attr(time_var, "standard_name"),
+        "units": _get_nc_attr(time_var, "units"),
+        "calendar": _get_nc_attr(time_var, "calendar"),
+        "axis": _get_nc_attr(time_var, "axis")
+    }
+
+
 def _convert_dataset_to_dict(ds):
     """
         _convert_dataset_to_dict
@@ -128,19 +281,15 @@ def _convert_dataset_to_dict(ds):
         dtype, bounds, long_name, standard_name, units, calendar, axis
     """
     time_var = time_utils.get_time_variable(ds)
+    if time_var is None:
+        raise ValueError("No time variable found in: {}".format(ds.filepath()))
 
-    time_dict = {
-        "_type": time_var.dtype.name,
-        "bounds": _get_nc_attr(time_var, "bounds"),
-        "long_name": _get_nc_attr(time_var, "long_name"),
-        "standard_name": _get_nc_attr(time_var, "standard_name"),
-        "units": _get_nc_attr(time_var, "units"),
-        "calendar": _get_nc_attr(time_var, "calendar"),
-        "axis": _get_nc_attr(time_var, "axis"),
-        "_data": list(time_var[:])
-    }
+    time_dict = _get_time_metadata(time_var)
+    values, layout = chunk_layout.read_time_values(time_var)
+    time_dict["_data"] = list(values)
+    time_dict["_storage"] = chunk_layout.layout_as_dict(layout)
 
-    filename_info = os.path.splitext(os.path.basename(ds.filepath()))[0].split("_")
+    filename_info = get_file_name_components(ds.filepath())
 
     dict = {"time": time_dict, "filename": filename_info}
 
@@ -216,7 +365,7 @@ def get_nc_datetime(time_comp, units, calendar):
                 time_comp, units, calendar)
 
     try:
-        t = num2date(time_comp, units, calendar)
+        t = cached_num2date(time_comp, units, calendar)
     except ValueError as err:
         if err.message == 'day is out of range for month':
             try:
@@ -254,7 +403,7 @@ def _times_match_within_tolerance(t1, t2, tolerance="days:1"):
     # Arrow only supprts AD times, therefore only check that the time in the filename is less than
     # time in the file with the given tolerance.
     if hasattr(t1, 'calendar'):
-        close_to_zero_AD = num2date(16, "days since 0001-01-01 00:00:00", t1.calendar)
+        close_to_zero_AD = _close_to_zero_ad(t1.calendar)
     else:
         close_to_zero_AD = datetime(1, 1, 17)
 
@@ -426,7 +575,7 @@ def anytime_to_netcdf_time(anytime, time_unit, calendar):
     :param calendar: calendar (string)
     :return: netCDF Time object (aware of calendars)
     """
-    value = date2num(anytime, time_unit, calendar)
+    value = cached_date2num(anytime, time_unit, calendar)
     return get_nc_datetime(value, time_unit, calendar)
 
 
@@ -637,3 +786,89 @@ def calculate_delta_time_series(times, valid_dt):
             return False, return_msg
 
     return True, return_msg
+
+
+def get_month_of_time_value(value, units, calendar):
+    """
+    Returns the year and month of a time value, using the vectorized calendar engine.
+
+    :param value: time value [float]
+    :param units: time units [string]
+    :param calendar: calendar [string]
+    :return: tuple of: (year, month)
+    """
+    from time_checks import calendar_engine
+
+    comps = calendar_engine.num2components(value, units, calendar)
+    return int(comps["year"]), int(comps["month"])
+
+
+def find_off_month_midpoint(times, units, calendar, origin, start=0, type_name=None,
+                            tolerance=constants.MONTHLY_MIDPOINT_TOLERANCE):
+    """
+    Compares time values with the middles of consecutive months, in a single
+    vectorized comparison.
+
+    :param times: time values of consecutive months
+    :param units: time units [string]
+    :param calendar: calendar [string]
+    :param origin: tuple of (year, month) of the first month of the time axis
+    :param start: index in the time axis of the first of `times` [int]
+    :param type_name: data type of the time values [string]. Integer values may
+                      be the middle of their month rounded either way, i.e. within
+                      half a unit of it; for float types the middle is cast to the type
+    :param tolerance: tolerance in days [float]
+    :return: tuple of: (index, value, expected value) of the first time value that is
+             not the middle of its month, or None
+    """
+    import numpy as np
+    from time_checks import calendar_engine
+
+    times = np.asarray(times, dtype=np.float64)
+    expected = calendar_engine.month_midpoints(units, calendar, origin[0], origin[1], times.size, start=start)
+
+    unit_us, _ = calendar_engine.parse_units(units)
+    tolerance = tolerance * calendar_engine.MICROSECONDS_PER_DAY / unit_us
+
+    if type_name and np.issubdtype(np.dtype(type_name), np.integer):
+        # Either the floor or the ceiling of the middle of the month
+        tolerance += 0.5
+    elif type_name:
+        expected = expected.astype(type_name).astype(np.float64)
+
+    off = np.flatnonzero(~(np.abs(times - expected) <= tolerance))
+    if off.size:
+        index = int(off[0])
+        return start + index, times[index], expected[index]
+
+    return None
+
+
+def month_midpoint_message(off_midpoint):
+    """
+    Returns the failure message for a time value that is not the middle of its month.
+
+    :param off_midpoint: tuple of: (index, value, expected value)
+    :return: message [string]
+    """
+    return "Time value {1} at index {0} is not the middle of its month (expected {2})".format(*off_midpoint)
+
+
+def check_month_midpoints(times, units, calendar, type_name=None):
+    """
+    Checks that each time value of a monthly time axis is the middle of the
+    month following that of the previous time value.
+
+    :param times: list of times
+    :param units: time units [string]
+    :param calendar: calendar [string]
+    :param type_name: data type of the time values [string]
+    :return: tuple of: (boolean [True for success], message)
+    """
+    origin = get_month_of_time_value(times[0], units, calendar)
+    off_midpoint = find_off_month_midpoint(times, units, calendar, origin, type_name=type_name)
+
+    if off_midpoint is not None:
+        return False, month_midpoint_message(off_midpoint)
+
+    return True, ""
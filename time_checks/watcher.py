@@ -0,0 +1,248 @@
+"""
+watcher.py
+==========
+
+Polling watcher of an ingest directory tree, finding files as they land so
+that they can be checked incrementally.
+
+Each poll only stats the directories known to the watcher. A directory is
+listed again only if its modification time has changed (a file or
+subdirectory was added, removed or renamed in it), so a poll over a tree
+where nothing happened costs one `stat` per directory. New subdirectories
+found in a listing are listed straight away.
+
+Files that have been checked are kept in a seen-set with their size and
+modification time. Every file of a directory that is listed again is stat'ed
+again, so a file replaced by a new version that is renamed into place (which
+changes the directory) is checked again. A file rewritten in place does not
+change its directory, so it is only checked again if its directory is listed
+for another reason.
+
+New files are held as pending until they have settled: they were found by at
+least two polls, their size and modification time were unchanged between
+the last two of them, and they were last modified at least `settle_time`
+seconds ago. Files still being written are not handed out for checking.
+
+The dataset of a file is the directory holding it (as in the DRS, where the
+files of a dataset are in one directory).
+
+The state of the watcher (the directories with their modification times, and
+the seen and pending files) can be saved to a JSON file with `save_state` and
+loaded back with `load_state`, so that a watcher run at intervals (e.g. from
+cron) carries on from where the previous run stopped rather than listing the
+whole tree again.
+
+"""
+
+import os
+import json
+import time
+import fnmatch
+
+
+DEFAULT_SETTLE_TIME = 30.
+
+# Directories modified this recently are listed again at the next poll, in
+# case a file was added within the resolution of their modification time
+MTIME_RESOLUTION = 2.
+
+
+class IngestWatcher(object):
+    """
+    Watches a directory tree for new files matching a pattern.
+    """
+
+    def __init__(self, root, pattern="*.nc", settle_time=DEFAULT_SETTLE_TIME, clock=time.time):
+        """
+
+        :param root: root directory of the tree to watch [string]
+        :param pattern: glob pattern of the file names to watch [string]
+        :param settle_time: seconds since their last modification after which
+                            files are considered fully written [float]
+        :param clock: callable returning the current time in seconds
+        """
+        self.root = os.path.normpath(root)
+        self.pattern = pattern
+        self.settle_time = settle_time
+        self.clock = clock
+
+        # {directory: modification time [ns]}
+        self.dir_mtimes = {}
+        # {file path: (size, modification time [ns])}
+        self.seen = {}
+        self.pending = {}
+        # {directory: set of the paths of its files, seen or pending}
+        self.files_by_dir = {}
+
+        self.n_listed = 0
+
+    def _list_dir(self, path, found):
+        """
+        Lists a directory, updating the known directories and files. New
+        subdirectories are listed too.
+        """
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            entries = list(os.scandir(path))
+        except FileNotFoundError:
+            self._forget_dir(path)
+            return
+
+        self.dir_mtimes[path] = mtime
+        self.n_listed += 1
+        fpaths = set()
+
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path not in self.dir_mtimes:
+                        self._list_dir(entry.path, found)
+                elif entry.is_file() and fnmatch.fnmatchcase(entry.name, self.pattern):
+                    fpaths.add(entry.path)
+                    stat = entry.stat()
+                    found[entry.path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                continue
+
+        # Files removed from the directory are forgotten
+        self._forget_files(self.files_by_dir.get(path, set()) - fpaths)
+        self.files_by_dir[path] = fpaths
+
+    def _forget_files(self, fpaths):
+        for fpath in fpaths:
+            self.seen.pop(fpath, None)
+            self.pending.pop(fpath, None)
+
+    def _forget_dir(self, path):
+        prefix = path + os.sep
+
+        for known in [known for known in self.dir_mtimes if known == path or known.startswith(prefix)]:
+            del self.dir_mtimes[known]
+            self._forget_files(self.files_by_dir.pop(known, ()))
+
+    def _changed_dirs(self, now):
+        changed = []
+
+        for path, mtime in list(self.dir_mtimes.items()):
+            try:
+                current = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                self._forget_dir(path)
+                continue
+
+            if current != mtime or now - current / 1e9 < MTIME_RESOLUTION:
+                changed.append(path)
+
+        return changed
+
+    def scan(self, mark_seen=False):
+        """
+        Lists the whole tree. With `mark_seen` the files found are taken as
+        already checked, so that only files landing from now on are handed out.
+        """
+        found = {}
+        self._list_dir(self.root, found)
+
+        for fpath, stat in found.items():
+            if mark_seen:
+                self.seen[fpath] = stat
+            elif self.seen.get(fpath) != stat:
+                self.pending.setdefault(fpath, stat)
+
+    def poll(self):
+        """
+        Looks for new files and returns those that have settled. They are then
+        added to the seen-set. A file is never handed out by the poll that
+        found it.
+
+        :return: sorted list of file paths
+        """
+        now = self.clock()
+        known = set(self.pending)
+
+        if not self.dir_mtimes:
+            self.scan()
+        else:
+            found = {}
+            for path in self._changed_dirs(now):
+                if path in self.dir_mtimes:
+                    self._list_dir(path, found)
+
+            for fpath, stat in found.items():
+                if self.seen.get(fpath) != stat:
+                    self.pending.setdefault(fpath, stat)
+
+        ready = []
+        for fpath, stat in list(self.pending.items()):
+            if fpath not in known:
+                # Found by this poll: unchanged since when is not known yet
+                continue
+
+            try:
+                current = os.stat(fpath)
+            except FileNotFoundError:
+                del self.pending[fpath]
+                continue
+
+            current = (current.st_size, current.st_mtime_ns)
+            if current != stat:
+                self.pending[fpath] = current
+            elif now - current[1] / 1e9 >= self.settle_time:
+                del self.pending[fpath]
+                self.seen[fpath] = current
+                ready.append(fpath)
+
+        return sorted(ready)
+
+    def save_state(self, path):
+        """
+        Saves the state of the watcher to `path` as JSON, atomically.
+
+        :param path: path of the state file [string]
+        """
+        state = {"root": self.root, "pattern": self.pattern, "dir_mtimes": self.dir_mtimes,
+                 "seen": self.seen, "pending": self.pending,
+                 "files_by_dir": dict((path, sorted(fpaths)) for path, fpaths in self.files_by_dir.items())}
+
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, "w") as writer:
+            json.dump(state, writer)
+        os.replace(tmp_path, path)
+
+    def load_state(self, path):
+        """
+        Loads a state saved by `save_state`, replacing the current state.
+
+        :param path: path of the state file [string]
+        """
+        with open(path) as reader:
+            state = json.load(reader)
+
+        if state["root"] != self.root or state["pattern"] != self.pattern:
+            raise ValueError("State file {} is for {} ({}), not {} ({})".format(
+                path, state["root"], state["pattern"], self.root, self.pattern))
+
+        self.dir_mtimes = state["dir_mtimes"]
+        self.seen = dict((fpath, tuple(stat)) for fpath, stat in state["seen"].items())
+        self.pending = dict((fpath, tuple(stat)) for fpath, stat in state["pending"].items())
+        self.files_by_dir = dict((path, set(fpaths)) for path, fpaths in state["files_by_dir"].items())
+
+    def dataset_files(self, dataset_dir):
+        """
+        Returns the checked files of a dataset (directory), sorted.
+        """
+        return sorted(fpath for fpath in self.files_by_dir.get(dataset_dir, ()) if fpath in self.seen)
+
+    def dataset_id(self, dataset_dir):
+        """
+        Returns the id of a dataset: its directory relative to the root, with "." separators.
+        """
+        rel_path = os.path.relpath(dataset_dir, self.root)
+        return os.path.basename(self.root) if rel_path == "." else ".".join(rel_path.split(os.sep))
+
+
+def datasets_of(paths):
+    """
+    Returns the dataset directories of `paths`, sorted.
+    """
+    return sorted(set(os.path.dirname(fpath) for fpath in paths))
@@ -0,0 +1,334 @@
+"""
+work_queue.py
+=============
+
+File-based work queue, to share check runs between workers on many nodes
+that see the same filesystem (no message broker is needed).
+
+The queue is a directory holding:
+
+    pending/<task id>.json               tasks waiting for a worker
+    claimed/<task id>@<worker id>.json   tasks being run, one file per lease
+    done/<task id>.json                  tasks that have been run
+    results/<task id>.json               the results of each task
+
+A coordinator submits the tasks (shards of files to check, and the datasets
+to run the multifile check on) to "pending". Workers claim a task by renaming
+it into "claimed" under their own id: a rename is atomic, so a task is only
+ever claimed by one worker. While it runs the task, the worker touches its
+claimed file every `lease_time / 3` seconds (a heartbeat). A claimed file
+not touched for `lease_time` seconds belongs to a worker that died: its task
+is put back into "pending" (again by a rename, so only once) for another
+worker to claim.
+
+A worker writes the results of a task atomically (to a temporary file, then
+renamed), then moves its claimed file to "done". Checks are deterministic, so
+if a task was reclaimed from a slow worker and run twice the second results
+simply replace the first. `WorkQueue.iter_results` reads the results of all
+the tasks in task order.
+
+Task ids are reused between runs, so a queue directory is only reused once it
+has been emptied with `WorkQueue.clear`.
+
+"""
+
+import os
+import json
+import time
+import socket
+import threading
+
+
+DEFAULT_LEASE_TIME = 300.
+
+DEFAULT_POLL_INTERVAL = 5.
+
+QUEUE_DIRS = ("pending", "claimed", "done", "results")
+
+TASK_KINDS = ("file", "multifile")
+
+
+def _write_json(path, content):
+    """
+    Writes `content` to `path` as JSON, atomically (via a temporary file in the same directory).
+    """
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "w") as writer:
+        json.dump(content, writer)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    with open(path) as reader:
+        return json.load(reader)
+
+
+def default_worker_id():
+    """
+    Returns an id for this worker, unique across the nodes: "<host name>-<process id>".
+    """
+    return "{}-{}".format(socket.gethostname(), os.getpid())
+
+
+class WorkQueue(object):
+    """
+    A work queue in a directory of a shared filesystem.
+    """
+
+    def __init__(self, queue_dir, lease_time=DEFAULT_LEASE_TIME, clock=time.time):
+        """
+
+        :param queue_dir: directory of the queue [string]
+        :param lease_time: seconds after which a claimed task that has not been
+                           touched is taken back [float]
+        :param clock: callable returning the current time in seconds
+        """
+        self.queue_dir = queue_dir
+        self.lease_time = lease_time
+        self.clock = clock
+
+    def _dir(self, name):
+        return os.path.join(self.queue_dir, name)
+
+    def _list(self, name):
+        try:
+            return sorted(fname for fname in os.listdir(self._dir(name)) if fname.endswith(".json"))
+        except FileNotFoundError:
+            return []
+
+    def create(self):
+        """
+        Creates the directories of the queue.
+        """
+        for name in QUEUE_DIRS:
+            os.makedirs(self._dir(name), exist_ok=True)
+
+    def is_empty(self):
+        """
+        Returns True if the queue holds no tasks (in any state) and no results.
+        """
+        return not any(self._list(name) for name in QUEUE_DIRS)
+
+    def clear(self):
+        """
+        Removes all the tasks and results (and temporary files) from the queue.
+        """
+        for name in QUEUE_DIRS:
+            try:
+                fnames = os.listdir(self._dir(name))
+            except FileNotFoundError:
+                continue
+
+            for fname in fnames:
+                if fname.endswith((".json", ".tmp")):
+                    try:
+                        os.remove(os.path.join(self._dir(name), fname))
+                    except FileNotFoundError:
+                        pass
+
+    def submit(self, kind, payload, task_id):
+        """
+        Adds a task to the queue.
+
+        :param kind: "file" or "multifile" [string]
+        :param payload: dictionary of the inputs of the task (JSON serialisable)
+        :param task_id: id of the task, giving the order of the results [string]
+        :return: the task id
+        """
+        if kind not in TASK_KINDS:
+            raise ValueError("Task kind must be one of {}, not: {}".format(TASK_KINDS, kind))
+
+        if "@" in task_id or os.sep in task_id:
+            raise ValueError("Task id must not contain '@' or '{}': {}".format(os.sep, task_id))
+
+        _write_json(os.path.join(self._dir("pending"), task_id + ".json"),
+                    {"id": task_id, "kind": kind, "payload": payload})
+        return task_id
+
+    def claim(self, worker_id):
+        """
+        Claims the first pending task that no other worker claims first.
+
+        :param worker_id: id of the worker (must not contain "@") [string]
+        :return: tuple of: (task dictionary, path of the claimed file), or None if no task is pending
+        """
+        for fname in self._list("pending"):
+            task_id = fname[:-len(".json")]
+            claimed = os.path.join(self._dir("claimed"), "{}@{}.json".format(task_id, worker_id))
+
+            pending = os.path.join(self._dir("pending"), fname)
+            try:
+                # The lease starts now, not when the task was submitted (a rename keeps the mtime)
+                os.utime(pending)
+                os.rename(pending, claimed)
+                return _read_json(claimed), claimed
+            except FileNotFoundError:
+                # Claimed by another worker first
+                continue
+
+        return None
+
+    def heartbeat(self, claimed):
+        """
+        Renews the lease of a claimed task.
+
+        :return: False if the lease was lost (the task was reclaimed)
+        """
+        try:
+            os.utime(claimed)
+        except FileNotFoundError:
+            return False
+
+        return True
+
+    def reclaim_stale(self):
+        """
+        Puts the tasks whose lease has expired back into "pending".
+
+        :return: list of the ids of the tasks reclaimed
+        """
+        now = self.clock()
+        reclaimed = []
+
+        for fname in self._list("claimed"):
+            claimed = os.path.join(self._dir("claimed"), fname)
+            try:
+                expired = now - os.stat(claimed).st_mtime > self.lease_time
+            except FileNotFoundError:
+                continue
+
+            if not expired:
+                continue
+
+            task_id = fname.split("@", 1)[0]
+            try:
+                os.rename(claimed, os.path.join(self._dir("pending"), task_id + ".json"))
+            except FileNotFoundError:
+                # Completed or reclaimed by someone else meanwhile
+                continue
+
+            reclaimed.append(task_id)
+
+        return reclaimed
+
+    def complete(self, task, claimed, results, worker_id, error=None):
+        """
+        Writes the results of a claimed task and moves it to "done".
+
+        :param task: task dictionary
+        :param claimed: path of the claimed file [string]
+        :param results: results of the task (JSON serialisable)
+        :param worker_id: id of the worker [string]
+        :param error: message of the error that stopped the task, or None [string]
+        """
+        _write_json(os.path.join(self._dir("results"), task["id"] + ".json"),
+                    {"id": task["id"], "kind": task["kind"], "payload": task["payload"], "worker": worker_id,
+                     "results": results, "error": error})
+
+        try:
+            os.rename(claimed, os.path.join(self._dir("done"), task["id"] + ".json"))
+        except FileNotFoundError:
+            # The lease was lost: the task may be run again, with the same results
+            pass
+
+    def status(self):
+        """
+        Returns the number of tasks in each state, and the number of results written.
+
+        :return: dictionary of {state: count}
+        """
+        return dict((name, len(self._list(name))) for name in QUEUE_DIRS)
+
+    def is_finished(self):
+        """
+        Returns True if no task is pending or claimed.
+        """
+        return not self._list("pending") and not self._list("claimed")
+
+    def iter_results(self):
+        """
+        Yields the results of the tasks, in task id order.
+        """
+        for fname in self._list("results"):
+            yield _read_json(os.path.join(self._dir("results"), fname))
+
+    def missing_results(self):
+        """
+        Returns the ids of the submitted tasks that have no results yet.
+        """
+        task_ids = set()
+        for name in ("pending", "claimed", "done"):
+            task_ids.update(fname[:-len(".json")].split("@", 1)[0] for fname in self._list(name))
+
+        return sorted(task_ids - set(fname[:-len(".json")] for fname in self._list("results")))
+
+
+class Heartbeat(object):
+    """
+    Context manager renewing the lease of a claimed task in a background
+    thread while the task runs.
+    """
+
+    def __init__(self, queue, claimed, interval=None):
+        self.queue = queue
+        self.claimed = claimed
+        self.interval = queue.lease_time / 3. if interval is None else interval
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.queue.heartbeat(self.claimed):
+                self.lost = True
+                return
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(queue, run_task, worker_id=None, poll_interval=DEFAULT_POLL_INTERVAL, max_tasks=None):
+    """
+    Claims and runs tasks until the queue is finished (no task pending or
+    claimed by another worker). Stale leases are reclaimed before each claim.
+    A task that raises is completed with the error rather than retried.
+
+    :param queue: WorkQueue instance
+    :param run_task: callable taking a task dictionary and returning its results
+    :param worker_id: id of the worker (default: `default_worker_id()`) [string]
+    :param poll_interval: seconds to wait when all the tasks left are claimed by other workers [float]
+    :param max_tasks: stop after this many tasks [int]
+    :return: list of the ids of the tasks run
+    """
+    worker_id = worker_id or default_worker_id()
+    done = []
+
+    while max_tasks is None or len(done) < max_tasks:
+        queue.reclaim_stale()
+        claim = queue.claim(worker_id)
+
+        if claim is None:
+            if queue.is_finished():
+                break
+
+            # Other workers are busy: wait in case one of them dies
+            time.sleep(poll_interval)
+            continue
+
+        task, claimed = claim
+        with Heartbeat(queue, claimed):
+            try:
+                results, error = run_task(task), None
+            except Exception as err:
+                results, error = None, "{}: {}".format(type(err).__name__, err)
+
+        queue.complete(task, claimed, results, worker_id, error=error)
+        done.append(task["id"])
+
+    return done